@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+CLIP image embedding throughput benchmark
+
+Generates synthetic images and reports images/sec on CPU for one image per
+forward pass (the old per-image path) and for batched forward passes with
+threaded preprocessing. The embedding cache is disabled so every run does
+the full decode, preprocess and model work.
+
+Usage:
+    python Ingestion/benchmark_clip_embedder.py --images 256 --batch-sizes 1,8,32,64 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Ingestion.clip_embedder import ClipEmbedder
+
+
+def make_images(directory, count, size):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        pixels = rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8)
+        path = os.path.join(directory, f"bench_{i}.png")
+        Image.fromarray(pixels).save(path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLIP image embedding throughput on CPU")
+    parser.add_argument("--images", type=int, default=256, help="Number of synthetic images (default: 256)")
+    parser.add_argument("--size", type=int, default=640, help="Synthetic image side in pixels (default: 640)")
+    parser.add_argument("--batch-sizes", default="1,8,32,64", help="Comma-separated batch sizes (default: 1,8,32,64)")
+    parser.add_argument("--workers", type=int, default=4, help="Preprocessing threads (default: 4)")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads (default: torch default)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_images(directory, args.images, args.size)
+        print(f"{args.images} synthetic {args.size}x{args.size} images, CPU, torch threads={torch.get_num_threads()}")
+        print(f"{'batch':>6} {'workers':>8} {'seconds':>9} {'images/sec':>11}")
+
+        runs = [(1, 1)] + [(int(b), args.workers) for b in args.batch_sizes.split(",")]
+        for batch_size, workers in runs:
+            embedder = ClipEmbedder(device="cpu", batch_size=batch_size, preprocess_workers=workers, use_cache=False)
+            embedder.embed_images(paths[:min(batch_size, len(paths))])  # warm-up
+            start = time.perf_counter()
+            vectors = embedder.embed_images(paths)
+            elapsed = time.perf_counter() - start
+            embedder.close()
+            assert len(vectors) == len(paths)
+            label = f"{batch_size}" + (" (seq)" if workers == 1 else "")
+            print(f"{label:>6} {workers:>8} {elapsed:>9.2f} {len(paths) / elapsed:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Quantization recall/latency benchmark
+
+Copies a sample of an existing collection's vectors into temporary
+collections, one per storage setting (full float32 in RAM, scalar int8,
+binary; optionally with on-disk originals and custom HNSW settings), and
+runs the same queries against each. Queries are held-out points from the
+source collection, so they look like real chunk embeddings.
+
+Recall@k is measured against exact (brute-force, unquantized) search over
+the same sample; latency is wall-clock per search call as the retriever
+issues it.
+
+Usage:
+    python Ingestion/benchmark_quantization.py --collection New_Collection --sample 5000 --queries 200 --top-k 10
+    python Ingestion/benchmark_quantization.py --configs none,scalar,binary --on-disk --oversampling 3
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.collection_config import collection_params, exact_search_params, search_params
+
+
+def sample_vectors(client, collection_name, count, seed):
+    """Read up to `count` vectors from the collection, in random order."""
+    vectors, offset = [], None
+    while len(vectors) < count:
+        points, offset = client.scroll(collection_name=collection_name, limit=256, offset=offset,
+                                       with_payload=False, with_vectors=True)
+        vectors.extend(p.vector for p in points)
+        if offset is None:
+            break
+    random.Random(seed).shuffle(vectors)
+    return vectors[:count]
+
+
+def wait_until_indexed(client, collection_name, timeout=600):
+    start = time.time()
+    while time.time() - start < timeout:
+        if client.get_collection(collection_name).status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+    print(f"   ⚠️  '{collection_name}' still optimizing after {timeout}s; results may include unindexed segments")
+
+
+def build_collection(client, name, vectors, distance, quantization, on_disk, hnsw_m, hnsw_ef_construct):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    params = collection_params(len(vectors[0]), distance, quantization, on_disk, hnsw_m, hnsw_ef_construct)
+    client.create_collection(collection_name=name, **params)
+    for start in range(0, len(vectors), 256):
+        client.upsert(collection_name=name, points=[
+            models.PointStruct(id=start + i, vector=vector) for i, vector in enumerate(vectors[start:start + 256])
+        ])
+    wait_until_indexed(client, name)
+
+
+def run_queries(client, name, queries, top_k, params):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = client.search(collection_name=name, query_vector=query, limit=top_k,
+                             with_payload=False, search_params=params)
+        latencies.append(time.perf_counter() - start)
+        results.append([hit.id for hit in hits])
+    return results, np.array(latencies) * 1000
+
+
+def recall_at_k(results, truth, top_k):
+    return float(np.mean([len(set(r) & set(t[:top_k])) / max(len(t[:top_k]), 1) for r, t in zip(results, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall@k and latency across vector storage settings")
+    parser.add_argument("--collection", default="New_Collection", help="Collection to sample vectors from")
+    parser.add_argument("--sample", type=int, default=5000, help="Vectors indexed per configuration (default: 5000)")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out query vectors (default: 200)")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument("--configs", default="none,scalar,binary", help="Quantization settings to compare (default: none,scalar,binary)")
+    parser.add_argument("--on-disk", action="store_true", help="Store original vectors on disk for the quantized configs")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW edges per node for every config")
+    parser.add_argument("--hnsw-ef-construct", type=int, help="HNSW build-time candidate list size for every config")
+    parser.add_argument("--oversampling", type=float, default=None, help="Quantized search oversampling (default: QDRANT_OVERSAMPLING or 2.0)")
+    parser.add_argument("--hnsw-ef", type=int, default=None, help="Search-time HNSW candidate list size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default=os.getenv("QDRANT_HOST", "localhost"), help="Qdrant server host")
+    parser.add_argument("--port", type=int, default=int(os.getenv("QDRANT_PORT", 6333)), help="Qdrant server port")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary benchmark collections")
+    args = parser.parse_args()
+
+    client = QdrantClient(host=args.host, port=args.port)
+    source = client.get_collection(args.collection)
+    vectors = sample_vectors(client, args.collection, args.sample + args.queries, args.seed)
+    if len(vectors) <= args.queries:
+        print(f"Error: '{args.collection}' has only {len(vectors)} vectors; need more than --queries ({args.queries})")
+        sys.exit(1)
+    queries, corpus = vectors[:args.queries], vectors[args.queries:]
+    distance = source.config.params.vectors.distance
+    print(f"{len(corpus)} vectors ({len(corpus[0])}-dim) from '{args.collection}', {len(queries)} queries, top-{args.top_k}")
+
+    configs = [c.strip() for c in args.configs.split(",") if c.strip()]
+    names = {config: f"{args.collection}__bench_{config}" for config in configs}
+    truth = None
+    rows = []
+    try:
+        for config in configs:
+            name = names[config]
+            on_disk = args.on_disk and config != "none"
+            print(f"Building '{name}' (quantization={config}, on_disk={on_disk})...")
+            start = time.perf_counter()
+            build_collection(client, name, corpus, distance, config, on_disk, args.hnsw_m, args.hnsw_ef_construct)
+            build_seconds = time.perf_counter() - start
+
+            if truth is None:
+                truth, _ = run_queries(client, name, queries, args.top_k, exact_search_params())
+            run_queries(client, name, queries[:10], args.top_k, search_params())  # warm-up
+            results, latencies = run_queries(client, name, queries, args.top_k,
+                                             search_params(oversampling=args.oversampling, hnsw_ef=args.hnsw_ef))
+            rows.append((config, on_disk, recall_at_k(results, truth, args.top_k),
+                         np.percentile(latencies, 50), np.percentile(latencies, 95), build_seconds))
+    finally:
+        if not args.keep:
+            for name in names.values():
+                if client.collection_exists(name):
+                    client.delete_collection(name)
+
+    print(f"\n{'quantization':>12} {'on_disk':>8} {f'recall@{args.top_k}':>10} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for config, on_disk, recall, p50, p95, build_seconds in rows:
+        print(f"{config:>12} {str(on_disk):>8} {recall:>10.3f} {p50:>8.2f} {p95:>8.2f} {build_seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
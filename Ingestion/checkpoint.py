@@ -0,0 +1,218 @@
+"""
+Ingestion checkpoint manifest.
+
+One JSON manifest per collection records, for every ingested file, its
+content hash, the point id range it was given and how many units (PDF pages,
+or the whole file for other types) are durably in Qdrant. ingest_folder
+updates it after each upsert batch, so a crashed run can resume where it
+stopped instead of re-embedding the whole folder. Each save writes a temp
+file and renames it over the manifest, so a crash never leaves it half-written.
+"""
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from qdrant_client.http import models
+
+PARTIAL = "partial"
+FAILED = "failed"
+COMPLETE = "complete"
+
+
+def checkpoint_path(collection_name):
+    """Location of the checkpoint manifest for a collection."""
+    checkpoint_dir = os.getenv(
+        "INGEST_CHECKPOINT_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ingest_checkpoints")
+    )
+    return os.path.join(checkpoint_dir, f"{collection_name}.json")
+
+
+def file_hash(path):
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _now():
+    return datetime.datetime.now().isoformat()
+
+
+class IngestManifest:
+    def __init__(self, path, collection_name):
+        self.path = path
+        self._lock = threading.RLock()
+        self.data = {"version": 1, "collection": collection_name, "updated_at": None, "files": {}}
+
+    @classmethod
+    def load(cls, path, collection_name):
+        manifest = cls(path, collection_name)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                manifest.data = json.load(f)
+        return manifest
+
+    @property
+    def files(self):
+        return self.data["files"]
+
+    def save(self):
+        """Write the manifest atomically."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self.data["updated_at"] = _now()
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def next_free_point_id(self):
+        """First point id above every range the manifest has handed out."""
+        with self._lock:
+            ends = [
+                entry["end_point_id"] if entry["end_point_id"] is not None else entry["next_point_id"]
+                for entry in self.files.values()
+            ]
+        return max(ends, default=0)
+
+    def plan(self, filename, content_hash, resume):
+        """
+        Decide what to do with a file.
+
+        Returns ("skip", entry), ("resume", entry) or ("ingest", old_entry_or_None).
+        A partial file is resumed inside its own id range. A range that was never
+        closed can only belong to the most recent file, which may still grow
+        without overlapping another file. Failed files are re-ingested.
+        """
+        with self._lock:
+            entry = self.files.get(filename)
+            if not resume or entry is None or entry["hash"] != content_hash:
+                return "ingest", entry
+            if entry["status"] == COMPLETE:
+                return "skip", entry
+            is_latest = all(other["first_point_id"] <= entry["first_point_id"] for other in self.files.values())
+            if entry["status"] == PARTIAL and (entry["end_point_id"] is not None or is_latest):
+                return "resume", entry
+            return "ingest", entry
+
+    def start_file(self, filename, content_hash, first_point_id, unit):
+        with self._lock:
+            self.files[filename] = {
+                "hash": content_hash,
+                "status": PARTIAL,
+                "unit": unit,
+                "units_done": 0,
+                "first_point_id": first_point_id,
+                "next_point_id": first_point_id,
+                "end_point_id": None,
+                "updated_at": _now(),
+            }
+
+    def close_range(self, filename, end_point_id):
+        """Record the end of a file's id range once all of its points have been numbered."""
+        with self._lock:
+            entry = self.files.get(filename)
+            if entry is not None and entry["end_point_id"] is None:
+                entry["end_point_id"] = end_point_id
+
+    def record_progress(self, filename, units_done, next_point_id, complete=False):
+        """Mark `units_done` units (and every point id below `next_point_id`) as stored."""
+        with self._lock:
+            entry = self.files.get(filename)
+            if entry is None or entry["status"] != PARTIAL:
+                return
+            entry["units_done"] = units_done
+            entry["next_point_id"] = next_point_id
+            if complete:
+                entry["status"] = COMPLETE
+                entry["end_point_id"] = next_point_id
+            entry["updated_at"] = _now()
+
+    def mark_failed(self, filename, end_point_id):
+        """Close a file's id range after an error; --resume re-ingests it from scratch."""
+        with self._lock:
+            entry = self.files.get(filename)
+            if entry is None:
+                return
+            entry["status"] = FAILED
+            # A closed range may already be followed by other files' ranges
+            if entry["end_point_id"] is None:
+                entry["end_point_id"] = max(end_point_id, entry["next_point_id"])
+            entry["updated_at"] = _now()
+
+    def owner(self, point_id):
+        """Name of the file whose id range contains `point_id` (None if no range does)."""
+        with self._lock:
+            best = None
+            for name, entry in self.files.items():
+                end = entry["end_point_id"]
+                if entry["first_point_id"] <= point_id and (end is None or point_id < end):
+                    if best is None or entry["first_point_id"] > self.files[best]["first_point_id"]:
+                        best = name
+            return best
+
+    def forget(self, filename):
+        with self._lock:
+            self.files.pop(filename, None)
+
+    def verify(self, client, collections, batch_size=256):
+        """
+        Reconcile the manifest against Qdrant.
+
+        Every id below a file's `next_point_id` must exist in one of `collections`.
+        Files with missing points are marked failed so --resume re-ingests them.
+        Returns {filename: number of missing points}.
+        """
+        missing_by_file = {}
+        with self._lock:
+            entries = list(self.files.items())
+        for filename, entry in entries:
+            expected = list(range(entry["first_point_id"], entry["next_point_id"]))
+            found = set()
+            for i in range(0, len(expected), batch_size):
+                ids = expected[i:i + batch_size]
+                for collection in collections:
+                    points = client.retrieve(collection_name=collection, ids=ids, with_payload=False, with_vectors=False)
+                    found.update(p.id for p in points)
+            missing = len(expected) - len(found)
+            missing_by_file[filename] = missing
+            if missing:
+                self.mark_failed(filename, entry["next_point_id"])
+            print(f"   {'✅' if not missing else '❌'} {filename}: {entry['status']}, "
+                  f"{entry['units_done']} {entry['unit']}(s), ids {entry['first_point_id']}-{entry['next_point_id']}, "
+                  f"{missing} missing")
+        self.save()
+        return missing_by_file
+
+
+def delete_file_points(client, collections, filename, entry):
+    """
+    Remove a file's previously ingested points before it is re-ingested under
+    a new id range. Returns the ids of every point deleted, so derived indexes
+    (e.g. the keyword index) can drop them too.
+    """
+    ids = list(range(entry["first_point_id"], entry["end_point_id"] if entry["end_point_id"] is not None else entry["next_point_id"]))
+    # Points written after the last checkpoint of a crashed run are outside the recorded range
+    name_filter = models.Filter(must=[
+        models.FieldCondition(key="file_name", match=models.MatchValue(value=filename))
+    ])
+    deleted = set(ids)
+    for collection in collections:
+        offset = None
+        while True:
+            points, offset = client.scroll(collection_name=collection, scroll_filter=name_filter, limit=1000,
+                                           offset=offset, with_payload=False, with_vectors=False)
+            deleted.update(p.id for p in points)
+            if offset is None:
+                break
+        if ids:
+            client.delete(collection_name=collection, points_selector=models.PointIdsList(points=ids))
+        client.delete(collection_name=collection, points_selector=models.FilterSelector(filter=name_filter))
+    return sorted(deleted)
@@ -1,39 +1,150 @@
+"""
+CLIP image/text embedding service.
+
+Vectors are CLIP's native 512-dim embeddings, L2-normalized, so image and
+text vectors from any process share one embedding space. (An earlier
+version projected them to 1536 dims through a randomly initialized layer
+that differed between processes; Ingestion/migrate_clip_collection.py
+re-embeds collections written that way.)
+
+Images are decoded and preprocessed on worker threads while the model runs
+the previous batch, and each batch goes through the model in one forward
+pass. Raw features are cached on disk by content hash.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
 import torch
 import clip
 from PIL import Image
-import torch.nn as nn
+from tools.embedding_cache import get_embedding_cache, cached_embed
+
+CLIP_MODEL_NAME = os.getenv("CLIP_MODEL_NAME", "ViT-B/32")
+CLIP_FEATURE_DIM = 512
+CLIP_BATCH_SIZE = int(os.getenv("CLIP_BATCH_SIZE", 32))
+CLIP_PREPROCESS_WORKERS = int(os.getenv("CLIP_PREPROCESS_WORKERS", 4))
+
+
+def _read_image(image):
+    """Accept a path, raw bytes or a PIL image."""
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, (bytes, bytearray)):
+        return Image.open(BytesIO(image))
+    return Image.open(image)
+
+
+def _image_bytes(image):
+    if isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    with open(image, "rb") as f:
+        return f.read()
+
+
+class ClipEmbedder:
+    def __init__(self, model_name=None, device=None, batch_size=None, preprocess_workers=None, use_cache=True):
+        self.model_name = model_name or CLIP_MODEL_NAME
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.batch_size = batch_size or CLIP_BATCH_SIZE
+        self.model, self.preprocess = clip.load(self.model_name, device=self.device)
+        self.model.eval()
+        self._pool = ThreadPoolExecutor(max_workers=preprocess_workers or CLIP_PREPROCESS_WORKERS,
+                                        thread_name_prefix="clip-preprocess")
+        # The loaded model's own output size (768 for ViT-L/14, for example), not the ViT-B/32 default
+        self.feature_dim = int(self.model.visual.output_dim)
+        self.image_cache = get_embedding_cache(f"clip-{self.model_name}-image", self.feature_dim) if use_cache else None
+        self.text_cache = get_embedding_cache(f"clip-{self.model_name}-text", self.feature_dim) if use_cache else None
+
+    def _preprocess_one(self, image):
+        return self.preprocess(_read_image(image).convert("RGB"))
+
+    def _encode_images(self, images):
+        """Raw CLIP features for images, one forward pass per batch."""
+        batches = [images[i:i + self.batch_size] for i in range(0, len(images), self.batch_size)]
+        features = []
+        # Preprocess the next batch on worker threads while the model runs the current one
+        pending = [self._pool.submit(self._preprocess_one, image) for image in batches[0]] if batches else []
+        for i in range(len(batches)):
+            tensors = [future.result() for future in pending]
+            if i + 1 < len(batches):
+                pending = [self._pool.submit(self._preprocess_one, image) for image in batches[i + 1]]
+            with torch.no_grad():
+                batch = torch.stack(tensors).to(self.device)
+                features.extend(self.model.encode_image(batch).float().cpu().numpy())
+        return features
+
+    def _encode_texts(self, texts):
+        features = []
+        for i in range(0, len(texts), self.batch_size):
+            with torch.no_grad():
+                tokens = clip.tokenize(texts[i:i + self.batch_size], truncate=True).to(self.device)
+                features.extend(self.model.encode_text(tokens).float().cpu().numpy())
+        return features
 
-# Load CLIP model and preprocessing only once
-_device = "cuda" if torch.cuda.is_available() else "cpu"
-_clip_model, _preprocess = clip.load("ViT-B/32", device=_device)
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).tolist()
+
+    def embed_images(self, images):
+        """
+        Embed images given as file paths or raw bytes.
+        Returns one normalized 512-dim vector per image, in input order.
+        """
+        if not images:
+            return []
+        if self.image_cache is None:
+            return self._normalize(self._encode_images(list(images)))
+        contents = [_image_bytes(image) for image in images]
+        return self._normalize(cached_embed(self.image_cache, contents, self._encode_images))
+
+    def embed_texts(self, texts):
+        """Embed texts into the same space as images. Returns normalized 512-dim vectors."""
+        if not texts:
+            return []
+        return self._normalize(cached_embed(self.text_cache, list(texts), self._encode_texts))
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_clip_embedder():
+    """Shared embedder, loaded on first use."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = ClipEmbedder()
+        return _embedder
+
+
+def embed_images_clip(image_paths):
+    """Embed a batch of images using CLIP"""
+    return get_clip_embedder().embed_images(image_paths)
+
+
+def embed_texts_clip(texts):
+    """Embed a batch of texts using CLIP"""
+    return get_clip_embedder().embed_texts(texts)
 
-# Create projection layer to convert 512-dim to 1536-dim
-_projection_layer = nn.Linear(512, 1536).to(_device)
 
 def embed_image_clip(image_path):
-    """Embed image using CLIP and project to 1536 dimensions"""
-    image = _preprocess(Image.open(image_path)).unsqueeze(0).to(_device)
-    with torch.no_grad():
-        # Get 512-dim CLIP embedding
-        image_features = _clip_model.encode_image(image)
-        # Project to 1536 dimensions
-        projected_features = _projection_layer(image_features)
-        # Normalize the projected features
-        projected_features = torch.nn.functional.normalize(projected_features, p=2, dim=1)
-    return projected_features.cpu().numpy().flatten().tolist()
+    """Embed image using CLIP"""
+    return embed_images_clip([image_path])[0]
+
 
 def embed_text_clip(text):
-    """Embed text using CLIP and project to 1536 dimensions"""
-    text_tokens = clip.tokenize([text]).to(_device)
-    with torch.no_grad():
-        # Get 512-dim CLIP embedding
-        text_features = _clip_model.encode_text(text_tokens)
-        # Project to 1536 dimensions
-        projected_features = _projection_layer(text_features)
-        # Normalize the projected features
-        projected_features = torch.nn.functional.normalize(projected_features, p=2, dim=1)
-    return projected_features.cpu().numpy().flatten().tolist()
+    """Embed text using CLIP"""
+    return embed_texts_clip([text])[0]
+
 
 def get_clip_dimension():
-    """Get the output dimension of the projected CLIP embeddings"""
-    return 1536 
\ No newline at end of file
+    """Get the output dimension of the CLIP embeddings"""
+    return CLIP_FEATURE_DIM
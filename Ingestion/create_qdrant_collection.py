@@ -5,15 +5,31 @@ Qdrant Collection Creation Script
 This script creates a new Qdrant collection with specified parameters.
 It can be used to create custom collections for different document sets
 or different embedding models.
+
+Large collections (e.g. 4096-dim llama2 embeddings) can keep a scalar or
+binary quantized copy of the vectors in RAM with the originals on disk:
+
+    python Ingestion/create_qdrant_collection.py New_Collection --vector-size 4096 --quantization scalar --on-disk
+
+Existing collections are moved to new settings with migrate_collection_storage.py.
 """
 
 import argparse
 import sys
 import os
 from qdrant_client import QdrantClient
-from qdrant_client.http import models
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.payload_schema import INGESTION_PAYLOAD_SCHEMA, DOCUMENTS_PAYLOAD_SCHEMA, ensure_payload_indexes
+from tools.collection_config import DISTANCES, QUANTIZATION_TYPES, collection_params
+
+PAYLOAD_SCHEMAS = {
+    "ingestion": INGESTION_PAYLOAD_SCHEMA,
+    "documents": DOCUMENTS_PAYLOAD_SCHEMA
+}
+
 # Load environment variables
 load_dotenv()
 
@@ -23,7 +39,12 @@ def create_collection(
     distance="cosine", 
     host=None, 
     port=None,
-    with_payload=True
+    with_payload=True,
+    schema="ingestion",
+    quantization="none",
+    on_disk=False,
+    hnsw_m=None,
+    hnsw_ef_construct=None
 ):
     """
     Create a new Qdrant collection with the specified parameters.
@@ -35,6 +56,11 @@ def create_collection(
         host (str): Qdrant server host
         port (int): Qdrant server port
         with_payload (bool): Whether to create payload indexes
+        schema (str): Payload index schema to apply ("ingestion" or "documents")
+        quantization (str): Vector quantization kept in RAM ("none", "scalar" int8 or "binary")
+        on_disk (bool): Store the original float32 vectors on disk
+        hnsw_m (int): HNSW edges per node (Qdrant default: 16)
+        hnsw_ef_construct (int): HNSW build-time candidate list size (Qdrant default: 100)
     
     Returns:
         bool: True if collection was created successfully, False otherwise
@@ -43,15 +69,10 @@ def create_collection(
     host = host or os.getenv("QDRANT_HOST", "localhost")
     port = port or int(os.getenv("QDRANT_PORT", 6333))
     
-    # Map string distance name to Qdrant Distance enum
-    distance_map = {
-        "cosine": models.Distance.COSINE,
-        "euclid": models.Distance.EUCLID,
-        "dot": models.Distance.DOT
-    }
-    
-    if distance not in distance_map:
-        print(f"Error: Invalid distance metric '{distance}'. Must be one of: {', '.join(distance_map.keys())}")
+    try:
+        params = collection_params(vector_size, distance, quantization, on_disk, hnsw_m, hnsw_ef_construct)
+    except ValueError as e:
+        print(f"Error: {e}")
         return False
     
     try:
@@ -74,45 +95,16 @@ def create_collection(
                 return False
         
         # Create the collection
-        print(f"Creating collection '{collection_name}' with vector size {vector_size}...")
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config=models.VectorParams(
-                size=vector_size,
-                distance=distance_map[distance]
-            ),
-            optimizers_config=models.OptimizersConfigDiff(
-                indexing_threshold=0  # Create index immediately
-            )
-        )
+        print(f"Creating collection '{collection_name}' with vector size {vector_size} "
+              f"(quantization={quantization}, on_disk={on_disk})...")
+        client.create_collection(collection_name=collection_name, **params)
         
-        # Create payload indexes for common fields if requested
+        # Create payload indexes from the shared schema if requested
         if with_payload:
-            print("Creating payload indexes...")
-            payload_indexes = [
-                models.PayloadSchemaType.KEYWORD,  # For exact match
-                models.PayloadSchemaType.TEXT      # For full-text search
-            ]
-            
-            # Common fields to index
-            fields_to_index = [
-                "text",         # Document text
-                "source",       # Document source
-                "file_name",    # File name
-                "page_number",  # Page number
-                "title"         # Document title
-            ]
-            
-            for field in fields_to_index:
-                for schema_type in payload_indexes:
-                    try:
-                        client.create_payload_index(
-                            collection_name=collection_name,
-                            field_name=field,
-                            field_schema=schema_type
-                        )
-                    except Exception as e:
-                        print(f"Warning: Could not create index for {field}: {e}")
+            print(f"Creating payload indexes ({schema} schema)...")
+            failed = ensure_payload_indexes(client, collection_name, PAYLOAD_SCHEMAS[schema])
+            for field, error in failed.items():
+                print(f"Warning: Could not create index for {field}: {error}")
         
         print(f"✅ Collection '{collection_name}' created successfully!")
         return True
@@ -126,12 +118,20 @@ def main():
     parser.add_argument("collection_name", help="Name of the collection to create")
     parser.add_argument("--vector-size", type=int, default=1536, 
                         help="Dimensionality of the vectors (default: 1536)")
-    parser.add_argument("--distance", choices=["cosine", "euclid", "dot"], default="cosine",
+    parser.add_argument("--distance", choices=list(DISTANCES), default="cosine",
                         help="Distance metric to use (default: cosine)")
     parser.add_argument("--host", help="Qdrant server host (default: from env or localhost)")
     parser.add_argument("--port", type=int, help="Qdrant server port (default: from env or 6333)")
     parser.add_argument("--no-payload-indexes", action="store_true", 
                         help="Don't create payload indexes")
+    parser.add_argument("--schema", choices=list(PAYLOAD_SCHEMAS), default="ingestion",
+                        help="Payload index schema: ingestion (ingest_v2 collections) or documents (chat backend uploads)")
+    parser.add_argument("--quantization", choices=list(QUANTIZATION_TYPES), default="none",
+                        help="Quantized vector copy kept in RAM: scalar (int8, 4x smaller) or binary (32x smaller)")
+    parser.add_argument("--on-disk", action="store_true",
+                        help="Store original vectors on disk; they are only read to rescore candidates")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW edges per node (default: Qdrant's 16)")
+    parser.add_argument("--hnsw-ef-construct", type=int, help="HNSW build-time candidate list size (default: Qdrant's 100)")
     
     args = parser.parse_args()
     
@@ -141,7 +141,12 @@ def main():
         distance=args.distance,
         host=args.host,
         port=args.port,
-        with_payload=not args.no_payload_indexes
+        with_payload=not args.no_payload_indexes,
+        schema=args.schema,
+        quantization=args.quantization,
+        on_disk=args.on_disk,
+        hnsw_m=args.hnsw_m,
+        hnsw_ef_construct=args.hnsw_ef_construct
     )
     
     sys.exit(0 if success else 1)
@@ -8,15 +8,21 @@ import base64
 import ollama
 import requests
 import shutil
+import argparse
+import time
 
 # Add the current directory to the path so we can import from tools
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from tools.embedder import embed_chunks
+from tools.embedder import embed_batch, embedding_dimension, embedding_version, EMBED_BATCH_SIZE
 from tools.chunker import chunk_text
+from tools.bm25_index import BM25Index, keyword_index_path
+from tools.payload_schema import INGESTION_PAYLOAD_SCHEMA, ensure_payload_indexes
 import tools.loader as loader
-from Ingestion.clip_embedder import embed_image_clip
+from Ingestion.clip_embedder import embed_image_clip, embed_images_clip, get_clip_dimension
 from Ingestion.markdown_converter import convert_to_markdown
+from Ingestion.pdf_pipeline import PdfPagePipeline, BackgroundWriter, StageStats, print_stage_report
+from Ingestion.checkpoint import IngestManifest, checkpoint_path, file_hash, delete_file_points
 import re
 from tools.loader import is_scanned_pdf
 
@@ -168,7 +174,14 @@ def load_pdf_with_type_detection(pdf_path):
         # Digital: use existing loader
         return loader.load_pdf(pdf_path)
 
-def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4096, batch_size=500):
+def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=None, batch_size=500, resume=False):
+    """
+    Ingest every file in `folder_path`.
+
+    Progress is checkpointed to a manifest after each upsert batch. With
+    `resume`, files already completed with the same content are skipped and an
+    interrupted file continues from its last checkpointed page.
+    """
     # Use Qdrant connection info from environment or docker-compose defaults
     qdrant_host = os.environ.get("QDRANT_HOST", "localhost")
     qdrant_port = os.environ.get("QDRANT_PORT", "6333")
@@ -181,9 +194,31 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
     if clip_collection not in [c.name for c in existing_collections]:
         clip_client.create_collection(
             collection_name=clip_collection,
-            vectors_config=models.VectorParams(size=embedding_dim, distance=models.Distance.COSINE),
+            vectors_config=models.VectorParams(size=get_clip_dimension(), distance=models.Distance.COSINE),
             optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0)
         )
+    else:
+        clip_size = clip_client.get_collection(clip_collection).config.params.vectors.size
+        if clip_size != get_clip_dimension():
+            raise RuntimeError(
+                f"'{clip_collection}' stores {clip_size}-dim vectors but CLIP embeddings are {get_clip_dimension()}-dim; "
+                f"run Ingestion/migrate_clip_collection.py first"
+            )
+    existing_names = {c.name for c in client.get_collections().collections}
+    embedding_dim = embedding_dim or embedding_dimension()
+    if collection_name in existing_names:
+        text_size = client.get_collection(collection_name).config.params.vectors.size
+        if text_size != embedding_dim:
+            raise RuntimeError(
+                f"'{collection_name}' stores {text_size}-dim vectors but text embeddings are {embedding_dim}-dim; "
+                f"check EMBED_PROJECTION or ingest into a new collection"
+            )
+    text_embedding_version = embedding_version()
+    for name in (collection_name, clip_collection):
+        if name not in existing_names:
+            continue
+        for field, error in ensure_payload_indexes(client, name, INGESTION_PAYLOAD_SCHEMA).items():
+            print(f"[WARNING] Could not create payload index for {field} on {name}: {error}")
 
     list_fields = [
         "keywords", "other_brands", "dates", "serial_nums",
@@ -201,79 +236,163 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
         "image_ocr_text", "clip_embeddings_found"
     ]
 
-    point_id = 0
+    # Keyword index is updated alongside every upsert so BM25 search never lags Qdrant
+    keyword_index = BM25Index.load(keyword_index_path(collection_name))
+
+    def write_text_points(batch):
+        client.upsert(collection_name=collection_name, points=batch)
+        keyword_index.add_many((p.id, (p.payload or {}).get("text", "")) for p in batch)
+
+    # Upserts run on a background thread so embedding the next batch overlaps the write
+    writer = BackgroundWriter("upsert")
+    embed_stats = StageStats("embed")
+    clip_stats = StageStats("clip")
+    pdf_pipeline = None
+
+    # Checkpoints: each file gets its own point id range recorded in the manifest
+    manifest = IngestManifest.load(checkpoint_path(collection_name), collection_name)
+    progress = []  # (highest queued point id, filename, units_done, next_point_id, complete)
+    failed_files = set()
+    write_failed_files = set()  # files with a failed upsert, filled on the writer thread
+
+    def on_write_error(batch):
+        def record(error):
+            names = {manifest.owner(p.id) for p in batch} - {None}
+            write_failed_files.update(names)
+            print(f"[ERROR] Upsert failed for {', '.join(sorted(names)) or 'unknown files'}; they will be re-ingested")
+        return record
+
+    def save_checkpoint(marks):
+        # Runs on the writer thread after the upserts it covers; a file with a
+        # failed upsert must never be recorded as stored
+        for _, name, units_done, next_id, complete in marks:
+            if name not in write_failed_files:
+                manifest.record_progress(name, units_done, next_id, complete)
+        # The keyword index is persisted first so the manifest never gets ahead of it
+        if keyword_index.dirty:
+            keyword_index.save()
+        manifest.save()
+
+    def commit_progress(upserted_top=None):
+        """Checkpoint every mark whose points are queued for upsert ahead of it."""
+        durable = [m for m in progress if upserted_top is None or m[0] <= upserted_top]
+        if durable:
+            progress[:] = [m for m in progress if m not in durable]
+            # The writer runs tasks in order, so this save lands after those upserts
+            writer.submit(save_checkpoint, durable, items=0)
+
+    def apply_write_failures():
+        for name in list(write_failed_files - failed_files):
+            mark_failed(name)
+
+    def mark_progress(name, units_done, complete=False):
+        apply_write_failures()
+        if name in failed_files:
+            return
+        queued_top = max(pending_text[-1][0] if pending_text else -1, points[-1].id if points else -1)
+        progress.append((queued_top, name, units_done, point_id, complete))
+        if complete:
+            manifest.close_range(name, point_id)
+
+    def mark_failed(name):
+        failed_files.add(name)
+        progress[:] = [m for m in progress if m[1] != name]
+        manifest.mark_failed(name, point_id)
+
+    def upsert_text_points(batch):
+        writer.submit(write_text_points, batch, items=len(batch), on_error=on_write_error(batch))
+        commit_progress(max(p.id for p in batch))
+
+    point_id = manifest.next_free_point_id()
     points = []
-
-    for filename in os.listdir(folder_path):
+    pending_text = []  # (point_id, payload) waiting for one batched embedding call
+    current_file = None
+
+    def flush_pending_text():
+        """Embed all pending chunks in one batch request and queue them for upsert."""
+        nonlocal points
+        if not pending_text:
+            return
+        try:
+            start = time.perf_counter()
+            embeddings = embed_batch([payload["text"] for _, payload in pending_text])
+            embed_stats.record(len(pending_text), time.perf_counter() - start)
+        except Exception as e:
+            print(f"[ERROR] Batch embedding failed for {len(pending_text)} chunks: {e}")
+            pending_text.clear()
+            mark_failed(current_file)
+            return
+        for (pid, payload), embedding in zip(pending_text, embeddings):
+            payload["embedding_version"] = text_embedding_version
+            points.append(models.PointStruct(id=pid, vector=embedding, payload=payload))
+        pending_text.clear()
+        if len(points) >= batch_size:
+            upsert_text_points(points)
+            print(f"Queued {len(points)} points for upsert to Qdrant.")
+            points = []
+
+    # Plan every file up front; an interrupted file is resumed before new id ranges are handed out
+    work = []
+    for filename in sorted(os.listdir(folder_path)):
         filepath = os.path.join(folder_path, filename)
         if not os.path.isfile(filepath):
             continue
+        content_hash = file_hash(filepath)
+        action, entry = manifest.plan(filename, content_hash, resume)
+        if action == "skip":
+            print(f"⏭️  Skipping '{filename}' (already ingested, ids {entry['first_point_id']}-{entry['end_point_id']})")
+            continue
+        work.append((action != "resume", filename, filepath, content_hash, action, entry))
+    # Resumed files go first, in id order, so the one with an open range is finished before new ranges start
+    work.sort(key=lambda item: (item[0], item[5]["first_point_id"] if item[4] == "resume" else 0))
 
+    for _, filename, filepath, content_hash, action, entry in work:
         ext = os.path.splitext(filename)[1].lower()
         filetype = ext.replace('.', '')
         original_filename = filename
-        
+        current_file = filename
+        start_page = 0
+
+        if action == "resume":
+            point_id = entry["next_point_id"]
+            start_page = entry["units_done"] if entry["unit"] == "page" else 0
+            if entry["unit"] != "page":
+                point_id = entry["first_point_id"]
+            print(f"⏯️  Resuming '{filename}' at {entry['unit']} {start_page+1}, point id {point_id}")
+        else:
+            if entry is not None:
+                old_ids = delete_file_points(client, [collection_name, clip_collection], filename, entry)
+                keyword_index.remove(old_ids)
+                print(f"🧹 Removed previous points of '{filename}' (ids {entry['first_point_id']}-{entry['next_point_id']})")
+            point_id = max(point_id, manifest.next_free_point_id())
+            manifest.start_file(filename, content_hash, point_id, "page" if ext == ".pdf" else "file")
+
         try:
             if ext == ".pdf":
                 # --- PAGE-WISE INGESTION WITH IMAGE PLACEHOLDERS ---
+                # Pages are extracted and their images described in parallel, but arrive
+                # here in page order so point ids match a sequential run
                 pdf_base = os.path.splitext(filename)[0]
                 image_dir = os.path.join(folder_path, pdf_base)
                 if not os.path.exists(image_dir):
                     os.makedirs(image_dir)
-                doc = loader.fitz.open(filepath)
-                print(f"[DEBUG] PDF '{filename}' has {len(doc)} pages.")
-                for page_num in range(len(doc)):
-                    page = doc[page_num]
+                if pdf_pipeline is None:
+                    pdf_pipeline = PdfPagePipeline(describe_image_with_openai)
+                pages_done = start_page
+                for page in pdf_pipeline.pages(filepath, image_dir, start_page=start_page):
+                    # A file already marked for re-ingestion is abandoned: anything
+                    # more written for it would be orphaned by the next run
+                    if filename in failed_files:
+                        pending_text.clear()
+                        break
+                    page_num = page["page_num"]
                     print(f"[DEBUG] Processing page {page_num+1} of '{filename}'")
-                    text = page.get_text().strip()
-                    images = page.get_images(full=True)
-                    print(f"[DEBUG] Found {len(images)} images on page {page_num+1}.")
-                    page_content = text
+                    print(f"[DEBUG] Extracted {len(page['images'])} images on page {page_num+1}.")
+                    page_content = page["text"]
                     image_placeholders = []
-                    for img_idx, img in enumerate(images, start=1):
-                        xref = img[0]
-                        img_base = f"page_{page_num+1}_img_{img_idx}.png"
-                        img_path = os.path.join(image_dir, img_base)
-                        try:
-                            pix = loader.fitz.Pixmap(doc, xref)
-                            try:
-                                # Handle different colorspaces
-                                if pix.n >= 5:  # CMYK or other complex colorspace
-                                    pix_converted = loader.fitz.Pixmap(loader.fitz.csRGB, pix)
-                                    pix_converted.save(img_path)
-                                    pix_converted = None
-                                elif pix.colorspace and pix.colorspace.name in ['DeviceGray', 'DeviceRGB']:
-                                    pix.save(img_path)
-                                else:
-                                    # Convert to RGB for unsupported colorspaces
-                                    pix_rgb = loader.fitz.Pixmap(loader.fitz.csRGB, pix)
-                                    pix_rgb.save(img_path)
-                                    pix_rgb = None
-                            except Exception as save_error:
-                                # Fallback: try saving as JPEG instead of PNG
-                                img_base_jpg = f"page_{page_num+1}_img_{img_idx}.jpg"
-                                img_path_jpg = os.path.join(image_dir, img_base_jpg)
-                                try:
-                                    if pix.n >= 5:
-                                        pix_converted = loader.fitz.Pixmap(loader.fitz.csRGB, pix)
-                                        pix_converted.save(img_path_jpg)
-                                        pix_converted = None
-                                    else:
-                                        pix.save(img_path_jpg)
-                                    img_path = img_path_jpg  # Use JPG path instead
-                                    img_base = img_base_jpg
-                                except Exception as jpg_error:
-                                    print(f"[WARNING] Failed to save image as both PNG and JPG: {save_error}, {jpg_error}")
-                                    raise save_error
-                            finally:
-                                pix = None
-                            # Generate description
-                            description = describe_image_with_openai(img_path)
-                            placeholder = f"{{Image_{img_idx} {os.path.join(pdf_base, img_base)} description: {description}}}"
-                            image_placeholders.append((img_idx, placeholder, img_path))
-                        except Exception as e:
-                            print(f"[WARNING] Failed to extract/save image {img_idx} on page {page_num+1} of {filename}: {e}")
-                            continue
+                    for img_idx, img_base, img_path, description in page["images"]:
+                        placeholder = f"{{Image_{img_idx} {os.path.join(pdf_base, img_base)} description: {description}}}"
+                        image_placeholders.append((img_idx, placeholder, img_path))
                     # Insert image placeholders in text (append at end if not found)
                     for img_idx, placeholder, _ in image_placeholders:
                         page_content += f"\n{placeholder}"
@@ -281,26 +400,26 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
                     metadata = get_additional_metadata(page_content, filename, filetype, page_number=page_num+1)
                     metadata['source'] = f"{filename} - Page {page_num+1}"
                     metadata['title'] = metadata['source']
-                    try:
-                        embedding = embed_chunks(page_content)
-                    except Exception as e:
-                        print(f"[ERROR] Embedding failed: {e}")
-                        continue
                     payload = {"text": page_content}
                     payload.update(metadata)
                     for field in list_fields:
                         if field in payload and not isinstance(payload[field], list):
                             payload[field] = [payload[field]] if payload[field] else []
-                    points.append(models.PointStruct(id=point_id, vector=embedding, payload=payload))
+                    pending_text.append((point_id, payload))
                     point_id += 1
-                    if len(points) >= batch_size:
-                        client.upsert(collection_name=collection_name, points=points)
-                        print(f"Upserted {len(points)} points to Qdrant.")
-                        points = []
-                    # Ingest CLIP embedding for each image in separate collection
-                    for img_idx, _, img_path in image_placeholders:
+                    if len(pending_text) >= EMBED_BATCH_SIZE:
+                        flush_pending_text()
+                    # Ingest CLIP embeddings for the page's images (one batched forward pass) in separate collection
+                    if image_placeholders:
                         try:
-                            clip_embedding = embed_image_clip(img_path)
+                            start = time.perf_counter()
+                            clip_embeddings = embed_images_clip([img_path for _, _, img_path in image_placeholders])
+                            clip_stats.record(len(image_placeholders), time.perf_counter() - start)
+                        except Exception as e:
+                            print(f"[WARNING] CLIP embedding failed for images on page {page_num+1} of {filename}: {e}")
+                            clip_embeddings = []
+                        clip_points = []
+                        for (img_idx, _, img_path), clip_embedding in zip(image_placeholders, clip_embeddings):
                             clip_metadata = metadata.copy()
                             clip_metadata.update({
                                 "vector_type": "clip",
@@ -310,12 +429,15 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
                                 "page_number": page_num+1,
                                 "image_index": img_idx
                             })
-                            clip_client.upsert(collection_name=clip_collection, points=[models.PointStruct(
-                                id=point_id, vector=clip_embedding, payload=clip_metadata
-                            )])
+                            clip_points.append(models.PointStruct(id=point_id, vector=clip_embedding, payload=clip_metadata))
                             point_id += 1
-                        except Exception as e:
-                            print(f"[WARNING] CLIP embedding failed for {img_path}: {e}")
+                        if clip_points:
+                            writer.submit(clip_client.upsert, collection_name=clip_collection, points=clip_points,
+                                          items=len(clip_points), on_error=on_write_error(clip_points))
+                    pages_done = page_num + 1
+                    mark_progress(filename, pages_done)
+                flush_pending_text()
+                mark_progress(filename, pages_done, complete=True)
                 continue  # Skip rest of loop for PDFs
             elif ext == ".json":
                 if "_enriched.json" in filename:
@@ -378,7 +500,9 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
                 
                 # 2. Enhanced CLIP image embedding with OCR text
                 try:
+                    start = time.perf_counter()
                     clip_embedding = embed_image_clip(filepath)
+                    clip_stats.record(1, time.perf_counter() - start)
                     
                     # Extract OCR text for the CLIP payload
                     ocr_text = text if text.strip() else "No OCR text available"
@@ -394,12 +518,10 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
                         "has_ocr": bool(ocr_text.strip() and ocr_text != "No OCR text available")
                     })
                     
-                    # Add CLIP embedding as a separate point
-                    points.append(models.PointStruct(
-                        id=point_id, 
-                        vector=clip_embedding, 
-                        payload=clip_metadata
-                    ))
+                    # Add CLIP embedding as a separate point in the CLIP collection
+                    clip_points = [models.PointStruct(id=point_id, vector=clip_embedding, payload=clip_metadata)]
+                    writer.submit(clip_client.upsert, collection_name=clip_collection, points=clip_points,
+                                  on_error=on_write_error(clip_points))
                     point_id += 1
                     print(f"Added enhanced CLIP embedding for {filename} with OCR text")
                 except Exception as e:
@@ -408,12 +530,6 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
                 # Continue with OCR chunks as before
                 for text, metadata in chunks_with_metadata:
                     print("DEBUG METADATA TYPE:", type(metadata), metadata)
-                    try:
-                        embedding = embed_chunks(text)
-                    except Exception as e:
-                        print(f"[ERROR] OCR embedding failed: {e}")
-                        continue
-
                     payload = {"text": text, "vector_type": "ocr"}
                     payload.update(metadata)
                     print("DEBUG PAYLOAD:", json.dumps(payload, indent=2, ensure_ascii=False))
@@ -422,13 +538,14 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
                         if field in payload and not isinstance(payload[field], list):
                             payload[field] = [payload[field]] if payload[field] else []
 
-                    points.append(models.PointStruct(id=point_id, vector=embedding, payload=payload))
+                    pending_text.append((point_id, payload))
                     point_id += 1
-
-                    if len(points) >= batch_size:
-                        client.upsert(collection_name=collection_name, points=points)
-                        print(f"Upserted {len(points)} points to Qdrant.")
-                        points = []
+                    if len(pending_text) >= EMBED_BATCH_SIZE:
+                        flush_pending_text()
+                        if filename in failed_files:
+                            break
+                flush_pending_text()
+                mark_progress(filename, 1, complete=True)
                 
                 # Skip the general processing loop for images since we handled them above
                 continue
@@ -438,19 +555,16 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
                 chunks_with_metadata = chunk_text_with_metadata(text, metadata=base_metadata)
             else:
                 print(f"[WARNING] Unsupported file type {ext}, skipping.")
+                manifest.forget(filename)
                 continue
         except Exception as e:
             print(f"[ERROR] Failed to process {filename}: {e}")
+            pending_text.clear()
+            mark_failed(filename)
             continue
 
         for text, metadata in chunks_with_metadata:
             print("DEBUG METADATA TYPE:", type(metadata), metadata)
-            try:
-                embedding = embed_chunks(text)
-            except Exception as e:
-                print(f"[ERROR] Embedding failed: {e}")
-                continue
-
             payload = {"text": text}
             payload.update(metadata)
             print("DEBUG PAYLOAD:", json.dumps(payload, indent=2, ensure_ascii=False))
@@ -484,13 +598,14 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
                 if field in payload and not isinstance(payload[field], list):
                     payload[field] = [payload[field]] if payload[field] else []
 
-            points.append(models.PointStruct(id=point_id, vector=embedding, payload=payload))
+            pending_text.append((point_id, payload))
             point_id += 1
-
-            if len(points) >= batch_size:
-                client.upsert(collection_name=collection_name, points=points)
-                print(f"Upserted {len(points)} points to Qdrant.")
-                points = []
+            if len(pending_text) >= EMBED_BATCH_SIZE:
+                flush_pending_text()
+                if filename in failed_files:
+                    break
+        flush_pending_text()
+        mark_progress(filename, 1, complete=True)
 
         # Clean up temporary markdown file if it was created
         if original_filename != filename and filepath.endswith("_converted.md"):
@@ -501,21 +616,62 @@ def ingest_folder(folder_path, collection_name="New_Collection", embedding_dim=4
                 print(f"[WARNING] Failed to clean up temporary file {filepath}: {e}")
 
     if points:
-        client.upsert(collection_name=collection_name, points=points)
-        print(f"Upserted final {len(points)} points to Qdrant.")
+        upsert_text_points(points)
+        print(f"Queued final {len(points)} points for upsert to Qdrant.")
+    commit_progress()
+
+    writer.close()
+    apply_write_failures()
+    if writer.failures:
+        print(f"[WARNING] {writer.failures} upsert batch(es) failed; {len(write_failed_files)} file(s) marked for re-ingestion")
+    stages = [embed_stats, clip_stats, writer.stats]
+    if pdf_pipeline is not None:
+        pdf_pipeline.close()
+        stages = [pdf_pipeline.stats["extract"], pdf_pipeline.stats["describe"]] + stages
+    print_stage_report(stages)
+
+    keyword_index.save()
+    print(f"Saved keyword index with {len(keyword_index)} chunks to {keyword_index.path}")
+
+    manifest.save()
+    print(f"Saved ingestion checkpoint to {manifest.path}")
 
     print(f"✅ Ingestion complete for folder '{folder_path}' into collection '{collection_name}'")
 
+def verify_ingestion(collection_name="New_Collection", clip_collection="New_Collection_CLIP"):
+    """Check that every checkpointed point id is present in Qdrant; mismatched files are marked for re-ingestion."""
+    qdrant_url = f"http://{os.environ.get('QDRANT_HOST', 'localhost')}:{os.environ.get('QDRANT_PORT', '6333')}"
+    client = QdrantClient(url=qdrant_url)
+    manifest = IngestManifest.load(checkpoint_path(collection_name), collection_name)
+    print(f"🔍 Verifying {len(manifest.files)} files in {manifest.path} against '{collection_name}' and '{clip_collection}'")
+    missing = manifest.verify(client, [collection_name, clip_collection])
+    bad = [name for name, count in missing.items() if count]
+    print(f"Verification finished: {len(missing) - len(bad)} files consistent, {len(bad)} marked for re-ingestion")
+    return missing
+
 if __name__ == "__main__":
-    folder_path = os.path.join(os.path.dirname(__file__), "files")
+    parser = argparse.ArgumentParser(description="Ingest a folder of documents into Qdrant")
+    parser.add_argument("--folder", default=os.path.join(os.path.dirname(__file__), "files"), help="Folder to ingest")
+    parser.add_argument("--collection", default="New_Collection", help="Target Qdrant collection")
+    parser.add_argument("--resume", action="store_true", help="Skip files already ingested and continue an interrupted file")
+    parser.add_argument("--verify", action="store_true", help="Reconcile the checkpoint manifest against Qdrant (combine with --resume to re-ingest what is missing)")
+    args = parser.parse_args()
+
+    if args.verify:
+        verify_ingestion(args.collection)
+        if not args.resume:
+            sys.exit(0)
+
+    folder_path = args.folder
     destination_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rag_frontend", "pdf"))
     if not os.path.exists(destination_folder):
         os.makedirs(destination_folder)
-    ingest_folder(folder_path)
-    # Move files after ingestion
+    ingest_folder(folder_path, collection_name=args.collection, resume=args.resume)
+    # Move files after ingestion; failed files stay behind so --resume can retry them
+    completed = IngestManifest.load(checkpoint_path(args.collection), args.collection).files
     for filename in os.listdir(folder_path):
         src_file = os.path.join(folder_path, filename)
         dst_file = os.path.join(destination_folder, filename)
-        if os.path.isfile(src_file):
+        if os.path.isfile(src_file) and completed.get(filename, {}).get("status") not in ("partial", "failed"):
             shutil.move(src_file, dst_file)
     print(f"Moved ingested files from {folder_path} to {destination_folder}")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+CLIP Collection Migration Script
+
+Older ingestion runs stored CLIP vectors projected to 1536 dimensions
+through a randomly initialized layer, so those vectors cannot be compared
+with anything embedded by another process. This script re-embeds every
+point of the CLIP collection from its `image_path` payload with the
+current native 512-dim CLIP embedder, keeping point ids and payloads.
+
+New vectors are written to a staging collection first; the original
+collection is only replaced once every image has been re-embedded. Points
+whose image cannot be read abort the swap, leaving the original collection
+untouched, unless --drop-missing is given.
+
+Usage:
+    python Ingestion/migrate_clip_collection.py --collection New_Collection_CLIP
+    python Ingestion/migrate_clip_collection.py --dry-run
+    python Ingestion/migrate_clip_collection.py --drop-missing
+"""
+
+import argparse
+import os
+import sys
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Ingestion.clip_embedder import ClipEmbedder, get_clip_dimension
+
+
+def iter_point_pages(client, collection_name, page_size, with_vectors=False):
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=page_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=with_vectors
+        )
+        if points:
+            yield points
+        if offset is None:
+            return
+
+
+def create_clip_collection(client, collection_name):
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=models.VectorParams(size=get_clip_dimension(), distance=models.Distance.COSINE)
+    )
+
+
+def migrate(collection_name, host, port, page_size=256, dry_run=False, force=False, drop_missing=False):
+    client = QdrantClient(host=host, port=port)
+    if not client.collection_exists(collection_name):
+        print(f"Error: Collection '{collection_name}' does not exist")
+        return False
+
+    size = client.get_collection(collection_name).config.params.vectors.size
+    if size == get_clip_dimension() and not force:
+        print(f"'{collection_name}' already stores {size}-dim vectors, nothing to migrate (use --force to re-embed)")
+        return True
+
+    staging = f"{collection_name}__migrating"
+    embedder = None if dry_run else ClipEmbedder()
+    if not dry_run:
+        create_clip_collection(client, staging)
+
+    migrated, skipped = 0, []
+    for points in iter_point_pages(client, collection_name, page_size):
+        usable = []
+        for point in points:
+            image_path = (point.payload or {}).get("image_path")
+            if image_path and os.path.isfile(image_path):
+                usable.append(point)
+            else:
+                skipped.append((point.id, image_path))
+        if dry_run or not usable:
+            migrated += len(usable)
+            continue
+
+        vectors = embedder.embed_images([p.payload["image_path"] for p in usable])
+        client.upsert(collection_name=staging, points=[
+            models.PointStruct(id=p.id, vector=vector, payload=p.payload) for p, vector in zip(usable, vectors)
+        ])
+        migrated += len(usable)
+        print(f"   Re-embedded {migrated} images...")
+
+    print(f"{'Would re-embed' if dry_run else 'Re-embedded'} {migrated} points; {len(skipped)} without a readable image_path")
+    for point_id, image_path in skipped[:20]:
+        print(f"   ⚠️  point {point_id}: {image_path or 'no image_path'}")
+    if dry_run:
+        return True
+    if skipped and not drop_missing:
+        # The swap would delete these points for good
+        client.delete_collection(staging)
+        embedder.close()
+        print(f"Error: {len(skipped)} points could not be re-embedded; '{collection_name}' was left unchanged. "
+              f"Restore their images and rerun, or pass --drop-missing to delete them")
+        return False
+
+    # Swap: recreate the original collection at the new dimension and copy the staged points back
+    print(f"Replacing '{collection_name}' ({size}-dim) with {get_clip_dimension()}-dim vectors...")
+    create_clip_collection(client, collection_name)
+    for points in iter_point_pages(client, staging, page_size, with_vectors=True):
+        client.upsert(collection_name=collection_name, points=[
+            models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points
+        ])
+    client.delete_collection(staging)
+    embedder.close()
+    print(f"✅ Migrated '{collection_name}' to native {get_clip_dimension()}-dim CLIP embeddings")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed a CLIP collection with native 512-dim CLIP vectors")
+    parser.add_argument("--collection", default="New_Collection_CLIP", help="CLIP collection to migrate")
+    parser.add_argument("--host", default=os.getenv("QDRANT_HOST", "localhost"), help="Qdrant server host")
+    parser.add_argument("--port", type=int, default=int(os.getenv("QDRANT_PORT", 6333)), help="Qdrant server port")
+    parser.add_argument("--page-size", type=int, default=256, help="Points re-embedded per batch (default: 256)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be migrated")
+    parser.add_argument("--force", action="store_true", help="Re-embed even if the collection is already 512-dim")
+    parser.add_argument("--drop-missing", action="store_true",
+                        help="Swap even if some points have no readable image, deleting those points")
+    args = parser.parse_args()
+
+    ok = migrate(args.collection, args.host, args.port, args.page_size, args.dry_run, args.force, args.drop_missing)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Collection Storage Migration Script
+
+Rebuilds an existing collection under new vector storage settings
+(quantization, on-disk original vectors, HNSW m/ef_construct), keeping
+point ids, vectors, payloads and payload indexes.
+
+Points are copied to a staging collection created with the new settings
+first; the original collection is only replaced once the copy is complete
+and its point count matches.
+
+Usage:
+    python Ingestion/migrate_collection_storage.py New_Collection --quantization scalar --on-disk
+    python Ingestion/migrate_collection_storage.py New_Collection --quantization binary --hnsw-m 32 --hnsw-ef-construct 256
+    python Ingestion/migrate_collection_storage.py New_Collection --dry-run
+"""
+
+import argparse
+import os
+import sys
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.collection_config import QUANTIZATION_TYPES, collection_params, describe_collection
+
+
+def iter_point_pages(client, collection_name, page_size):
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=page_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        if points:
+            yield points
+        if offset is None:
+            return
+
+
+def copy_points(client, source, target, page_size):
+    copied = 0
+    for points in iter_point_pages(client, source, page_size):
+        client.upsert(collection_name=target, points=[
+            models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points
+        ])
+        copied += len(points)
+        print(f"   Copied {copied} points to '{target}'...")
+    return copied
+
+
+def recreate(client, collection_name, params, payload_indexes):
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(collection_name=collection_name, **params)
+    for field, index_info in payload_indexes.items():
+        client.create_payload_index(collection_name=collection_name, field_name=field,
+                                    field_schema=index_info.data_type)
+
+
+def migrate(collection_name, host, port, quantization="none", on_disk=False, hnsw_m=None,
+            hnsw_ef_construct=None, page_size=256, dry_run=False):
+    client = QdrantClient(host=host, port=port)
+    if not client.collection_exists(collection_name):
+        print(f"Error: Collection '{collection_name}' does not exist")
+        return False
+
+    info = client.get_collection(collection_name)
+    vectors = info.config.params.vectors
+    if not isinstance(vectors, models.VectorParams):
+        print(f"Error: '{collection_name}' uses named vectors, which this script does not migrate")
+        return False
+
+    params = collection_params(vectors.size, vectors.distance, quantization, on_disk, hnsw_m, hnsw_ef_construct)
+    payload_indexes = info.payload_schema or {}
+    total = client.count(collection_name, exact=True).count
+    print(f"Current:  {describe_collection(info)}")
+    print(f"Target:   quantization={quantization} on_disk={on_disk} hnsw_m={hnsw_m or 'default'} "
+          f"ef_construct={hnsw_ef_construct or 'default'}")
+    print(f"{total} points, {len(payload_indexes)} payload indexes")
+    if dry_run:
+        return True
+
+    staging = f"{collection_name}__migrating"
+    print(f"Copying into staging collection '{staging}'...")
+    recreate(client, staging, params, payload_indexes)
+    copied = copy_points(client, collection_name, staging, page_size)
+    staged = client.count(staging, exact=True).count
+    if staged != total:
+        print(f"Error: staged {staged} of {total} points; '{collection_name}' left unchanged, '{staging}' kept for inspection")
+        return False
+
+    # Swap: recreate the original collection under the new settings and copy the staged points back
+    print(f"Replacing '{collection_name}' with the new settings...")
+    recreate(client, collection_name, params, payload_indexes)
+    copy_points(client, staging, collection_name, page_size)
+    client.delete_collection(staging)
+    print(f"✅ Rebuilt '{collection_name}' ({copied} points): {describe_collection(client.get_collection(collection_name))}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a Qdrant collection with new vector storage settings")
+    parser.add_argument("collection_name", help="Collection to rebuild")
+    parser.add_argument("--quantization", choices=list(QUANTIZATION_TYPES), default="none",
+                        help="Quantized vector copy kept in RAM: scalar (int8) or binary")
+    parser.add_argument("--on-disk", action="store_true", help="Store original vectors on disk")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW edges per node (default: Qdrant's 16)")
+    parser.add_argument("--hnsw-ef-construct", type=int, help="HNSW build-time candidate list size (default: Qdrant's 100)")
+    parser.add_argument("--host", default=os.getenv("QDRANT_HOST", "localhost"), help="Qdrant server host")
+    parser.add_argument("--port", type=int, default=int(os.getenv("QDRANT_PORT", 6333)), help="Qdrant server port")
+    parser.add_argument("--page-size", type=int, default=256, help="Points copied per batch (default: 256)")
+    parser.add_argument("--dry-run", action="store_true", help="Only show the current and target settings")
+    args = parser.parse_args()
+
+    ok = migrate(args.collection_name, args.host, args.port, args.quantization, args.on_disk,
+                 args.hnsw_m, args.hnsw_ef_construct, args.page_size, args.dry_run)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
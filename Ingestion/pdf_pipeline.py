@@ -0,0 +1,299 @@
+"""
+Staged, page-parallel PDF pipeline for ingestion.
+
+Pages flow through stages connected by bounded queues:
+
+    extract (process pool) -> describe images (thread pool) -> caller, in page order
+
+Extraction pulls each page's text and embedded images with PyMuPDF in a
+worker process. Image descriptions are I/O-bound calls to the Ollama vision
+model and run on threads. The caller receives pages strictly in page order,
+so point ids assigned while consuming them are the same as in a sequential
+run. A full queue blocks the stage feeding it, which keeps memory bounded on
+large documents.
+
+BackgroundWriter moves the final I/O stage (Qdrant upserts) off the
+caller's thread behind its own bounded queue. A failed write is reported
+through the task's on_error callback so the caller can keep later
+checkpoints from claiming it.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import fitz
+
+PDF_PROCESSES = int(os.getenv("INGEST_PDF_PROCESSES", max(1, (os.cpu_count() or 2) - 1)))
+IO_THREADS = int(os.getenv("INGEST_IO_THREADS", 8))
+QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", 16))
+
+_SENTINEL = object()
+
+
+class StageStats:
+    """Item count, busy time and wall-clock span of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, items=1, seconds=0.0):
+        now = time.perf_counter()
+        with self._lock:
+            if self.started is None:
+                self.started = now - seconds
+            self.finished = now
+            self.items += items
+            self.busy += seconds
+
+    def report(self):
+        wall = self.finished - self.started if self.started is not None else 0.0
+        rate = self.items / wall if wall > 0 else 0.0
+        return f"{self.name:<10} {self.items:>7} items {wall:>9.2f}s wall {self.busy:>9.2f}s busy {rate:>9.1f} items/s"
+
+
+def print_stage_report(stages):
+    print("Stage throughput:")
+    for stats in stages:
+        print(f"   {stats.report()}")
+
+
+# --- Extraction stage (runs in worker processes) ---
+
+_open_docs = {}
+
+
+def _open_doc(filepath):
+    """Keep the current document open in each worker instead of reopening it per page."""
+    key = (filepath, os.path.getmtime(filepath))
+    doc = _open_docs.get(key)
+    if doc is None:
+        for old in _open_docs.values():
+            old.close()
+        _open_docs.clear()
+        doc = _open_docs[key] = fitz.open(filepath)
+    return doc
+
+
+def save_page_image(doc, xref, image_dir, page_num, img_idx):
+    """Save one embedded image as PNG (JPG fallback). Returns (img_base, img_path)."""
+    img_base = f"page_{page_num+1}_img_{img_idx}.png"
+    img_path = os.path.join(image_dir, img_base)
+    pix = fitz.Pixmap(doc, xref)
+    try:
+        # Handle different colorspaces
+        if pix.n >= 5:  # CMYK or other complex colorspace
+            pix_converted = fitz.Pixmap(fitz.csRGB, pix)
+            pix_converted.save(img_path)
+            pix_converted = None
+        elif pix.colorspace and pix.colorspace.name in ['DeviceGray', 'DeviceRGB']:
+            pix.save(img_path)
+        else:
+            # Convert to RGB for unsupported colorspaces
+            pix_rgb = fitz.Pixmap(fitz.csRGB, pix)
+            pix_rgb.save(img_path)
+            pix_rgb = None
+    except Exception as save_error:
+        # Fallback: try saving as JPEG instead of PNG
+        img_base = f"page_{page_num+1}_img_{img_idx}.jpg"
+        img_path = os.path.join(image_dir, img_base)
+        try:
+            if pix.n >= 5:
+                pix_converted = fitz.Pixmap(fitz.csRGB, pix)
+                pix_converted.save(img_path)
+                pix_converted = None
+            else:
+                pix.save(img_path)
+        except Exception as jpg_error:
+            print(f"[WARNING] Failed to save image as both PNG and JPG: {save_error}, {jpg_error}")
+            raise save_error
+    finally:
+        pix = None
+    return img_base, img_path
+
+
+def extract_page(filepath, page_num, image_dir):
+    """Extract text and save embedded images for one page."""
+    start = time.perf_counter()
+    doc = _open_doc(filepath)
+    page = doc[page_num]
+    text = page.get_text().strip()
+    images = []
+    for img_idx, img in enumerate(page.get_images(full=True), start=1):
+        try:
+            img_base, img_path = save_page_image(doc, img[0], image_dir, page_num, img_idx)
+            images.append((img_idx, img_base, img_path))
+        except Exception as e:
+            print(f"[WARNING] Failed to extract/save image {img_idx} on page {page_num+1} of "
+                  f"{os.path.basename(filepath)}: {e}")
+    return {"page_num": page_num, "text": text, "images": images, "seconds": time.perf_counter() - start}
+
+
+# --- Pipeline ---
+
+class PdfPagePipeline:
+    def __init__(self, describe_fn, processes=None, io_threads=None, queue_depth=None):
+        """
+        Args:
+            describe_fn: Callable(image_path) -> description, run on the I/O threads
+            processes: Worker processes for page extraction
+            io_threads: Threads for image description calls
+            queue_depth: Maximum pages buffered between two stages
+        """
+        self.describe_fn = describe_fn
+        self.queue_depth = queue_depth or QUEUE_DEPTH
+        self.stats = {name: StageStats(name) for name in ("extract", "describe")}
+        self._procs = ProcessPoolExecutor(max_workers=processes or PDF_PROCESSES)
+        self._threads = ThreadPoolExecutor(max_workers=io_threads or IO_THREADS, thread_name_prefix="pdf-io")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._threads.shutdown(wait=True, cancel_futures=True)
+        self._procs.shutdown(wait=True, cancel_futures=True)
+
+    def _describe(self, image_path):
+        start = time.perf_counter()
+        description = self.describe_fn(image_path)
+        self.stats["describe"].record(1, time.perf_counter() - start)
+        return description
+
+    def pages(self, filepath, image_dir, start_page=0):
+        """
+        Yield the pages of a PDF in page order, beginning at `start_page`.
+
+        Each page is a dict with `page_num` (0-based), `text` and `images`, a
+        list of (img_idx, img_base, img_path, description) tuples.
+        """
+        with fitz.open(filepath) as doc:
+            page_count = len(doc)
+        print(f"[DEBUG] PDF '{os.path.basename(filepath)}' has {page_count} pages.")
+
+        extracted = queue.Queue(maxsize=self.queue_depth)
+        described = queue.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+
+        def put(q, item):
+            # Blocks while the queue is full, but gives up once the consumer has stopped
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _SENTINEL
+
+        def feed():
+            try:
+                for page_num in range(start_page, page_count):
+                    future = self._procs.submit(extract_page, filepath, page_num, image_dir)
+                    if not put(extracted, (page_num, future)):
+                        future.cancel()
+                        return
+            finally:
+                put(extracted, _SENTINEL)
+
+        def dispatch():
+            try:
+                while True:
+                    item = get(extracted)
+                    if item is _SENTINEL:
+                        return
+                    page_num, future = item
+                    try:
+                        page = future.result()
+                        self.stats["extract"].record(1, page.pop("seconds"))
+                        page["descriptions"] = [
+                            self._threads.submit(self._describe, img_path) for _, _, img_path in page["images"]
+                        ]
+                    except Exception as e:
+                        page = {"page_num": page_num, "error": e}
+                    if not put(described, page):
+                        for pending in page.get("descriptions", []):
+                            pending.cancel()
+            finally:
+                put(described, _SENTINEL)
+
+        workers = [threading.Thread(target=feed, daemon=True), threading.Thread(target=dispatch, daemon=True)]
+        for worker in workers:
+            worker.start()
+        try:
+            while True:
+                page = get(described)
+                if page is _SENTINEL:
+                    break
+                if "error" in page:
+                    raise RuntimeError(f"Failed to extract page {page['page_num']+1}: {page['error']}")
+                descriptions = [future.result() for future in page.pop("descriptions")]
+                page["images"] = [image + (description,) for image, description in zip(page["images"], descriptions)]
+                yield page
+        finally:
+            stop.set()
+            # Drain so blocked producers notice the stop and pending work is cancelled
+            for q in (extracted, described):
+                try:
+                    while True:
+                        item = q.get_nowait()
+                        if isinstance(item, tuple):
+                            item[1].cancel()
+                        elif isinstance(item, dict):
+                            for pending in item.get("descriptions", []):
+                                pending.cancel()
+                except queue.Empty:
+                    pass
+            for worker in workers:
+                worker.join()
+
+
+class BackgroundWriter:
+    """Runs write calls (e.g. Qdrant upserts) in order on one thread behind a bounded queue."""
+
+    def __init__(self, name="upsert", maxsize=None):
+        self.stats = StageStats(name)
+        self.failures = 0
+        self._queue = queue.Queue(maxsize=maxsize or QUEUE_DEPTH)
+        self._thread = threading.Thread(target=self._run, name=f"{name}-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, items=1, on_error=None, **kwargs):
+        """Queue fn(*args, **kwargs); on_error(exception) runs on the writer thread if it fails."""
+        self._queue.put((fn, args, kwargs, items, on_error))
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is _SENTINEL:
+                return
+            fn, args, kwargs, items, on_error = task
+            start = time.perf_counter()
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                self.failures += 1
+                print(f"[ERROR] Background {self.stats.name} of {items} points failed: {e}")
+                if on_error:
+                    on_error(e)
+            self.stats.record(items, time.perf_counter() - start)
+
+    def close(self):
+        """Wait for every queued write to finish."""
+        self._queue.put(_SENTINEL)
+        self._thread.join()
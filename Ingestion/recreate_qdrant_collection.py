@@ -1,6 +1,12 @@
 
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.payload_schema import INGESTION_PAYLOAD_SCHEMA, ensure_payload_indexes
 
 # Connect to Qdrant
 client = QdrantClient("http://localhost:6333")
@@ -11,12 +17,16 @@ client.create_collection(
     vectors_config=models.VectorParams(size=4096, distance=models.Distance.COSINE)
 )
 
-# Create CLIP collection with 1536 vector dimensions (for image embeddings)
+# Create CLIP collection with 512 vector dimensions (native CLIP image embeddings)
 client.create_collection(
     collection_name="New_Collection_CLIP",
-    vectors_config=models.VectorParams(size=1536, distance=models.Distance.COSINE)
+    vectors_config=models.VectorParams(size=512, distance=models.Distance.COSINE)
 )
 
+# Payload indexes for filtered search
+for name in ("New_Collection", "New_Collection_CLIP"):
+    ensure_payload_indexes(client, name, INGESTION_PAYLOAD_SCHEMA)
+
 print("Collections created:")
 print("- 'New_Collection' with 4096 dimensions for text embeddings")
-print("- 'New_Collection_CLIP' with 1536 dimensions for image embeddings")
+print("- 'New_Collection_CLIP' with 512 dimensions for image embeddings")
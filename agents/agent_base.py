@@ -1,26 +1,245 @@
 """
 Base configuration for all agents using Ollama instead of OpenAI
+
+All agents (and llm.py) talk to Ollama through one shared client:
+- one HTTP connection pool with keep-alive, pointed at OLLAMA_HOST
+- a process-wide limit on requests in flight (OLLAMA_MAX_CONCURRENCY)
+- connect and read timeouts (OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUT)
+- identical requests already in flight (same model, messages and options)
+  are coalesced into a single call whose response is shared
+- per-model latency histograms, see ollama_metrics()
 """
-import ollama
+import hashlib
+import json
 import os
+import threading
+import time
+
+import httpx
+import ollama
 
 # Ollama configuration
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1')
 OLLAMA_VISION_MODEL = os.getenv('OLLAMA_VISION_MODEL', 'llava')
+OLLAMA_NUM_CTX = int(os.getenv('OLLAMA_NUM_CTX', 4096))
+OLLAMA_MAX_CONCURRENCY = int(os.getenv('OLLAMA_MAX_CONCURRENCY', 4))
+OLLAMA_POOL_SIZE = int(os.getenv('OLLAMA_POOL_SIZE', 8))
+OLLAMA_TIMEOUT = float(os.getenv('OLLAMA_TIMEOUT', 300))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv('OLLAMA_CONNECT_TIMEOUT', 5))
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, float('inf'))
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+        self.errors = 0
+        self.coalesced = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.total:
+            return None
+        rank, seen = q * self.total, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            "count": self.total,
+            "sum_seconds": round(self.sum, 3),
+            "mean_seconds": round(self.sum / self.total, 3) if self.total else None,
+            "p50_seconds": self.quantile(0.5),
+            "p95_seconds": self.quantile(0.95),
+            "errors": self.errors,
+            "coalesced": self.coalesced,
+            "buckets": {("+Inf" if b == float('inf') else str(b)): c for b, c in zip(self.buckets, self.counts)},
+        }
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class SharedOllamaClient:
+    def __init__(self, host=OLLAMA_HOST, max_concurrency=OLLAMA_MAX_CONCURRENCY, pool_size=OLLAMA_POOL_SIZE,
+                 timeout=OLLAMA_TIMEOUT, connect_timeout=OLLAMA_CONNECT_TIMEOUT):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.client = ollama.Client(
+            host=host,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._histograms = {}
+
+    @staticmethod
+    def _request_key(model, messages, options, kwargs):
+        raw = json.dumps([model, messages, options, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _histogram(self, model):
+        histogram = self._histograms.get(model)
+        if histogram is None:
+            histogram = self._histograms[model] = LatencyHistogram()
+        return histogram
+
+    def _call(self, model, messages, options, kwargs):
+        with self._slots:
+            started = time.perf_counter()
+            try:
+                return self.client.chat(model=model, messages=messages, options=options, **kwargs)
+            except Exception:
+                with self._lock:
+                    self._histogram(model).errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self._histogram(model).observe(elapsed)
+
+    def _stream(self, model, messages, options, kwargs):
+        # The slot is held, and the latency measured, until the stream is exhausted or closed
+        with self._slots:
+            started = time.perf_counter()
+            try:
+                yield from self.client.chat(model=model, messages=messages, options=options, stream=True, **kwargs)
+            except Exception:
+                with self._lock:
+                    self._histogram(model).errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self._histogram(model).observe(elapsed)
+
+    def chat(self, model=None, messages=None, options=None, stream=False, **kwargs):
+        """Same arguments and response as ollama.chat, through the shared pool."""
+        model = model or OLLAMA_MODEL
+        if stream:
+            # Streams are consumed incrementally by one caller and cannot be shared
+            return self._stream(model, messages, options, kwargs)
+
+        key = self._request_key(model, messages, options, kwargs)
+        with self._lock:
+            pending = self._in_flight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._in_flight[key] = _InFlight()
+            else:
+                self._histogram(model).coalesced += 1
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.response
+
+        try:
+            pending.response = self._call(model, messages, options, kwargs)
+            return pending.response
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            pending.done.set()
+
+    def metrics(self):
+        """Per-model latency histograms plus pool settings."""
+        with self._lock:
+            return {
+                "host": self.host,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": len(self._in_flight),
+                "models": {model: h.snapshot() for model, h in self._histograms.items()},
+            }
+
+    def prometheus_metrics(self):
+        """The latency histograms in Prometheus text exposition format."""
+        lines = [
+            "# HELP ollama_request_seconds Ollama chat request latency",
+            "# TYPE ollama_request_seconds histogram",
+        ]
+        with self._lock:
+            histograms = list(self._histograms.items())
+            for model, h in histograms:
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float('inf') else str(bound)
+                    lines.append(f'ollama_request_seconds_bucket{{model="{model}",le="{le}"}} {cumulative}')
+                lines.append(f'ollama_request_seconds_sum{{model="{model}"}} {h.sum:.6f}')
+                lines.append(f'ollama_request_seconds_count{{model="{model}"}} {h.total}')
+            lines.append("# TYPE ollama_request_errors_total counter")
+            for model, h in histograms:
+                lines.append(f'ollama_request_errors_total{{model="{model}"}} {h.errors}')
+            lines.append("# TYPE ollama_requests_coalesced_total counter")
+            for model, h in histograms:
+                lines.append(f'ollama_requests_coalesced_total{{model="{model}"}} {h.coalesced}')
+        return "\n".join(lines) + "\n"
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_ollama_client():
+    """The process-wide Ollama client shared by every agent."""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = SharedOllamaClient()
+        return _shared_client
+
+
+def ollama_chat(**kwargs):
+    """Drop-in replacement for ollama.chat that goes through the shared client."""
+    return get_ollama_client().chat(**kwargs)
+
+
+def ollama_metrics():
+    return get_ollama_client().metrics()
+
 
 def chat_with_ollama(messages, model=None, temperature=0.7, max_tokens=None):
     """
     Standard function to chat with Ollama models
     """
+    options = {
+        'temperature': temperature,
+        'num_ctx': OLLAMA_NUM_CTX
+    }
+    if max_tokens:
+        options['num_predict'] = max_tokens
     try:
-        response = ollama.chat(
+        response = ollama_chat(
             model=model or OLLAMA_MODEL,
             messages=messages,
-            options={
-                'temperature': temperature,
-                'num_ctx': 4096
-            }
+            options=options
         )
         return response.get('message', {}).get('content', '')
     except Exception as e:
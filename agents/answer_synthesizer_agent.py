@@ -1,5 +1,5 @@
 # agents/answer_synthesizer_agent.py
-import ollama
+from agents.agent_base import ollama_chat
 import os
 
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
@@ -44,7 +44,7 @@ class AnswerSynthesizerAgent:
 
         user_prompt = f"Original query:\n{original_query}\n\nSub-answers:\n{sub_answer_block}\n\nSynthesize a complete final answer:"
 
-        response = ollama.chat(
+        response = ollama_chat(
             model=OLLAMA_MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful synthesis assistant."},
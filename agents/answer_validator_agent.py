@@ -1,11 +1,16 @@
-import ollama
+from agents.agent_base import ollama_chat
 import os
 
+from agents.fast_path_gates import get_gates
+
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1')
 
 class AnswerValidatorAgent:
-    def validate(self, answer: str, context_chunks: list, query: str) -> bool:
+    def __init__(self, use_gates=True):
+        self.gates = get_gates() if use_gates else None
+
+    def validate(self, answer: str, context_chunks: list, query: str, retrieval_scores: list = None) -> bool:
         # Handle None or empty answers
         if answer is None or (isinstance(answer, str) and answer.strip() == ""):
             return False
@@ -17,6 +22,11 @@ class AnswerValidatorAgent:
             
         if not context_chunks:
             return False
+
+        if self.gates:
+            decision = self.gates.check_answer_validation(answer, context_chunks, retrieval_scores)
+            if decision is not None:
+                return decision
             
         context_text = "\n".join([f"Chunk: {chunk}" for chunk, _ in context_chunks])
 
@@ -33,7 +43,7 @@ class AnswerValidatorAgent:
         Is the answer valid and contextually supported?
         """
 
-        response = ollama.chat(
+        response = ollama_chat(
             model=OLLAMA_MODEL,
             messages=[
                 {"role": "system", "content": "You are a fact-checking assistant."},
@@ -1,5 +1,5 @@
 # agents/context_analyst_agent.py
-import ollama
+from agents.agent_base import ollama_chat
 import json
 import os
 
@@ -20,7 +20,7 @@ class ContextAnalystAgent:
             f"Rewrite the sub-question clearly. Don't include any explanation."
         )
 
-        response = ollama.chat(
+        response = ollama_chat(
             model=OLLAMA_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -1,26 +1,27 @@
-import ollama
+from agents.agent_base import ollama_chat
 import os
+from itertools import islice
+from agents.fast_path_gates import get_gates
 from tools.retriever import Retriever
 
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1')
 
 class ContextValidatorAgent:
-    def __init__(self):
+    def __init__(self, use_gates=True):
         self.retriever = Retriever()
+        self.gates = get_gates() if use_gates else None
     
     def get_available_topics(self) -> list[str]:
         """
         Get a list of available topics from the documents to suggest alternatives.
         """
         try:
-            all_chunks = self.retriever.get_all_chunks()
-            if not all_chunks:
+            # Sample chunks to extract topics - only the first page is fetched
+            sample_chunks = list(islice(self.retriever.iter_chunks(page_size=20), 20))  # First 20 chunks
+            if not sample_chunks:
                 return []
             
-            # Sample chunks to extract topics
-            sample_chunks = all_chunks[:20]  # First 20 chunks
-            
             # Extract potential topics using LLM
             chunk_texts = [chunk[:200] for chunk, _ in sample_chunks]  # First 200 chars of each
             combined_text = "\n".join(chunk_texts)
@@ -33,7 +34,7 @@ class ContextValidatorAgent:
             {combined_text}
             """
             
-            response = ollama.chat(
+            response = ollama_chat(
                 model=OLLAMA_MODEL,
                 messages=[
                     {"role": "system", "content": "You are an expert at identifying main topics from document content."},
@@ -90,7 +91,7 @@ class ContextValidatorAgent:
             Return only a JSON array of question strings.
             """
             
-            response = ollama.chat(
+            response = ollama_chat(
                 model=OLLAMA_MODEL,
                 messages=[
                     {"role": "system", "content": "You help users find relevant questions they can ask."},
@@ -144,6 +145,11 @@ class ContextValidatorAgent:
                 "missing_info": "No relevant information found in the documents"
             }
 
+        if self.gates:
+            decision = self.gates.check_context_validation(query, context_chunks, retrieval_scores)
+            if decision is not None:
+                return decision
+
         context_text = "\n".join([f"Chunk {i+1}: {chunk}" for i, (chunk, _) in enumerate(context_chunks)])
         
         # Include retrieval scores if available
@@ -175,7 +181,7 @@ class ContextValidatorAgent:
         }}
         """
 
-        response = ollama.chat(
+        response = ollama_chat(
             model=OLLAMA_MODEL,
             messages=[
                 {"role": "system", "content": "You are a context validation expert. Analyze context relevance and sufficiency."},
@@ -1,4 +1,4 @@
-import ollama
+from agents.agent_base import ollama_chat
 import os
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone
@@ -143,7 +143,7 @@ If the follow-up question doesn't require additional context from the conversati
 Answer:"""
             
             # Generate enhanced response
-            response = ollama.chat(
+            response = ollama_chat(
                 model=OLLAMA_MODEL,
                 messages=[
                     {
@@ -273,7 +273,7 @@ Generate {num_suggestions} natural follow-up questions that:
 
 Return only the questions, one per line, without numbering or explanations."""
 
-            response = ollama.chat(
+            response = ollama_chat(
                 model=OLLAMA_MODEL,
                 messages=[
                     {
@@ -328,7 +328,7 @@ Generate {num_suggestions} natural follow-up questions that:
 
 Return only the questions, one per line, without numbering or explanations."""
 
-            response = ollama.chat(
+            response = ollama_chat(
                 model=OLLAMA_MODEL,
                 messages=[
                     {
@@ -0,0 +1,239 @@
+# agents/fast_path_gates.py
+"""
+Fast-path gates in front of the yes/no LLM agents.
+
+Each gate looks at the query (and, where available, the retrieval scores
+and retrieved text) and either returns a decision or None. A decision
+means the agent answers without calling Ollama; None means the gate is
+unsure and the agent makes its usual LLM call.
+
+    split            no conjunction or list markers        -> [query], no split
+    clarity          lightweight classifier over rules      -> CLEAR / VAGUE when confident
+    rephrase         clarity classifier confident CLEAR     -> orchestrator skips the rephrase call
+    answer_validator top retrieval score above threshold
+                     and the answer is grounded in context  -> valid
+    context_validator top retrieval score above threshold
+                     and the query terms are covered        -> sufficient
+
+Gates are configured per agent with environment variables
+(GATE_<NAME>=false disables one) and count every decision, so the LLM
+calls avoided can be reported; agents/replay_gate_log.py measures how
+often the fast path agrees with the LLM on a replayable query log.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+
+from tools.acronyms import ACRONYM_MAP
+from tools.bm25_index import shared_keyword_index, tokenize
+
+GATE_NAMES = ("split", "clarity", "rephrase", "answer_validator", "context_validator")
+
+_CONJUNCTION_RE = re.compile(r"\b(and|or|as well as|versus|vs\.?|along with|both|respectively|compare|comparison)\b|[,;&]|\?.+\?", re.I)
+_VAGUE_RE = re.compile(r"\b(it|this|that|these|those|they|them|stuff|thing|things|something|anything|etc)\b", re.I)
+_QUESTION_RE = re.compile(r"^\s*(what|how|when|where|which|who|why|list|explain|describe|show|give|define|is|are|does|do|can)\b", re.I)
+_SPECIFIC_RE = re.compile(r"\d|\b[A-Z]{2,}\b|\b[A-Z][a-z]+\s+[A-Z][a-z]+")
+
+# Logistic weights for P(query is clear); features from clarity_features()
+DEFAULT_CLARITY_WEIGHTS = {
+    "bias": -1.5,
+    "domain_terms": 2.0,
+    "log_words": 1.2,
+    "vague_refs": -2.0,
+    "question_form": 0.6,
+    "specific_tokens": 1.0,
+}
+
+
+def _env_flag(name, default=True):
+    return os.getenv(name, str(default)).lower() == "true"
+
+
+class GateConfig:
+    def __init__(self, **overrides):
+        self.enabled = {name: _env_flag(f"GATE_{name.upper()}") for name in GATE_NAMES}
+        self.split_max_words = int(os.getenv("GATE_SPLIT_MAX_WORDS", 40))
+        self.clarity_clear = float(os.getenv("GATE_CLARITY_CLEAR", 0.8))
+        self.clarity_vague = float(os.getenv("GATE_CLARITY_VAGUE", 0.15))
+        self.clarity_weights_path = os.getenv("GATE_CLARITY_WEIGHTS", "")
+        self.domain_min_idf = float(os.getenv("GATE_DOMAIN_MIN_IDF", 1.0))
+        self.validation_min_score = float(os.getenv("GATE_VALIDATION_MIN_SCORE", 0.75))
+        self.validation_min_grounding = float(os.getenv("GATE_VALIDATION_MIN_GROUNDING", 0.6))
+        self.context_min_score = float(os.getenv("GATE_CONTEXT_MIN_SCORE", 0.75))
+        self.context_min_coverage = float(os.getenv("GATE_CONTEXT_MIN_COVERAGE", 0.6))
+        self.collection_name = os.getenv("GATE_COLLECTION", "New_Collection")
+        for key, value in overrides.items():
+            if key == "enabled":
+                self.enabled.update(value)
+            else:
+                setattr(self, key, value)
+
+
+class FastPathGates:
+    def __init__(self, config=None):
+        self.config = config or GateConfig()
+        self.clarity_weights = dict(DEFAULT_CLARITY_WEIGHTS)
+        if self.config.clarity_weights_path and os.path.exists(self.config.clarity_weights_path):
+            with open(self.config.clarity_weights_path) as f:
+                self.clarity_weights.update(json.load(f))
+        self._lock = threading.Lock()
+        self._counts = {name: {"fast_path": 0, "llm": 0} for name in GATE_NAMES}
+
+    # --- bookkeeping -------------------------------------------------------
+
+    def record(self, name, fast_path):
+        """Count one agent call as answered by the fast path or by the LLM."""
+        with self._lock:
+            self._counts[name]["fast_path" if fast_path else "llm"] += 1
+
+    def stats(self):
+        """LLM calls avoided per gate."""
+        with self._lock:
+            report = {}
+            for name, counts in self._counts.items():
+                total = counts["fast_path"] + counts["llm"]
+                report[name] = {
+                    "enabled": self.config.enabled[name],
+                    "calls": total,
+                    "llm_calls_avoided": counts["fast_path"],
+                    "avoided_rate": round(counts["fast_path"] / total, 4) if total else 0.0,
+                }
+            return report
+
+    def _decide(self, name, decision):
+        if not self.config.enabled[name]:
+            decision = None
+        self.record(name, decision is not None)
+        return decision
+
+    # --- domain vocabulary -------------------------------------------------
+
+    def _index(self):
+        # The same in-memory index the Retriever searches, not a second copy
+        return shared_keyword_index(self.config.collection_name)
+
+    def domain_terms(self, query):
+        """Query words that are known acronyms or reasonably specific terms in our corpus."""
+        acronyms = [w for w in re.findall(r"[A-Za-z0-9/&-]+", query) if w.isupper() and w in ACRONYM_MAP]
+        index = self._index()
+        corpus_terms = [t for t in tokenize(query) if index.idf(t) >= self.config.domain_min_idf]
+        return acronyms + corpus_terms
+
+    # --- split -------------------------------------------------------------
+
+    def split_decision(self, query):
+        """[query] when there is nothing to split, else None (ask the LLM)."""
+        words = query.split()
+        if len(words) <= self.config.split_max_words and not _CONJUNCTION_RE.search(query):
+            return [query]
+        return None
+
+    def check_split(self, query):
+        return self._decide("split", self.split_decision(query))
+
+    # --- clarity -----------------------------------------------------------
+
+    def clarity_features(self, query):
+        return {
+            "bias": 1.0,
+            "domain_terms": min(len(self.domain_terms(query)), 3),
+            "log_words": math.log(1 + len(query.split())),
+            "vague_refs": len(_VAGUE_RE.findall(query)),
+            "question_form": 1.0 if _QUESTION_RE.search(query) else 0.0,
+            "specific_tokens": min(len(_SPECIFIC_RE.findall(query)), 3),
+        }
+
+    def clarity_probability(self, query):
+        features = self.clarity_features(query)
+        z = sum(self.clarity_weights.get(name, 0.0) * value for name, value in features.items())
+        return 1 / (1 + math.exp(-z))
+
+    def clarity_decision(self, query):
+        """True/False when the classifier is confident the query is clear/vague, else None."""
+        p = self.clarity_probability(query)
+        if p >= self.config.clarity_clear:
+            return True
+        if p <= self.config.clarity_vague:
+            return False
+        return None
+
+    def check_clarity(self, query):
+        return self._decide("clarity", self.clarity_decision(query))
+
+    def rephrase_decision(self, query):
+        """True when the query is confidently clear, so rephrasing it can be skipped; else None."""
+        return True if self.clarity_decision(query) is True else None
+
+    def check_rephrase(self, query):
+        return self._decide("rephrase", self.rephrase_decision(query))
+
+    # --- validators --------------------------------------------------------
+
+    @staticmethod
+    def _coverage(terms, context_chunks):
+        terms = set(terms)
+        if not terms:
+            return 0.0
+        context_terms = set()
+        for chunk, _ in context_chunks:
+            context_terms.update(tokenize(chunk))
+        return len(terms & context_terms) / len(terms)
+
+    def answer_validation_decision(self, answer, context_chunks, retrieval_scores):
+        """True when retrieval was confident and the answer's terms come from the context, else None."""
+        scores = [s for s in (retrieval_scores or []) if s is not None]
+        if not scores or not context_chunks or not answer:
+            return None
+        if max(scores) >= self.config.validation_min_score and \
+                self._coverage(tokenize(answer), context_chunks) >= self.config.validation_min_grounding:
+            return True
+        return None
+
+    def check_answer_validation(self, answer, context_chunks, retrieval_scores):
+        return self._decide("answer_validator", self.answer_validation_decision(answer, context_chunks, retrieval_scores))
+
+    def context_validation_decision(self, query, context_chunks, retrieval_scores):
+        """A sufficient-context result when retrieval was confident and covers the query, else None."""
+        scores = [s for s in (retrieval_scores or []) if s is not None]
+        if not scores or not context_chunks:
+            return None
+        top = max(scores)
+        coverage = self._coverage(tokenize(query), context_chunks)
+        if top >= self.config.context_min_score and coverage >= self.config.context_min_coverage:
+            return {
+                "is_sufficient": True,
+                "confidence": round(float(top), 3),
+                "reason": f"Fast path: top retrieval score {top:.2f}, {coverage:.0%} of query terms found in context",
+                "relevant_chunks": [i for i, s in enumerate(retrieval_scores or []) if s is not None and s >= self.config.context_min_score],
+                "missing_info": "",
+            }
+        return None
+
+    def check_context_validation(self, query, context_chunks, retrieval_scores):
+        return self._decide("context_validator", self.context_validation_decision(query, context_chunks, retrieval_scores))
+
+
+_gates = None
+_gates_lock = threading.Lock()
+
+
+def get_gates():
+    """Process-wide gates shared by the agents, so their counters add up."""
+    global _gates
+    with _gates_lock:
+        if _gates is None:
+            _gates = FastPathGates()
+        return _gates
+
+
+def log_query(query, path=None):
+    """Append a query to the replayable query log (QUERY_LOG_PATH), if configured."""
+    path = path or os.getenv("QUERY_LOG_PATH", "")
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"query": query, "timestamp": time.time()}) + "\n")
@@ -1,5 +1,5 @@
 import base64
-import ollama
+from agents.agent_base import ollama_chat
 from typing import Dict, Any, Optional
 import os
 
@@ -135,7 +135,7 @@ class ImageAnalysisAgent:
 
 Please be thorough and analytical in your response."""
             
-            response = ollama.chat(
+            response = ollama_chat(
                 model=OLLAMA_VISION_MODEL,
                 messages=[{
                     'role': 'user',
@@ -0,0 +1,145 @@
+# agents/multi_query_orchestrator.py
+import asyncio
+import time
+from contextlib import contextmanager
+
+from agents.answer_synthesizer_agent import AnswerSynthesizerAgent
+from agents.answer_validator_agent import AnswerValidatorAgent
+from agents.context_analyst_agent import ContextAnalystAgent
+from agents.fast_path_gates import get_gates, log_query
+from agents.query_rephrase_agent import QueryRephraseAgent
+from agents.query_splitter_agent import QuerySplitterAgent
+from agents.retriever_agent import RetrieverAgent
+from llm import generate_response
+
+INSUFFICIENT_ANSWER = "No relevant information found for: {question}"
+
+
+class RequestTrace:
+    """Per-stage timings for one request; `branch` identifies the sub-question."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+
+    @contextmanager
+    def stage(self, name, branch=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append({
+                "stage": name,
+                "branch": branch,
+                "start_ms": round((started - self.start) * 1000, 1),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            })
+
+    def total_ms(self):
+        return round((time.perf_counter() - self.start) * 1000, 1)
+
+    def report(self):
+        lines = [f"[ORCHESTRATOR] {self.total_ms():.0f} ms total"]
+        for span in sorted(self.spans, key=lambda s: s["start_ms"]):
+            branch = f" #{span['branch']}" if span["branch"] is not None else ""
+            lines.append(f"   {span['stage'] + branch:<14} +{span['start_ms']:>8.1f} ms  {span['duration_ms']:>8.1f} ms")
+        return "\n".join(lines)
+
+
+class MultiQueryOrchestrator:
+    """
+    Answers a question by splitting it into sub-questions and running their
+    pipelines concurrently:
+
+        split -> rephrase (each) -> embed + retrieve (one batch for all)
+              -> rewrite -> answer -> validate (each) -> summarize
+
+    Per-sub-question LLM stages run concurrently under a process-wide bound on
+    in-flight Ollama calls, so a multi-part question costs about the latency
+    of its slowest branch rather than the sum of all branches.
+
+    With `use_gates` the fast-path gates answer the split and validation
+    steps without Ollama when the heuristics are confident, and
+    sub-questions the clarity classifier is sure about are not rephrased.
+    """
+
+    def __init__(self, retriever_agent=None, use_gates=True):
+        self.gates = get_gates() if use_gates else None
+        self.splitter = QuerySplitterAgent(use_gates=use_gates)
+        self.rephraser = QueryRephraseAgent()
+        self.analyst = ContextAnalystAgent()
+        self.validator = AnswerValidatorAgent(use_gates=use_gates)
+        self.synthesizer = AnswerSynthesizerAgent()
+        self.retriever = retriever_agent or RetrieverAgent()
+
+    async def _llm(self, trace, stage, branch, fn, *args):
+        # In-flight Ollama calls are bounded by the shared client (agents/agent_base.py)
+        with trace.stage(stage, branch):
+            return await asyncio.to_thread(fn, *args)
+
+    def _needs_rephrase(self, sub_question):
+        if not self.gates:
+            return True
+        # Counted like the agents' gates, so skipped rephrase calls show up in gate stats
+        return self.gates.check_rephrase(sub_question) is not True
+
+    async def _rephrase(self, trace, i, sub_question, query):
+        if not self._needs_rephrase(sub_question):
+            return sub_question
+        return await self._llm(trace, "rephrase", i, self.rephraser.rephrase, sub_question, query)
+
+    async def _answer_branch(self, trace, i, query, sub_question, chunks, scores):
+        rewritten = await self._llm(trace, "rewrite", i, self.analyst.rewrite, sub_question, query)
+        rewritten = rewritten or sub_question
+        result = await self._llm(trace, "answer", i, generate_response, rewritten, chunks)
+        answer = result["answer"]
+        valid = await self._llm(trace, "validate", i, self.validator.validate, answer, chunks, rewritten, scores)
+        return {
+            "rewritten": rewritten,
+            "answer": answer if valid else INSUFFICIENT_ANSWER.format(question=sub_question),
+            "valid": valid,
+            "sources": sorted({chunks[c][1] for c in result["used_chunks"] if 0 <= c < len(chunks)}),
+        }
+
+    async def run(self, query):
+        trace = RequestTrace()
+        log_query(query)
+
+        sub_questions = await self._llm(trace, "split", None, self.splitter.split, query)
+        sub_questions = [q for q in sub_questions if isinstance(q, str) and q.strip()] or [query]
+
+        rephrased = await asyncio.gather(*[
+            self._rephrase(trace, i, q, query) for i, q in enumerate(sub_questions)
+        ])
+        rephrased = [r or q for r, q in zip(rephrased, sub_questions)]
+
+        # One embedding batch and one search request per collection for every sub-question
+        with trace.stage("retrieve"):
+            retrieved = await asyncio.to_thread(self.retriever.retrieve_batch, rephrased)
+
+        branches = await asyncio.gather(*[
+            self._answer_branch(trace, i, query, q, chunks, scores)
+            for i, (q, (chunks, _, scores)) in enumerate(zip(sub_questions, retrieved))
+        ])
+
+        if len(branches) == 1:
+            answer = branches[0]["answer"]
+        else:
+            answer = await self._llm(trace, "summarize", None, self.synthesizer.summarize,
+                                     query, sub_questions, [b["answer"] for b in branches])
+
+        for i, (q, r, (_, mode, _)) in enumerate(zip(sub_questions, rephrased, retrieved)):
+            branches[i].update({"sub_question": q, "rephrased": r, "retrieval_mode": mode})
+
+        print(trace.report())
+        return {
+            "answer": answer,
+            "sub_questions": sub_questions,
+            "branches": branches,
+            "trace": trace.spans,
+            "total_ms": trace.total_ms(),
+        }
+
+    def answer(self, query):
+        """Synchronous entry point for callers without an event loop."""
+        return asyncio.run(self.run(query))
@@ -1,5 +1,5 @@
 # agents/new_chat_suggestion_agent.py
-import ollama
+from agents.agent_base import ollama_chat
 import json
 import random
 import os
@@ -21,19 +21,14 @@ class NewChatSuggestionAgent:
         Get an overview of available documents to base suggestions on.
         """
         try:
-            all_chunks = self.retriever.get_all_chunks()
-            if not all_chunks:
+            # Sample chunks to understand document content; streams ids/sources, fetches text for the sample only
+            sample_chunks, sources = self.retriever.sample_chunks(20)
+            if not sample_chunks:
                 return "No documents available"
             
-            # Sample chunks to understand document content
-            sample_chunks = random.sample(all_chunks, min(20, len(all_chunks)))
-            
-            # Extract unique sources
-            sources = set()
             content_samples = []
             
             for chunk, src in sample_chunks:
-                sources.add(src)
                 content_samples.append(chunk[:200])  # First 200 chars of each chunk
             
             overview = f"Available documents: {len(sources)} files\n"
@@ -94,7 +89,7 @@ class NewChatSuggestionAgent:
         """
         
         try:
-            response = ollama.chat(
+            response = ollama_chat(
                 model=OLLAMA_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -193,7 +188,7 @@ class NewChatSuggestionAgent:
         """
         
         try:
-            response = ollama.chat(
+            response = ollama_chat(
                 model=OLLAMA_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -1,12 +1,22 @@
 # agents/query_analyzer_agent.py
-import ollama
+from agents.agent_base import ollama_chat
 import os
 
+from agents.fast_path_gates import get_gates
+
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1')
 
 class QueryAnalyzerAgent:
+    def __init__(self, use_gates=True):
+        self.gates = get_gates() if use_gates else None
+
     def is_query_clear(self, query: str) -> bool:
+        if self.gates:
+            decision = self.gates.check_clarity(query)
+            if decision is not None:
+                return decision
+
         prompt = f"""
         You are a query classification assistant. Determine if the following user query is **clear and specific** or **vague and ambiguous**.
 
@@ -15,7 +25,7 @@ class QueryAnalyzerAgent:
         Respond with only one word: "CLEAR" or "VAGUE".
         """
 
-        response = ollama.chat(
+        response = ollama_chat(
             model=OLLAMA_MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that classifies query clarity."},
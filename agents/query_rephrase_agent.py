@@ -1,5 +1,5 @@
 # agents/query_rephrase_agent.py
-import ollama
+from agents.agent_base import ollama_chat
 import os
 
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
@@ -18,7 +18,7 @@ class QueryRephraseAgent:
         Rephrased Question:
         """
 
-        response = ollama.chat(
+        response = ollama_chat(
             model=OLLAMA_MODEL,
             messages=[
                 {"role": "system", "content": "You are a query refinement assistant."},
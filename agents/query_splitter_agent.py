@@ -1,13 +1,23 @@
 # agents/query_splitter_agent.py
 import json
-import ollama
+from agents.agent_base import ollama_chat
 import os
 
+from agents.fast_path_gates import get_gates
+
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1')
 
 class QuerySplitterAgent:
+    def __init__(self, use_gates=True):
+        self.gates = get_gates() if use_gates else None
+
     def split(self, query: str) -> list[str]:
+        if self.gates:
+            decision = self.gates.check_split(query)
+            if decision is not None:
+                return decision
+
         system_prompt = (
             "You are a helpful assistant that breaks down complex or multi-entity questions "
             "into multiple simple sub-questions. If a query contains multiple parts joined by 'and', 'or', or commas, "
@@ -21,7 +31,7 @@ class QuerySplitterAgent:
 
         user_prompt = f"Split the following query into simpler sub-questions:\n\n{query}\n\nReturn only a JSON list."
 
-        response = ollama.chat(
+        response = ollama_chat(
             model=OLLAMA_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
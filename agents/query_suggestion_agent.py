@@ -1,5 +1,5 @@
 # agents/query_suggestion_agent.py
-import ollama
+from agents.agent_base import ollama_chat
 import json
 import os
 
@@ -50,7 +50,7 @@ class QuerySuggestionAgent:
         """
         
         try:
-            response = ollama.chat(
+            response = ollama_chat(
                 model=OLLAMA_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -124,7 +124,7 @@ class QuerySuggestionAgent:
         """
         
         try:
-            response = ollama.chat(
+            response = ollama_chat(
                 model=OLLAMA_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+Replay a query log through the fast-path gates and the LLM agents
+
+For every logged query the heuristic decision of each gate is compared with
+the decision of the same agent without gates (a real Ollama call), which
+gives per gate the share of LLM calls the fast path avoids and how often
+its decisions agree with the LLM's. With --answers the full orchestrator is
+also run with and without gates and the final answers are compared
+(token F1), to see the end-to-end quality impact.
+
+The log is a JSONL file with a "query" field per line (what the
+orchestrator writes to QUERY_LOG_PATH) or plain text with one query per
+line. Gate thresholds are read from the usual GATE_* environment variables,
+so a setting can be tried out here before it is deployed.
+
+Usage:
+    python agents/replay_gate_log.py --log logs/queries.jsonl --limit 200
+    python agents/replay_gate_log.py --log queries.txt --gates split,clarity --answers
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.answer_validator_agent import AnswerValidatorAgent
+from agents.context_validator_agent import ContextValidatorAgent
+from agents.fast_path_gates import GATE_NAMES, FastPathGates
+from agents.query_analyzer_agent import QueryAnalyzerAgent
+from agents.query_splitter_agent import QuerySplitterAgent
+from tools.bm25_index import tokenize
+
+
+def load_queries(path, limit=None):
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line).get("query", "")
+            if line:
+                queries.append(line)
+    # The log repeats popular questions; each distinct query is replayed once
+    queries = list(dict.fromkeys(queries))
+    return queries[:limit] if limit else queries
+
+
+def token_f1(a, b):
+    a, b = Counter(tokenize(a or "")), Counter(tokenize(b or ""))
+    common = sum((a & b).values())
+    if not common:
+        return 0.0
+    precision, recall = common / sum(a.values()), common / sum(b.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def _normalize_split(sub_questions):
+    return len([q for q in sub_questions if isinstance(q, str) and q.strip()]) or 1
+
+
+def replay(queries, gate_names, with_answers=False):
+    gates = FastPathGates()
+    tally = {name: {"queries": 0, "fast_path": 0, "agree": 0} for name in gate_names}
+
+    splitter = QuerySplitterAgent(use_gates=False)
+    analyzer = QueryAnalyzerAgent(use_gates=False)
+    needs_retrieval = {"answer_validator", "context_validator"} & set(gate_names)
+    if needs_retrieval or with_answers:
+        from agents.retriever_agent import RetrieverAgent
+        from llm import generate_response
+        retriever = RetrieverAgent()
+        answer_validator = AnswerValidatorAgent(use_gates=False)
+        context_validator = ContextValidatorAgent(use_gates=False)
+
+    def compare(name, fast, slow_fn, same):
+        tally[name]["queries"] += 1
+        if fast is None:
+            return
+        tally[name]["fast_path"] += 1
+        if same(fast, slow_fn()):
+            tally[name]["agree"] += 1
+
+    for n, query in enumerate(queries, 1):
+        print(f"[{n}/{len(queries)}] {query[:80]}")
+        if "split" in tally:
+            compare("split", gates.split_decision(query), lambda: splitter.split(query),
+                    lambda fast, slow: _normalize_split(fast) == _normalize_split(slow))
+        if "clarity" in tally:
+            compare("clarity", gates.clarity_decision(query), lambda: analyzer.is_query_clear(query),
+                    lambda fast, slow: fast == slow)
+        if "rephrase" in tally:
+            # Skipping the rephrase is right when the LLM also judges the query clear
+            compare("rephrase", gates.rephrase_decision(query), lambda: analyzer.is_query_clear(query),
+                    lambda fast, slow: slow is True)
+        if needs_retrieval:
+            chunks, _, scores = retriever.retrieve_batch([query])[0]
+            if "context_validator" in tally:
+                compare("context_validator", gates.context_validation_decision(query, chunks, scores),
+                        lambda: context_validator.validate_context(query, chunks, scores),
+                        lambda fast, slow: fast["is_sufficient"] == bool(slow.get("is_sufficient")))
+            if "answer_validator" in tally and chunks:
+                answer = generate_response(query, chunks)["answer"]
+                compare("answer_validator", gates.answer_validation_decision(answer, chunks, scores),
+                        lambda: answer_validator.validate(answer, chunks, query),
+                        lambda fast, slow: fast == slow)
+
+    report = {}
+    for name, counts in tally.items():
+        report[name] = {
+            "queries": counts["queries"],
+            "llm_calls_avoided": counts["fast_path"],
+            "avoided_rate": round(counts["fast_path"] / counts["queries"], 4) if counts["queries"] else 0.0,
+            "agreement": round(counts["agree"] / counts["fast_path"], 4) if counts["fast_path"] else None,
+        }
+
+    if with_answers:
+        from agents.multi_query_orchestrator import MultiQueryOrchestrator
+        gated = MultiQueryOrchestrator(retriever_agent=retriever, use_gates=True)
+        ungated = MultiQueryOrchestrator(retriever_agent=retriever, use_gates=False)
+        f1s, gated_ms, ungated_ms = [], 0.0, 0.0
+        for query in queries:
+            a, b = gated.answer(query), ungated.answer(query)
+            f1s.append(token_f1(a["answer"], b["answer"]))
+            gated_ms += a["total_ms"]
+            ungated_ms += b["total_ms"]
+        report["answers"] = {
+            "queries": len(queries),
+            "mean_token_f1": round(sum(f1s) / len(f1s), 4) if f1s else None,
+            "identical": sum(1 for f in f1s if f == 1.0),
+            "gated_ms_per_query": round(gated_ms / len(queries), 1) if queries else None,
+            "ungated_ms_per_query": round(ungated_ms / len(queries), 1) if queries else None,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure fast-path gate savings and agreement on a query log")
+    parser.add_argument("--log", required=True, help="JSONL query log or text file with one query per line")
+    parser.add_argument("--limit", type=int, default=None, help="Replay at most this many distinct queries")
+    parser.add_argument("--gates", default=",".join(GATE_NAMES), help=f"Comma-separated gates to evaluate ({', '.join(GATE_NAMES)})")
+    parser.add_argument("--answers", action="store_true", help="Also compare final orchestrator answers with and without gates")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    gate_names = [g.strip() for g in args.gates.split(",") if g.strip()]
+    unknown = set(gate_names) - set(GATE_NAMES)
+    if unknown:
+        parser.error(f"unknown gates: {', '.join(sorted(unknown))}")
+
+    queries = load_queries(args.log, args.limit)
+    if not queries:
+        print(f"No queries found in {args.log}")
+        return
+
+    report = replay(queries, gate_names, with_answers=args.answers)
+
+    print(f"\n{'gate':<18} {'queries':>8} {'avoided':>8} {'rate':>7} {'agreement':>10}")
+    for name in gate_names:
+        row = report[name]
+        agreement = f"{row['agreement']:.1%}" if row["agreement"] is not None else "-"
+        print(f"{name:<18} {row['queries']:>8} {row['llm_calls_avoided']:>8} {row['avoided_rate']:>7.1%} {agreement:>10}")
+    if "answers" in report:
+        a = report["answers"]
+        print(f"\nAnswers: mean token F1 gated vs ungated {a['mean_token_f1']}, {a['identical']}/{a['queries']} identical, "
+              f"{a['gated_ms_per_query']} ms vs {a['ungated_ms_per_query']} ms per query")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
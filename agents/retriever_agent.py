@@ -1,26 +1,101 @@
-from tools.embedder import embed_query
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from tools.embedder import embed_batch
 from tools.retriever import Retriever
 
+# Questions that ask about something visual; with RETRIEVER_USE_CLIP=auto only these search the CLIP image collection
+VISUAL_QUERY_RE = re.compile(
+    r"\b(image|images|picture|pictures|photo|photos|diagram|diagrams|figure|figures|drawing|drawings|"
+    r"chart|charts|graph|graphs|schematic|schematics|illustration|screenshot|layout|map|logo|"
+    r"look(s)? like|show me)\b",
+    re.IGNORECASE
+)
+
 class RetrieverAgent:
-    def __init__(self, confidence_threshold=0.5, top_k=5):
+    def __init__(self, confidence_threshold=0.5, top_k=5, use_clip=None, clip_threshold=0.25, clip_weight=None):
+        """
+        use_clip: True searches the CLIP image collection for every query, False
+        never, None reads RETRIEVER_USE_CLIP ("true" by default; "auto" limits
+        the CLIP search to queries that ask about something visual)
+        """
         self.retriever = Retriever()
         self.threshold = confidence_threshold
         self.top_k = top_k
+        # CLIP text-to-image cosine scores sit on a much lower scale than text-to-text ones
+        self.clip_threshold = clip_threshold
+        if use_clip is None:
+            self.clip_mode = os.getenv("RETRIEVER_USE_CLIP", "true").lower()
+        else:
+            self.clip_mode = "true" if use_clip else "false"
+        self.use_clip = self.clip_mode != "false"
+        clip_weight = float(os.getenv("RETRIEVER_CLIP_WEIGHT", 1.0)) if clip_weight is None else clip_weight
+        self.weights = {self.retriever.clip_collection_name: clip_weight}
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retriever-agent")
+
+    def _clip_query_embeddings(self, queries):
+        try:
+            from Ingestion.clip_embedder import embed_texts_clip
+            return embed_texts_clip(queries)
+        except Exception as e:
+            print(f"[RETRIEVER] CLIP query embedding unavailable ({e}); searching the text collection only")
+            self.use_clip = False
+            return None
+
+    def _wants_clip(self, query):
+        return self.use_clip and (self.clip_mode != "auto" or bool(VISUAL_QUERY_RE.search(query)))
 
     def retrieve(self, query: str):
-        query_emb = embed_query(query)
-        results = self.retriever.search(query_emb, top_k=self.top_k)
-
-        # Filter by confidence
-        confident = [(chunk, src, score) for chunk, src, score in results if score >= self.threshold]
-        if confident:
-            return [(c, s) for c, s, _ in confident], "semantic"
-
-        # Fallback to keyword-based
-        keywords = query.lower().split()
-        all_chunks = self.retriever.get_all_chunks()
-
-        def score(c): return sum(word in c.lower() for word in keywords)
-        fallback = sorted([(chunk, src, score(chunk)) for chunk, src in all_chunks], key=lambda x: x[2], reverse=True)
-        top = [(chunk, src) for chunk, src, s in fallback if s > 0][:self.top_k]
-        return top, "keyword"
+        return self.retrieve_batch([query])[0][:2]
+
+    def retrieve_batch(self, queries, query_embeddings=None):
+        """
+        Retrieve for several queries with one embedding batch and one search
+        request per collection. Returns (results, mode, scores) per query;
+        `scores` are the raw similarity scores aligned with `results` (empty
+        for the hybrid fallback, whose fused ranks are not similarities).
+        """
+        if not queries:
+            return []
+
+        # The text (Ollama) and CLIP query embeddings are computed concurrently
+        clip_indices = [i for i, query in enumerate(queries) if self._wants_clip(query)]
+        clip_future = (self._pool.submit(self._clip_query_embeddings, [queries[i] for i in clip_indices])
+                       if clip_indices else None)
+        if query_embeddings is None:
+            query_embeddings = embed_batch(list(queries))
+        clip_embs = clip_future.result() if clip_future else None
+        if clip_embs is None:
+            clip_indices = []
+
+        confident = [None] * len(queries)
+        if clip_indices:
+            # Both collections searched concurrently; hits below each collection's
+            # threshold are dropped before scores are normalized per collection and fused
+            fused = self.retriever.multi_collection_search_batch(
+                {self.retriever.collection_name: [query_embeddings[i] for i in clip_indices],
+                 self.retriever.clip_collection_name: clip_embs},
+                top_k=self.top_k, weights=self.weights, candidates=self.top_k * 4,
+                score_floors={self.retriever.collection_name: self.threshold,
+                              self.retriever.clip_collection_name: self.clip_threshold}
+            )
+            for i, hits in zip(clip_indices, fused):
+                confident[i] = [(hit["text"], hit["source"], hit["raw_score"]) for hit in hits]
+        text_indices = [i for i in range(len(queries)) if confident[i] is None]
+        if text_indices:
+            text_results = self.retriever.search_batch([query_embeddings[i] for i in text_indices], top_k=self.top_k)
+            for i, results in zip(text_indices, text_results):
+                confident[i] = [(chunk, src, score) for chunk, src, score, _ in results if score >= self.threshold]
+
+        # Queries without confident hits fall back to BM25 keyword ranking fused with the vector results
+        fallbacks = {
+            i: self._pool.submit(self.retriever.hybrid_search, queries[i], query_embeddings[i], self.top_k)
+            for i, results in enumerate(confident) if not results
+        }
+        outcomes = []
+        for i, results in enumerate(confident):
+            if i in fallbacks:
+                outcomes.append(([(chunk, src) for chunk, src, _, _ in fallbacks[i].result()], "hybrid", []))
+            else:
+                outcomes.append(([(chunk, src) for chunk, src, _ in results], "semantic", [score for _, _, score in results]))
+        return outcomes
@@ -0,0 +1,227 @@
+"""
+Asyncio chat endpoint for the chat backend
+
+The Flask /api/chat handler blocks its worker thread through query
+embedding, the Qdrant search, Gemini generation and the chat-history
+insert, so a worker serves at most as many chats at once as it has threads.
+This ASGI app answers POST /api/chat on the event loop instead:
+
+- the query embedding is awaited on the shared micro-batching service
+- Qdrant is searched with AsyncQdrantClient
+- Gemini generates with generate_content_async
+- the chat-history write is fire-and-forget (motor when installed,
+  otherwise the synchronous insert in a worker thread), off the critical path
+
+Every other route is served by the Flask app (chat_backend.app) through a
+WSGI adapter, so the frontend keeps talking to a single server.
+
+Run with:
+    python serve.py --asgi --workers 8
+    uvicorn chat_async:app --port 5001
+"""
+import asyncio
+import json
+import uuid
+
+import chat_backend as backend
+from chat_backend import ChatManager, Config, VectorStore, answer_cache, logger, services
+from tools.payload_schema import DOCUMENTS_PAYLOAD_SCHEMA, build_filter
+from tools.service_registry import lazy_import
+
+
+async def _service(name):
+    """A registry service, loading (or retrying) it off the event loop if needed"""
+    if services.loaded(name) and not services.retry_due(name):
+        return services.peek(name)
+    return await asyncio.to_thread(services.get, name)
+
+
+class AsyncChatPipeline:
+    def __init__(self):
+        # Async clients are bound to the event loop that first uses them; tests
+        # and the load-test harness may set these to stubs beforehand
+        self.qdrant = None
+        self.chats = None
+        self._chats_checked = False
+        self._background = set()
+
+    async def _qdrant(self):
+        if self.qdrant is None:
+            # The synchronous client creates the collection and its indexes
+            if not await _service('qdrant'):
+                return None
+            self.qdrant = lazy_import('qdrant_client', services).AsyncQdrantClient(url=Config.QDRANT_HOST)
+        return self.qdrant
+
+    def _chats(self):
+        if self.chats is None and not self._chats_checked:
+            self._chats_checked = True
+            if backend.MONGODB_AVAILABLE:
+                try:
+                    motor = lazy_import('motor.motor_asyncio', services)
+                    from mongodb import MONGODB_URI, DB_NAME
+                    self.chats = motor.AsyncIOMotorClient(MONGODB_URI)[DB_NAME]['document_agent_chats']
+                except ImportError:
+                    logger.info("motor not installed; chat history is written from a worker thread")
+        return self.chats
+
+    async def search_similar_chunks(self, query, limit=Config.MAX_CONTEXT_CHUNKS, filters=None):
+        query_embedder = await _service('query_embedder')
+        qdrant = await self._qdrant()
+        if not qdrant or not query_embedder:
+            return []
+        try:
+            query_embedding = await asyncio.wrap_future(query_embedder.submit(query))
+            search_results = await qdrant.search(
+                collection_name=Config.COLLECTION_NAME,
+                query_vector=query_embedding,
+                limit=limit,
+                with_payload=True,
+                query_filter=build_filter(filters, DOCUMENTS_PAYLOAD_SCHEMA)
+            )
+            return VectorStore.format_search_results(search_results)
+        except Exception as e:
+            logger.error(f"Error searching chunks: {e}")
+            return []
+
+    async def generate_response(self, query, context_chunks, language='english'):
+        gemini_model = await _service('gemini')
+        if not gemini_model:
+            return ChatManager.UNAVAILABLE_RESPONSE
+        try:
+            prompt = ChatManager.build_prompt(query, context_chunks, language)
+            response = await gemini_model.generate_content_async(prompt)
+            if response.text:
+                return response.text.strip()
+            return ChatManager.EMPTY_RESPONSE
+        except Exception as e:
+            logger.error(f"Error generating response with Gemini: {e}")
+            return ChatManager.ERROR_RESPONSE
+
+    async def _save_chat_message(self, user_id, chat_id, question, answer, sources):
+        try:
+            chats = self._chats()
+            if chats is not None:
+                await chats.insert_one(ChatManager.chat_record(user_id, chat_id, question, answer, sources))
+            else:
+                await asyncio.to_thread(ChatManager.save_chat_message, user_id, chat_id, question, answer, sources)
+        except Exception as e:
+            logger.error(f"Failed to save chat message for {chat_id}: {e}")
+
+    def save_chat_message(self, *args):
+        """Write chat history in the background; the response does not wait for it"""
+        task = asyncio.create_task(self._save_chat_message(*args))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def drain(self):
+        """Wait for pending background writes (shutdown, tests)"""
+        if self._background:
+            await asyncio.gather(*list(self._background), return_exceptions=True)
+
+    async def chat(self, data):
+        """Same request and response as the Flask /api/chat; returns (payload, status)"""
+        message = (data.get('message') or '').strip()
+        chat_id = data.get('chat_id') or str(uuid.uuid4())
+        language = data.get('language', 'english')
+
+        if not message:
+            return {'error': 'No message provided'}, 400
+        try:
+            filters = VectorStore.parse_search_filters(data.get('filters'))
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        try:
+            relevant_chunks = await self.search_similar_chunks(message, filters=filters)
+
+            chunk_refs, query_embedding = ChatManager.answer_cache_context(message, relevant_chunks)
+            response, cached = answer_cache.lookup(message, language, chunk_refs, query_embedding)
+            if response is None:
+                response = await self.generate_response(message, relevant_chunks, language)
+                ChatManager.cache_answer(message, language, chunk_refs, query_embedding, response)
+
+            sources = ChatManager.format_sources(relevant_chunks)
+            self.save_chat_message('system', chat_id, message, response, sources)
+
+            return {'response': response, 'chat_id': chat_id, 'sources': sources, 'cached': cached}, 200
+        except Exception as e:
+            logger.error(f"Chat error: {e}")
+            return {'error': f'Chat processing failed: {str(e)}'}, 500
+
+
+pipeline = AsyncChatPipeline()
+
+
+def _wsgi_adapter():
+    try:
+        from a2wsgi import WSGIMiddleware
+    except ImportError:
+        from uvicorn.middleware.wsgi import WSGIMiddleware
+    return WSGIMiddleware(backend.app)
+
+
+_flask_app = None
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+def _cors_headers(scope):
+    origin = dict(scope.get('headers') or []).get(b'origin', b'').decode('latin-1')
+    if origin in Config.CORS_ORIGINS:
+        return [(b'access-control-allow-origin', origin.encode('latin-1')),
+                (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin')]
+    return []
+
+
+async def _send_json(send, scope, payload, status):
+    body = json.dumps(payload, default=str).encode('utf-8')
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers + _cors_headers(scope)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            backend.start_warmup()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await pipeline.drain()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point: async /api/chat, everything else through Flask"""
+    global _flask_app
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['path'] == '/api/chat' and scope['method'] == 'POST':
+        started = backend.request_metrics.start()
+        status = 500
+        try:
+            try:
+                data = json.loads(await _read_body(receive) or b'{}')
+            except ValueError:
+                payload, status = {'error': 'Invalid JSON body'}, 400
+            else:
+                payload, status = await pipeline.chat(data if isinstance(data, dict) else {})
+            await _send_json(send, scope, payload, status)
+        finally:
+            backend.request_metrics.finish('POST /api/chat (async)', status, started)
+        return
+
+    if _flask_app is None:
+        _flask_app = _wsgi_adapter()
+    await _flask_app(scope, receive, send)
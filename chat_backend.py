@@ -7,34 +7,46 @@ import os
 import sys
 import uuid
 import json
+import hashlib
 import time
 import logging
+import tempfile
+from collections import deque
 from datetime import datetime, timezone, timedelta
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Optional, Any
 from io import BytesIO
 
+# Heavy libraries (document parsers, SentenceTransformer, Gemini, the Qdrant
+# connection) are loaded on first use through the service registry
+from tools.service_registry import ServiceRegistry, lazy_import
+
+services = ServiceRegistry(retry_interval=float(os.getenv('SERVICE_RETRY_SECONDS', 30)))
+_module_import_started = time.perf_counter()
+
 # Flask and web framework imports
-from flask import Flask, request, jsonify, send_from_directory
-from flask_cors import CORS, cross_origin
-from flask_bcrypt import Bcrypt
+with services.timed('flask'):
+    from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, g
+    from flask_cors import CORS, cross_origin
+    from flask_bcrypt import Bcrypt
+    from werkzeug.utils import secure_filename
 from functools import wraps
 
-# Document processing imports
-import PyPDF2
-import docx
-import pandas as pd
-from PIL import Image
-import pytesseract
-
-# AI and vector database imports
-import google.generativeai as genai
-from qdrant_client import QdrantClient
-from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
+# Vector database imports
+with services.timed('qdrant_client'):
+    from qdrant_client.http import models
+from tools.query_embedding_service import QueryEmbeddingService
+from tools.job_queue import JobStore, JobQueue
+from tools.embedding_cache import get_embedding_cache, cached_embed
+from tools.payload_schema import DOCUMENTS_PAYLOAD_SCHEMA, build_filter, ensure_payload_indexes
+from tools.answer_cache import AnswerCache
+from tools.context_packer import pack_context
+from tools.request_metrics import RequestMetrics
 
 # MongoDB imports
 try:
-    from mongodb import mongo_client, users_collection, document_agent_chats_collection
+    with services.timed('mongodb'):
+        from mongodb import mongo_client, users_collection, document_agent_chats_collection
     MONGODB_AVAILABLE = True
 except ImportError:
     MONGODB_AVAILABLE = False
@@ -51,7 +63,11 @@ logger = logging.getLogger(__name__)
 # Configuration
 class Config:
     # Flask settings
-    DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+    
+    # Serving (see serve.py for the multi-worker production server)
+    METRICS_DIR = os.getenv('METRICS_DIR')  # shared by workers so /api/metrics covers all of them
+    CORS_ORIGINS = ['http://localhost:3000', 'http://localhost:5173']
     
     # AI Models
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
@@ -67,11 +83,30 @@ class Config:
     ALLOWED_EXTENSIONS = {'.pdf', '.docx', '.txt', '.csv', '.xlsx'}
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
-    MAX_CHUNKS_PER_FILE = 200
     
     # Chat settings
     MAX_CONTEXT_CHUNKS = 5
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 3000))  # retrieved context tokens per prompt
     MAX_CHAT_HISTORY = 50
+    
+    # Query embedding batching and cache
+    QUERY_EMBED_MAX_BATCH = int(os.getenv('QUERY_EMBED_MAX_BATCH', 32))
+    QUERY_EMBED_MAX_WAIT_MS = float(os.getenv('QUERY_EMBED_MAX_WAIT_MS', 5))
+    QUERY_EMBED_CACHE_SIZE = int(os.getenv('QUERY_EMBED_CACHE_SIZE', 1024))
+    
+    # Answer cache (exact, plus optional semantic matching of reworded questions)
+    ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', 1024))
+    ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', 86400))
+    ANSWER_CACHE_SEMANTIC = os.getenv('ANSWER_CACHE_SEMANTIC', 'False').lower() == 'true'
+    ANSWER_CACHE_SEMANTIC_THRESHOLD = float(os.getenv('ANSWER_CACHE_SEMANTIC_THRESHOLD', 0.95))
+    
+    # Background ingestion
+    UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
+    INGEST_QUEUE_DB = os.getenv('INGEST_QUEUE_DB', os.path.join(os.getcwd(), 'ingest_jobs.db'))
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 2))
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 64))  # chunks embedded and upserted per batch
+    INGEST_EXTRACT_PROCESSES = int(os.getenv('INGEST_EXTRACT_PROCESSES', min(4, os.cpu_count() or 1)))
+    INGEST_AUTOSTART = os.getenv('INGEST_AUTOSTART', 'True').lower() == 'true'  # serve.py starts it per worker
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -79,55 +114,115 @@ app.config['MAX_CONTENT_LENGTH'] = Config.MAX_FILE_SIZE
 
 # Initialize extensions
 bcrypt = Bcrypt(app)
-CORS(app, origins=['http://localhost:3000', 'http://localhost:5173'], supports_credentials=True)
+CORS(app, origins=Config.CORS_ORIGINS, supports_credentials=True)
 
-# Initialize AI models
-try:
-    embedding_model = SentenceTransformer(Config.EMBEDDING_MODEL)
-    logger.info(f"Loaded embedding model: {Config.EMBEDDING_MODEL}")
-except Exception as e:
-    logger.error(f"Failed to load embedding model: {e}")
-    embedding_model = None
+# AI models and the vector database are built on first use (or by the
+# background warmup started once the server is up), see get_* below
+def _load_embedding_model():
+    try:
+        sentence_transformers = lazy_import('sentence_transformers', services)
+        model = sentence_transformers.SentenceTransformer(Config.EMBEDDING_MODEL)
+        logger.info(f"Loaded embedding model: {Config.EMBEDDING_MODEL}")
+        return model
+    except Exception as e:
+        # Raised so the registry records the error and retries later
+        logger.error(f"Failed to load embedding model: {e}")
+        raise
 
-# Initialize Gemini
-try:
-    if Config.GEMINI_API_KEY:
+def _load_query_embedder():
+    # Batched, cached query embeddings for chat traffic
+    embedding_model = get_embedding_model()
+    if not embedding_model:
+        raise RuntimeError("Embedding model not available")
+    return QueryEmbeddingService(
+        lambda texts: embedding_model.encode(texts, convert_to_tensor=False),
+        max_batch_size=Config.QUERY_EMBED_MAX_BATCH,
+        max_wait_ms=Config.QUERY_EMBED_MAX_WAIT_MS,
+        cache_size=Config.QUERY_EMBED_CACHE_SIZE
+    )
+
+def _load_gemini_model():
+    try:
+        if not Config.GEMINI_API_KEY:
+            raise RuntimeError("GEMINI_API_KEY not provided")
+        genai = lazy_import('google.generativeai', services)
         genai.configure(api_key=Config.GEMINI_API_KEY)
-        gemini_model = genai.GenerativeModel(Config.GEMINI_MODEL)
+        model = genai.GenerativeModel(Config.GEMINI_MODEL)
         logger.info(f"Initialized Gemini model: {Config.GEMINI_MODEL}")
-        GEMINI_AVAILABLE = True
-    else:
-        logger.warning("GEMINI_API_KEY not provided")
-        GEMINI_AVAILABLE = False
-        gemini_model = None
-except Exception as e:
-    logger.error(f"Failed to initialize Gemini: {e}")
-    GEMINI_AVAILABLE = False
-    gemini_model = None
-
-# Initialize Qdrant client
-try:
-    qdrant_client = QdrantClient(url=Config.QDRANT_HOST)
-    
-    # Create collection if it doesn't exist
-    collections = qdrant_client.get_collections().collections
-    if Config.COLLECTION_NAME not in [c.name for c in collections]:
-        qdrant_client.create_collection(
-            collection_name=Config.COLLECTION_NAME,
-            vectors_config=models.VectorParams(
-                size=384,  # all-MiniLM-L6-v2 dimension
-                distance=models.Distance.COSINE
-            ),
-            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0)
-        )
-        logger.info(f"Created Qdrant collection: {Config.COLLECTION_NAME}")
-    else:
-        logger.info(f"Using existing Qdrant collection: {Config.COLLECTION_NAME}")
-    
-    QDRANT_AVAILABLE = True
-except Exception as e:
-    logger.error(f"Failed to initialize Qdrant: {e}")
-    QDRANT_AVAILABLE = False
+        return model
+    except Exception as e:
+        logger.error(f"Failed to initialize Gemini: {e}")
+        raise
+
+def _connect_qdrant():
+    try:
+        client = lazy_import('qdrant_client', services).QdrantClient(url=Config.QDRANT_HOST)
+        
+        # Create collection if it doesn't exist
+        collections = client.get_collections().collections
+        if Config.COLLECTION_NAME not in [c.name for c in collections]:
+            create_documents_collection(client)
+            logger.info(f"Created Qdrant collection: {Config.COLLECTION_NAME}")
+        else:
+            logger.info(f"Using existing Qdrant collection: {Config.COLLECTION_NAME}")
+            ensure_documents_indexes(client)
+        return client
+    except Exception as e:
+        logger.error(f"Failed to initialize Qdrant: {e}")
+        raise
+
+services.register('embedding_model', _load_embedding_model)
+services.register('query_embedder', _load_query_embedder)
+services.register('gemini', _load_gemini_model)
+services.register('qdrant', _connect_qdrant)
+
+# Services /api/ready waits for; Gemini is optional (answers degrade to an error message)
+REQUIRED_SERVICES = ['embedding_model', 'query_embedder', 'qdrant']
+
+def get_embedding_model():
+    return services.get('embedding_model')
+
+def get_query_embedder():
+    return services.get('query_embedder')
+
+def get_gemini_model():
+    return services.get('gemini')
+
+def get_qdrant_client():
+    return services.get('qdrant')
+
+def _log_startup_report():
+    logger.info(services.format_report())
+
+def start_warmup():
+    """Load models and connect to Qdrant in a background thread (idempotent)"""
+    services.warmup(on_complete=_log_startup_report)
+
+# Generated answers, keyed on the question and the exact chunks retrieved for it
+answer_cache = AnswerCache(
+    max_entries=Config.ANSWER_CACHE_SIZE,
+    ttl_seconds=Config.ANSWER_CACHE_TTL,
+    semantic=Config.ANSWER_CACHE_SEMANTIC,
+    semantic_threshold=Config.ANSWER_CACHE_SEMANTIC_THRESHOLD
+)
+
+# Payload fields used to look up a document's existing chunks on re-upload
+def create_documents_collection(client):
+    """Create the documents collection and the payload indexes deduplication and filtered search rely on"""
+    client.create_collection(
+        collection_name=Config.COLLECTION_NAME,
+        vectors_config=models.VectorParams(
+            size=384,  # all-MiniLM-L6-v2 dimension
+            distance=models.Distance.COSINE
+        ),
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0)
+    )
+    ensure_documents_indexes(client)
+
+def ensure_documents_indexes(client):
+    """Create any payload index from the shared schema that the collection is missing"""
+    for field, error in ensure_payload_indexes(client, Config.COLLECTION_NAME, DOCUMENTS_PAYLOAD_SCHEMA).items():
+        logger.warning(f"Could not create payload index for {field}: {error}")
 
 # In-memory storage for when databases aren't available
 if not MONGODB_AVAILABLE:
@@ -141,7 +236,7 @@ class DocumentProcessor:
     def extract_text_from_pdf(file_content: bytes) -> str:
         """Extract text from PDF file"""
         try:
-            pdf_reader = PyPDF2.PdfReader(BytesIO(file_content))
+            pdf_reader = lazy_import('PyPDF2', services).PdfReader(BytesIO(file_content))
             text = ""
             for page_num, page in enumerate(pdf_reader.pages, 1):
                 page_text = page.extract_text()
@@ -156,7 +251,7 @@ class DocumentProcessor:
     def extract_text_from_docx(file_content: bytes) -> str:
         """Extract text from DOCX file"""
         try:
-            doc = docx.Document(BytesIO(file_content))
+            doc = lazy_import('docx', services).Document(BytesIO(file_content))
             text = ""
             for paragraph in doc.paragraphs:
                 if paragraph.text.strip():
@@ -170,7 +265,7 @@ class DocumentProcessor:
     def extract_text_from_xlsx(file_content: bytes) -> str:
         """Extract text from Excel file"""
         try:
-            df = pd.read_excel(BytesIO(file_content))
+            df = lazy_import('pandas', services).read_excel(BytesIO(file_content))
             # Convert DataFrame to text representation
             text = f"Table Data:\\n{df.to_string(index=False)}"
             return text
@@ -182,13 +277,99 @@ class DocumentProcessor:
     def extract_text_from_csv(file_content: bytes) -> str:
         """Extract text from CSV file"""
         try:
-            df = pd.read_csv(BytesIO(file_content))
+            df = lazy_import('pandas', services).read_csv(BytesIO(file_content))
             text = f"Table Data:\\n{df.to_string(index=False)}"
             return text
         except Exception as e:
             logger.error(f"Error extracting CSV: {e}")
             return ""
     
+    @staticmethod
+    def extract_text(file_content: bytes, file_ext: str) -> str:
+        """Extract text based on file type"""
+        if file_ext == '.pdf':
+            return DocumentProcessor.extract_text_from_pdf(file_content)
+        elif file_ext == '.docx':
+            return DocumentProcessor.extract_text_from_docx(file_content)
+        elif file_ext == '.txt':
+            return file_content.decode('utf-8')
+        elif file_ext == '.xlsx':
+            return DocumentProcessor.extract_text_from_xlsx(file_content)
+        elif file_ext == '.csv':
+            return DocumentProcessor.extract_text_from_csv(file_content)
+        raise ValueError(f'Unsupported file type: {file_ext}')
+    
+    @staticmethod
+    def iter_pages(file_path: str, file_ext: str):
+        """Yield (page_number, text) from a saved file one page or block at a time
+        
+        Page numbers are 1-based for PDFs and None for formats without pages.
+        The file is read incrementally, never loaded whole into memory (except
+        .docx and .xlsx, whose parsers need the full document).
+        """
+        if file_ext == '.pdf':
+            with open(file_path, 'rb') as f:
+                # PdfReader seeks in the file and parses each page on demand
+                pdf_reader = lazy_import('PyPDF2', services).PdfReader(f)
+                for page_num, page in enumerate(pdf_reader.pages, 1):
+                    try:
+                        page_text = page.extract_text() or ''
+                    except Exception as e:
+                        logger.warning(f"Skipping unreadable page {page_num} of {os.path.basename(file_path)}: {e}")
+                        continue
+                    if page_text.strip():
+                        yield page_num, page_text
+        elif file_ext == '.docx':
+            doc = lazy_import('docx', services).Document(file_path)
+            for paragraph in doc.paragraphs:
+                if paragraph.text.strip():
+                    yield None, paragraph.text
+        elif file_ext == '.txt':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield None, line
+        elif file_ext == '.csv':
+            pd = lazy_import('pandas', services)
+            for i, frame in enumerate(pd.read_csv(file_path, chunksize=1000)):
+                yield None, ("Table Data:\n" if i == 0 else "") + frame.to_string(index=False)
+        elif file_ext == '.xlsx':
+            df = lazy_import('pandas', services).read_excel(file_path)
+            yield None, f"Table Data:\n{df.to_string(index=False)}"
+        else:
+            raise ValueError(f'Unsupported file type: {file_ext}')
+    
+    @staticmethod
+    def iter_chunks(pages, chunk_size: int = Config.CHUNK_SIZE, overlap: int = Config.CHUNK_OVERLAP):
+        """Split a stream of (page_number, text) into overlapping word windows
+        
+        Same windows as chunk_text, but only one window of words is held in
+        memory, and each chunk records the first and last page it spans.
+        """
+        step = max(1, chunk_size - overlap)
+        window = deque()  # (word, page_number)
+        unemitted = 0     # words at the end of the window not yet in any chunk
+        
+        def make_chunk():
+            pages_spanned = [page for _, page in window if page is not None]
+            return {
+                'text': " ".join(word for word, _ in window),
+                'page_start': pages_spanned[0] if pages_spanned else None,
+                'page_end': pages_spanned[-1] if pages_spanned else None
+            }
+        
+        for page_number, text in pages:
+            for word in text.split():
+                window.append((word, page_number))
+                unemitted += 1
+                if len(window) >= chunk_size:
+                    yield make_chunk()
+                    for _ in range(min(step, len(window))):
+                        window.popleft()
+                    unemitted = 0
+        
+        if unemitted:
+            yield make_chunk()
+    
     @staticmethod
     def chunk_text(text: str, chunk_size: int = Config.CHUNK_SIZE, 
                    overlap: int = Config.CHUNK_OVERLAP) -> List[str]:
@@ -204,10 +385,6 @@ class DocumentProcessor:
             chunk_text = " ".join(chunk_words)
             if chunk_text.strip():
                 chunks.append(chunk_text)
-            
-            # Limit number of chunks per file
-            if len(chunks) >= Config.MAX_CHUNKS_PER_FILE:
-                break
         
         return chunks
 
@@ -216,109 +393,314 @@ class VectorStore:
     @staticmethod
     def generate_embeddings(texts: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of texts"""
+        embedding_model = get_embedding_model()
         if not embedding_model:
             raise Exception("Embedding model not available")
         
         try:
-            embeddings = embedding_model.encode(texts, convert_to_tensor=False)
-            return embeddings.tolist()
+            # Chunks embedded before (same model, same text) come from the on-disk cache
+            cache = get_embedding_cache(Config.EMBEDDING_MODEL, embedding_model.get_sentence_embedding_dimension())
+            return cached_embed(cache, texts, lambda missing: embedding_model.encode(missing, convert_to_tensor=False))
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             raise
     
+    @staticmethod
+    def content_hash(content) -> str:
+        """SHA-256 hex digest of text or bytes"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return hashlib.sha256(content).hexdigest()
+    
+    @staticmethod
+    def chunk_point_id(filename: str, chunk_hash: str) -> str:
+        """Deterministic point id for a chunk of a given document"""
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"kmrl-chunk://{filename}/{chunk_hash}"))
+    
+    @staticmethod
+    def get_document_points(filename: str) -> Dict[str, Dict]:
+        """Map point id -> dedup payload for every stored chunk of a document"""
+        doc_filter = models.Filter(must=[
+            models.FieldCondition(key='filename', match=models.MatchValue(value=filename))
+        ])
+        existing = {}
+        offset = None
+        while True:
+            points, offset = get_qdrant_client().scroll(
+                collection_name=Config.COLLECTION_NAME,
+                scroll_filter=doc_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=['chunk_hash', 'chunk_index', 'file_hash'],
+                with_vectors=False
+            )
+            for point in points:
+                existing[str(point.id)] = point.payload or {}
+            if offset is None:
+                return existing
+    
+    @staticmethod
+    def count_unchanged_chunks(filename: str, file_hash: str) -> int:
+        """Number of stored chunks if every one came from a file with this hash, else 0"""
+        if not get_qdrant_client():
+            return 0
+        
+        def _count(*conditions):
+            return get_qdrant_client().count(
+                collection_name=Config.COLLECTION_NAME,
+                count_filter=models.Filter(must=list(conditions)),
+                exact=True
+            ).count
+        
+        by_name = models.FieldCondition(key='filename', match=models.MatchValue(value=filename))
+        by_hash = models.FieldCondition(key='file_hash', match=models.MatchValue(value=file_hash))
+        total = _count(by_name)
+        if total and _count(by_name, by_hash) == total:
+            return total
+        return 0
+    
+    @staticmethod
+    def sync_document_chunks(chunks, total_chunks: int, metadata: Dict, filename: str,
+                             batch_size: int = Config.INGEST_BATCH_SIZE, on_batch=None) -> Dict:
+        """Store a document's chunks batch by batch, embedding only chunks not already stored
+        
+        `chunks` is an iterable of dicts with 'text' and optionally
+        'page_start'/'page_end', in document order; only one batch of them is
+        held in memory. New chunks are embedded and upserted, unchanged ones
+        get their position and file metadata refreshed, and stored chunks that
+        no longer appear in the document are deleted at the end.
+        `on_batch(stats)` is called after every batch. Callers must not sync
+        the same filename concurrently (upload jobs are serialized per filename).
+        
+        Batches are written with wait=False, so Qdrant indexes one batch while
+        the next is being embedded; the last write waits, and since Qdrant
+        applies a collection's updates in order, every chunk is searchable
+        once this returns. Stale chunks are found by re-reading the document's
+        points after that write rather than from the snapshot taken up front,
+        so writes still queued when the snapshot was taken are not missed.
+        """
+        existing = VectorStore.get_document_points(filename)
+        stats = {'chunks_total': total_chunks, 'chunks_embedded': 0, 'chunks_unchanged': 0, 'chunks_deleted': 0}
+        
+        def flush(entries, wait):
+            VectorStore._sync_batch(entries, existing, total_chunks, metadata, filename, stats, wait=wait)
+            if on_batch:
+                on_batch(stats)
+        
+        # One full batch is held back until the next one starts, so the final
+        # batch is known and written with wait=True
+        seen, batch, pending = set(), [], None
+        for index, chunk in enumerate(chunks):
+            chunk_hash = VectorStore.content_hash(chunk['text'])
+            point_id = VectorStore.chunk_point_id(filename, chunk_hash)
+            if point_id in seen:
+                continue  # Identical chunk repeated within the document
+            seen.add(point_id)
+            batch.append({**chunk, 'index': index, 'chunk_hash': chunk_hash, 'id': point_id})
+            if len(batch) >= batch_size:
+                if pending:
+                    flush(pending, wait=False)
+                pending, batch = batch, []
+        if batch:
+            if pending:
+                flush(pending, wait=False)
+            pending = batch
+        if pending:
+            flush(pending, wait=True)
+        
+        # Re-read after the final wait=True write, which Qdrant applies after every earlier update
+        stale = [point_id for point_id in VectorStore.get_document_points(filename) if point_id not in seen]
+        if stale:
+            get_qdrant_client().delete(
+                collection_name=Config.COLLECTION_NAME,
+                points_selector=models.PointIdsList(points=stale),
+                wait=True
+            )
+            # Answers generated from deleted chunks must not be served again
+            answer_cache.invalidate_chunks(stale)
+        stats['chunks_deleted'] = len(stale)
+        
+        logger.info(f"Synced {filename}: {stats}")
+        return stats
+    
+    @staticmethod
+    def _chunk_position(entry: Dict, total_chunks: int) -> Dict:
+        """Payload fields locating a chunk in its document"""
+        position = {'chunk_index': entry['index'], 'total_chunks': total_chunks}
+        if entry.get('page_start') is not None:
+            position['page_number'] = entry['page_start']
+            position['page_end'] = entry['page_end']
+        return position
+    
+    @staticmethod
+    def _sync_batch(entries: List[Dict], existing: Dict, total_chunks: int, metadata: Dict, filename: str,
+                    stats: Dict, wait: bool = True):
+        new = [entry for entry in entries if entry['id'] not in existing]
+        kept = [entry for entry in entries if entry['id'] in existing]
+        
+        if new:
+            embeddings = VectorStore.generate_embeddings([entry['text'] for entry in new])
+            points = [
+                models.PointStruct(id=entry['id'], vector=embedding, payload={
+                    **metadata,
+                    **VectorStore._chunk_position(entry, total_chunks),
+                    'text': entry['text'],
+                    'filename': filename,
+                    'chunk_hash': entry['chunk_hash']
+                })
+                for entry, embedding in zip(new, embeddings)
+            ]
+            # Only the last write of a batch may wait; the update queue keeps them in order
+            get_qdrant_client().upsert(collection_name=Config.COLLECTION_NAME, points=points, wait=wait and not kept)
+            # Answers generated from chunks this replaces must not be served again
+            answer_cache.invalidate_chunks([entry['id'] for entry in new])
+        
+        # Unchanged chunks keep their vectors; only their position and file metadata move
+        if kept:
+            get_qdrant_client().batch_update_points(
+                collection_name=Config.COLLECTION_NAME,
+                update_operations=[
+                    models.SetPayloadOperation(set_payload=models.SetPayload(
+                        payload={**metadata, **VectorStore._chunk_position(entry, total_chunks)},
+                        points=[entry['id']]
+                    ))
+                    for entry in kept
+                ],
+                wait=wait
+            )
+        
+        stats['chunks_embedded'] += len(new)
+        stats['chunks_unchanged'] += len(kept)
+    
     @staticmethod
     def store_document_chunks(chunks: List[str], metadata: Dict, filename: str) -> int:
-        """Store document chunks in vector database"""
-        if not QDRANT_AVAILABLE:
+        """Store document chunks in vector database, embedding only chunks not already stored"""
+        if not get_qdrant_client():
             raise Exception("Qdrant not available")
         
         try:
-            # Generate embeddings
-            embeddings = VectorStore.generate_embeddings(chunks)
-            
-            # Create points for Qdrant
-            points = []
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                point_metadata = metadata.copy()
-                point_metadata.update({
-                    'text': chunk,
-                    'chunk_index': i,
-                    'total_chunks': len(chunks),
-                    'filename': filename
-                })
-                
-                points.append(models.PointStruct(
-                    id=str(uuid.uuid4()),
-                    vector=embedding,
-                    payload=point_metadata
-                ))
-            
-            # Upload to Qdrant
-            qdrant_client.upsert(collection_name=Config.COLLECTION_NAME, points=points)
-            logger.info(f"Stored {len(points)} chunks for {filename}")
-            
-            return len(points)
+            VectorStore.sync_document_chunks(({'text': chunk} for chunk in chunks), len(chunks), metadata, filename)
+            return len(chunks)
             
         except Exception as e:
             logger.error(f"Error storing chunks: {e}")
             raise
     
     @staticmethod
-    def search_similar_chunks(query: str, limit: int = Config.MAX_CONTEXT_CHUNKS) -> List[Dict]:
-        """Search for similar chunks using vector similarity"""
-        if not QDRANT_AVAILABLE or not embedding_model:
+    def parse_search_filters(raw: Optional[Dict]) -> Optional[Dict]:
+        """Translate chat filter parameters into payload filters
+        
+        Accepts `document_type` (e.g. "pdf", or a list), `filename` (string or list)
+        and `date_from` / `date_to` (ISO-8601 dates or datetimes, matched against the
+        upload date). Raises ValueError on malformed input.
+        """
+        if not raw:
+            return None
+        if not isinstance(raw, dict):
+            raise ValueError('filters must be an object')
+        
+        filters = {}
+        document_types = raw.get('document_type')
+        if document_types:
+            document_types = document_types if isinstance(document_types, list) else [document_types]
+            filters['file_type'] = ['.' + str(t).lower().lstrip('.') for t in document_types]
+        
+        filenames = raw.get('filename')
+        if filenames:
+            filters['filename'] = filenames if isinstance(filenames, list) else [filenames]
+        
+        date_range = {}
+        for key, bound in (('date_from', 'gte'), ('date_to', 'lte')):
+            value = raw.get(key)
+            if not value:
+                continue
+            try:
+                parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+            except ValueError:
+                raise ValueError(f'{key} must be an ISO-8601 date or datetime')
+            if bound == 'lte' and len(str(value)) == 10:
+                # A bare end date includes the whole day
+                parsed, bound = parsed + timedelta(days=1), 'lt'
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            date_range[bound] = parsed.isoformat()
+        if date_range:
+            filters['upload_date'] = date_range
+        
+        return filters or None
+    
+    @staticmethod
+    def search_similar_chunks(query: str, limit: int = Config.MAX_CONTEXT_CHUNKS, filters: Optional[Dict] = None) -> List[Dict]:
+        """Search for similar chunks using vector similarity, optionally scoped by payload filters"""
+        query_embedder = get_query_embedder()
+        if not get_qdrant_client() or not query_embedder:
             return []
         
         try:
-            # Generate query embedding
-            query_embedding = embedding_model.encode([query])[0].tolist()
+            # Generate query embedding (batched with concurrent requests, cached)
+            query_embedding = query_embedder.embed(query)
             
-            # Search in Qdrant
-            search_results = qdrant_client.search(
+            # Search in Qdrant; filtered fields are backed by payload indexes
+            search_results = get_qdrant_client().search(
                 collection_name=Config.COLLECTION_NAME,
                 query_vector=query_embedding,
                 limit=limit,
-                with_payload=True
+                with_payload=True,
+                query_filter=build_filter(filters, DOCUMENTS_PAYLOAD_SCHEMA)
             )
             
-            # Format results
-            results = []
-            for hit in search_results:
-                results.append({
-                    'text': hit.payload.get('text', ''),
-                    'filename': hit.payload.get('filename', ''),
-                    'chunk_index': hit.payload.get('chunk_index', 0),
-                    'score': hit.score,
-                    'metadata': hit.payload
-                })
-            
-            return results
+            return VectorStore.format_search_results(search_results)
             
         except Exception as e:
             logger.error(f"Error searching chunks: {e}")
             return []
+    
+    @staticmethod
+    def format_search_results(search_results) -> List[Dict]:
+        """Turn Qdrant hits into the chunk dicts used for prompts and sources"""
+        results = []
+        for hit in search_results:
+            results.append({
+                'id': str(hit.id),
+                'text': hit.payload.get('text', ''),
+                'filename': hit.payload.get('filename', ''),
+                'chunk_index': hit.payload.get('chunk_index', 0),
+                'score': hit.score,
+                'metadata': hit.payload
+            })
+        return results
 
 # Chat utilities
 class ChatManager:
+    UNAVAILABLE_RESPONSE = "I apologize, but the AI service is currently unavailable. Please check the configuration and try again."
+    EMPTY_RESPONSE = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+    ERROR_RESPONSE = "I apologize, but I encountered an error while processing your question. Please try again later."
+    
     @staticmethod
-    def generate_response(query: str, context_chunks: List[Dict], language: str = 'english') -> str:
-        """Generate response using Gemini AI"""
-        try:
-            if not GEMINI_AVAILABLE or not gemini_model:
-                return "I apologize, but the AI service is currently unavailable. Please check the configuration and try again."
-            
-            # Build context from chunks
-            context_parts = []
-            for chunk in context_chunks:
-                source_info = f"[Source: {chunk['filename']}, Chunk {chunk['chunk_index'] + 1}]"
-                context_parts.append(f"{source_info}\\n{chunk['text']}")
-            
-            context = "\\n\\n---\\n\\n".join(context_parts)
-            
-            # Create prompt based on selected language
-            if context.strip():
-                if language == 'malayalam':
-                    prompt = f"""Following KMRL documents context based on, user question answer accurately and comprehensively in Malayalam.
+    def build_prompt(query: str, context_chunks: List[Dict], language: str = 'english') -> str:
+        """Build the Gemini prompt from retrieved chunks and the selected language"""
+        # Deduplicate overlapping chunks and trim them to the most relevant sentences within the token budget
+        packed, stats = pack_context(query, [chunk['text'] for chunk in context_chunks], Config.CONTEXT_TOKEN_BUDGET)
+        if context_chunks:
+            logger.info(
+                f"Context packed: {stats['tokens_before']} -> {stats['tokens_after']} tokens "
+                f"({stats['tokens_saved']} prefill tokens saved; {stats['duplicate_paragraphs']} duplicate paragraphs, "
+                f"{stats['trimmed_sentences']} sentences trimmed, {stats['chunks_out']}/{stats['chunks_in']} chunks kept)"
+            )
+        
+        # Build context from chunks
+        context_parts = []
+        for index, text in packed:
+            chunk = context_chunks[index]
+            source_info = f"[Source: {chunk['filename']}, Chunk {chunk['chunk_index'] + 1}]"
+            context_parts.append(f"{source_info}\n{text}")
+        
+        context = "\n\n---\n\n".join(context_parts)
+        
+        # Create prompt based on selected language
+        if context.strip():
+            if language == 'malayalam':
+                prompt = f"""Following KMRL documents context based on, user question answer accurately and comprehensively in Malayalam.
 
 Context:
 {context}
@@ -336,8 +718,8 @@ Instructions:
   - വിഭാഗങ്ങൾക്കിടയിൽ line breaks ഉപയോഗിക്കുക
 
 മലയാളം ഉത്തരം:"""
-                else:
-                    prompt = f"""Based on the following context from KMRL documents, answer the user's question accurately and comprehensively in English.
+            else:
+                prompt = f"""Based on the following context from KMRL documents, answer the user's question accurately and comprehensively in English.
 
 Context:
 {context}
@@ -357,19 +739,31 @@ Instructions:
   - Use proper paragraph spacing
 
 Answer:"""
-            else:
-                if language == 'malayalam':
-                    prompt = f"""User asking: {query}
+        else:
+            if language == 'malayalam':
+                prompt = f"""User asking: {query}
 
 ഈ ചോദ്യത്തിന് ഉത്തരം നൽകാൻ എനിക്ക് പ്രസക്തമായ ഡോക്യുമെന്റ് സന്ദർഭം ഇല്ല. കെഎംആർഎൽ സംബന്ധിയായ വിഷയങ്ങളെക്കുറിച്ച് കൃത്യമായ ഉത്തരം നൽകാൻ ദയവായി നിർദ്ദിഷ്ട കെഎംആർഎൽ ഡോക്യുമെന്റുകൾ അപ്‌ലോഡ് ചെയ്യുക.
 
 മലയാളം ഉത്തരം:"""
-                else:
-                    prompt = f"""The user is asking: {query}
+            else:
+                prompt = f"""The user is asking: {query}
 
 I don't have any relevant document context to answer this question. Please upload specific KMRL documents to provide an accurate answer about KMRL-related topics.
 
 Answer:"""
+        
+        return prompt
+    
+    @staticmethod
+    def generate_response(query: str, context_chunks: List[Dict], language: str = 'english') -> str:
+        """Generate response using Gemini AI"""
+        try:
+            gemini_model = get_gemini_model()
+            if not gemini_model:
+                return ChatManager.UNAVAILABLE_RESPONSE
+            
+            prompt = ChatManager.build_prompt(query, context_chunks, language)
             
             # Generate response using Gemini
             response = gemini_model.generate_content(prompt)
@@ -377,16 +771,94 @@ Answer:"""
             if response.text:
                 return response.text.strip()
             else:
-                return "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+                return ChatManager.EMPTY_RESPONSE
             
         except Exception as e:
             logger.error(f"Error generating response with Gemini: {e}")
-            return "I apologize, but I encountered an error while processing your question. Please try again later."
+            return ChatManager.ERROR_RESPONSE
     
     @staticmethod
-    def save_chat_message(user_id: str, chat_id: str, question: str, answer: str, sources: List[Dict]):
-        """Save chat message to database"""
-        chat_record = {
+    def generate_response_stream(query: str, context_chunks: List[Dict], language: str = 'english'):
+        """Generate response using Gemini AI, yielding text fragments as they arrive
+        
+        A Gemini failure is raised rather than yielded as text, so the caller can
+        tell it apart from the fragments already streamed.
+        """
+        gemini_model = get_gemini_model()
+        if not gemini_model:
+            yield ChatManager.UNAVAILABLE_RESPONSE
+            return
+        
+        try:
+            prompt = ChatManager.build_prompt(query, context_chunks, language)
+            
+            produced = False
+            for part in gemini_model.generate_content(prompt, stream=True):
+                text = getattr(part, 'text', '')
+                if text:
+                    produced = True
+                    yield text
+            
+            if not produced:
+                yield ChatManager.EMPTY_RESPONSE
+                
+        except Exception as e:
+            logger.error(f"Error streaming response with Gemini: {e}")
+            raise
+    
+    @staticmethod
+    def answer_cache_context(query: str, context_chunks: List[Dict]):
+        """Chunk references and, for semantic matching, the query embedding the answer cache keys on"""
+        chunk_refs = [
+            (chunk.get('id'), (chunk.get('metadata') or {}).get('chunk_hash') or VectorStore.content_hash(chunk['text']))
+            for chunk in context_chunks
+        ]
+        query_embedding = None
+        if answer_cache.semantic and get_query_embedder():
+            try:
+                query_embedding = get_query_embedder().embed(query)  # already cached by retrieval
+            except Exception as e:
+                logger.warning(f"Answer cache semantic lookup skipped: {e}")
+        return chunk_refs, query_embedding
+    
+    @staticmethod
+    def cache_answer(query: str, language: str, chunk_refs, query_embedding, response: str):
+        """Cache a generated answer unless it is one of the fallback messages"""
+        if response and response not in (ChatManager.UNAVAILABLE_RESPONSE, ChatManager.EMPTY_RESPONSE,
+                                         ChatManager.ERROR_RESPONSE):
+            answer_cache.store(query, language, chunk_refs, response, query_embedding)
+    
+    @staticmethod
+    def format_sources(relevant_chunks: List[Dict]) -> List[Dict]:
+        """Format retrieved chunks as source entries for the frontend"""
+        sources = []
+        for chunk in relevant_chunks:
+            source_info = {
+                'id': f"source_{len(sources)}",
+                'title': chunk['filename'],
+                'snippet': chunk['text'][:200] + '...' if len(chunk['text']) > 200 else chunk['text'],
+                'score': round(chunk['score'], 3),
+                'chunk_index': chunk['chunk_index'],
+                'filename': chunk['filename']
+            }
+            
+            # Add page information if available
+            if 'metadata' in chunk and chunk['metadata']:
+                metadata = chunk['metadata']
+                if 'page_number' in metadata:
+                    source_info['page_number'] = metadata['page_number']
+                    source_info['title'] = f"{chunk['filename']} - Page {metadata['page_number']}"
+                if 'file_type' in metadata:
+                    source_info['file_type'] = metadata['file_type']
+            
+            sources.append(source_info)
+        
+        return sources
+    
+    @staticmethod
+    def chat_record(user_id: str, chat_id: str, question: str, answer: str, sources: List[Dict]) -> Dict:
+        """Chat history document for one question and answer"""
+        return {
             'user_id': user_id,
             'chat_id': chat_id,
             'question': question,
@@ -394,6 +866,11 @@ Answer:"""
             'sources': sources,
             'timestamp': datetime.now(timezone.utc)
         }
+    
+    @staticmethod
+    def save_chat_message(user_id: str, chat_id: str, question: str, answer: str, sources: List[Dict]):
+        """Save chat message to database"""
+        chat_record = ChatManager.chat_record(user_id, chat_id, question, answer, sources)
         
         if MONGODB_AVAILABLE:
             document_agent_chats_collection.insert_one(chat_record)
@@ -402,26 +879,239 @@ Answer:"""
                 chats_db[chat_id] = []
             chats_db[chat_id].append(chat_record)
 
+# Background ingestion
+def extract_chunks_to_file(file_path: str, file_ext: str, out_path: str) -> Dict:
+    """
+    Stream a saved upload page by page into chunks, written as JSON lines to
+    out_path (runs in the extraction process pool). Memory stays at one page
+    and one chunk window regardless of document size.
+    """
+    counts = {'chunks': 0, 'text_length': 0, 'pages': 0}
+    
+    def pages():
+        for page_number, text in DocumentProcessor.iter_pages(file_path, file_ext):
+            counts['text_length'] += len(text)
+            if page_number is not None:
+                counts['pages'] += 1
+            yield page_number, text
+    
+    with open(out_path, 'w', encoding='utf-8') as out:
+        for chunk in DocumentProcessor.iter_chunks(pages()):
+            out.write(json.dumps(chunk) + '\n')
+            counts['chunks'] += 1
+    return counts
+
+def read_chunks_file(path: str):
+    """Yield the chunk records written by extract_chunks_to_file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+_extraction_pool = None
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Process pool for CPU-heavy text extraction, created on first use"""
+    global _extraction_pool
+    if _extraction_pool is None:
+        _extraction_pool = ProcessPoolExecutor(max_workers=Config.INGEST_EXTRACT_PROCESSES)
+    return _extraction_pool
+
+def process_upload_job(params: Dict, progress) -> Dict:
+    """
+    Ingest one uploaded file from its private staging path, then publish it
+    under its display name for /api/documents/<name>/view. The staged copy is
+    removed either way, so a later upload of the same name never rewrites a
+    file a running job is reading.
+    """
+    view_path = params.get('view_path')
+    try:
+        result = ingest_upload(params, progress)
+        if view_path:
+            os.replace(params['file_path'], view_path)
+        return result
+    finally:
+        if view_path and os.path.exists(params['file_path']):
+            os.remove(params['file_path'])
+
+def ingest_upload(params: Dict, progress) -> Dict:
+    """Extract, chunk, embed and store one uploaded file, reporting each stage"""
+    file_path = params['file_path']
+    filename = params['filename']
+    file_ext = params['file_ext']
+    
+    with progress.stage('hash', progress=0.05) as stage:
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        file_hash = sha.hexdigest()
+        stage.detail['file_hash'] = file_hash
+        unchanged_chunks = VectorStore.count_unchanged_chunks(filename, file_hash)
+        stage.detail['unchanged'] = bool(unchanged_chunks)
+    
+    # Identical re-upload: nothing to extract, embed or store
+    if unchanged_chunks:
+        return {
+            'filename': filename,
+            'file_hash': file_hash,
+            'skipped': True,
+            'chunks_created': unchanged_chunks,
+            'chunks_embedded': 0
+        }
+    
+    # Chunks are spooled to disk between extraction and storage, so neither
+    # process holds the whole document's text
+    fd, chunks_path = tempfile.mkstemp(prefix='ingest_chunks_', suffix='.jsonl')
+    os.close(fd)
+    try:
+        with progress.stage('extract', progress=0.3) as stage:
+            extracted = get_extraction_pool().submit(extract_chunks_to_file, file_path, file_ext, chunks_path).result()
+            stage.detail.update(extracted)
+        
+        if not extracted['text_length']:
+            raise ValueError('No text found in file')
+        if not extracted['chunks']:
+            raise ValueError('Failed to create text chunks')
+        
+        metadata = {
+            'original_filename': filename,
+            'file_type': file_ext,
+            'uploaded_by': params.get('uploaded_by', 'system'),
+            'upload_date': params['upload_date'],
+            'file_size': params['file_size'],
+            'file_hash': file_hash,
+            'total_text_length': extracted['text_length']
+        }
+        
+        # Embed and upsert in bounded batches, reporting progress between 0.3 and 1.0
+        with progress.stage('store', progress=1.0) as stage:
+            def on_batch(stats):
+                done = stats['chunks_embedded'] + stats['chunks_unchanged']
+                stage.report(progress=0.3 + 0.7 * done / max(1, extracted['chunks']), **stats)
+            
+            stats = VectorStore.sync_document_chunks(
+                read_chunks_file(chunks_path), extracted['chunks'], metadata, filename, on_batch=on_batch
+            )
+            stage.detail.update(stats)
+    finally:
+        os.remove(chunks_path)
+    
+    return {
+        'filename': filename,
+        'file_hash': file_hash,
+        'chunks_created': stats['chunks_total'],
+        'text_length': extracted['text_length'],
+        'pages': extracted['pages'],
+        **stats
+    }
+
+def _is_reloader_parent() -> bool:
+    """True in the Flask debug reloader's watcher process, which never serves requests"""
+    return __name__ == '__main__' and Config.DEBUG and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+ingest_jobs = JobStore(Config.INGEST_QUEUE_DB)
+ingest_queue = JobQueue(ingest_jobs, {'upload': process_upload_job}, num_workers=Config.INGEST_WORKERS)
+if Config.INGEST_AUTOSTART and not _is_reloader_parent():
+    ingest_queue.start()
+
+# Services holding sockets or threads, rebuilt in each forked worker (MongoDB is reconnected in init_worker)
+FORK_UNSAFE_SERVICES = ['query_embedder', 'gemini', 'qdrant']
+
+def preload_for_workers():
+    """
+    Run in the pre-fork parent (serve.py): load the embedding model once so
+    every worker shares its weights copy-on-write, and requeue ingestion jobs
+    interrupted by the previous run before any worker starts claiming jobs.
+    """
+    services.warmup(['embedding_model'], background=False)
+    requeued = ingest_jobs.requeue_interrupted()
+    if requeued:
+        logger.info(f"Requeued {requeued} interrupted ingestion job(s)")
+    _log_startup_report()
+
+def init_worker():
+    """Run in each worker after fork: fresh connections and threads, then background warmup"""
+    global mongo_client, users_collection, document_agent_chats_collection
+    services.after_fork(FORK_UNSAFE_SERVICES)
+    if MONGODB_AVAILABLE:
+        import mongodb
+        mongodb.reconnect()
+        mongo_client = mongodb.mongo_client
+        users_collection = mongodb.users_collection
+        document_agent_chats_collection = mongodb.document_agent_chats_collection
+    ingest_jobs.reconnect()
+    ingest_queue.start(requeue=False)
+    start_warmup()
+
+request_metrics = RequestMetrics(Config.METRICS_DIR)
+
+def _loaded_service(name):
+    """The service if it has finished loading, without triggering the load"""
+    return services.peek(name)
+
+@app.before_request
+def _ensure_warmup():
+    # Under a WSGI server nothing calls start_warmup(); the first request (usually a probe) does
+    start_warmup()
+    g.request_started = request_metrics.start()
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = f"{request.method} {request.url_rule.rule if request.url_rule else 'unmatched'}"
+        status_code = response.status_code
+        # Streamed responses are measured until the last chunk has been sent
+        response.call_on_close(lambda: request_metrics.finish(endpoint, status_code, started))
+    return response
+
 # API Routes
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness check: answers immediately, even while models are still loading"""
+    query_embedder = _loaded_service('query_embedder')
+    gemini_available = _loaded_service('gemini') is not None
     return jsonify({
         'status': 'healthy',
+        'ready': services.ready(REQUIRED_SERVICES),
         'timestamp': datetime.now().isoformat(),
         'services': {
             'mongodb': MONGODB_AVAILABLE,
-            'qdrant': QDRANT_AVAILABLE,
-            'embedding_model': embedding_model is not None,
-            'gemini': GEMINI_AVAILABLE,
-            'gemini_model': Config.GEMINI_MODEL if GEMINI_AVAILABLE else None
-        }
+            'qdrant': _loaded_service('qdrant') is not None,
+            'embedding_model': _loaded_service('embedding_model') is not None,
+            'gemini': gemini_available,
+            'gemini_model': Config.GEMINI_MODEL if gemini_available else None
+        },
+        'query_embedding': query_embedder.stats() if query_embedder else None,
+        'answer_cache': answer_cache.stats(),
+        'ingest_jobs': ingest_jobs.counts()
+    })
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Request counts and latency per endpoint for every worker process"""
+    return jsonify({
+        'pid': os.getpid(),
+        'workers': request_metrics.collect()
     })
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness check: 200 once the embedding model and Qdrant are loaded, 503 until then (or if they failed)"""
+    # A probe must not wait on a reconnect; failed services are retried in the background
+    services.retry_failed(REQUIRED_SERVICES)
+    ready = services.ready(REQUIRED_SERVICES)
+    return jsonify({
+        'ready': ready,
+        'timestamp': datetime.now().isoformat(),
+        'services': services.status(),
+        'startup_ms': services.report()
+    }), 200 if ready else 503
+
 @app.route('/api/upload', methods=['POST'])
 def upload_document():
-    """Upload and process document"""
+    """Upload a document and queue it for background ingestion"""
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file uploaded'}), 400
@@ -441,64 +1131,70 @@ def upload_document():
         if not file_ext:
             return jsonify({'error': f'Unsupported file type. Allowed: {Config.ALLOWED_EXTENSIONS}'}), 400
         
-        # Read file content
-        file_content = file.read()
-        
-        # Save original file for viewing
-        upload_dir = os.path.join(os.getcwd(), 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, file.filename)
-        
-        with open(file_path, 'wb') as f:
-            f.write(file_content)
+        # Each upload gets its own staging file, so concurrent uploads of one name
+        # never touch a file an earlier job is still reading; the job publishes it
+        # under the display name for viewing once ingested
+        display_name = os.path.basename(file.filename)
+        staging_dir = os.path.join(Config.UPLOAD_FOLDER, '.staging')
+        os.makedirs(staging_dir, exist_ok=True)
+        file_path = os.path.join(staging_dir, f"{uuid.uuid4().hex}_{secure_filename(display_name) or 'upload' + file_ext}")
+        file.save(file_path)
         
-        # Extract text based on file type
-        if file_ext == '.pdf':
-            text = DocumentProcessor.extract_text_from_pdf(file_content)
-        elif file_ext == '.docx':
-            text = DocumentProcessor.extract_text_from_docx(file_content)
-        elif file_ext == '.txt':
-            text = file_content.decode('utf-8')
-        elif file_ext == '.xlsx':
-            text = DocumentProcessor.extract_text_from_xlsx(file_content)
-        elif file_ext == '.csv':
-            text = DocumentProcessor.extract_text_from_csv(file_content)
-        else:
-            return jsonify({'error': 'Unsupported file type'}), 400
-        
-        if not text.strip():
-            return jsonify({'error': 'No text found in file'}), 400
-        
-        # Chunk the text
-        chunks = DocumentProcessor.chunk_text(text)
-        
-        if not chunks:
-            return jsonify({'error': 'Failed to create text chunks'}), 400
-        
-        # Prepare metadata
-        metadata = {
-            'original_filename': file.filename,
-            'file_type': file_ext,
+        # Jobs for one document run one at a time (in upload order), so each
+        # sync's stale-chunk delete sees every chunk the previous version stored
+        job_id = ingest_queue.submit('upload', {
+            'file_path': file_path,
+            'view_path': os.path.join(Config.UPLOAD_FOLDER, display_name),
+            'filename': display_name,
+            'file_ext': file_ext,
+            'file_size': os.path.getsize(file_path),
             'uploaded_by': 'system',
-            'upload_date': datetime.now(timezone.utc).isoformat(),
-            'file_size': len(file_content),
-            'total_text_length': len(text)
-        }
-        
-        # Store in vector database
-        chunks_stored = VectorStore.store_document_chunks(chunks, metadata, file.filename)
+            'upload_date': datetime.now(timezone.utc).isoformat()
+        }, serial_key=display_name)
         
         return jsonify({
             'success': True,
-            'filename': file.filename,
-            'chunks_created': chunks_stored,
-            'text_length': len(text)
-        })
+            'filename': display_name,
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/api/upload/{job_id}'
+        }), 202
         
     except Exception as e:
         logger.error(f"Upload error: {e}")
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
+@app.route('/api/upload/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    """Report status, per-stage progress and timings for an ingestion job"""
+    job = ingest_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def _iso(ts):
+        return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+    
+    response = {
+        'job_id': job['id'],
+        'filename': job['params'].get('filename'),
+        'status': job['status'],
+        'stage': job['stage'],
+        'progress': job['progress'],
+        'stages': job['stages'],
+        'attempts': job['attempts'],
+        'created_at': _iso(job['created_at']),
+        'started_at': _iso(job['started_at']),
+        'finished_at': _iso(job['finished_at'])
+    }
+    if job['started_at'] and job['finished_at']:
+        response['total_seconds'] = round(job['finished_at'] - job['started_at'], 3)
+    if job['result']:
+        response.update(job['result'])
+    if job['error']:
+        response['error'] = job['error']
+    
+    return jsonify(response)
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Process chat message and generate response"""
@@ -513,37 +1209,26 @@ def chat():
         if not message:
             return jsonify({'error': 'No message provided'}), 400
         
+        try:
+            filters = VectorStore.parse_search_filters(data.get('filters'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         if not chat_id:
             chat_id = str(uuid.uuid4())
         
         # Search for relevant document chunks
-        relevant_chunks = VectorStore.search_similar_chunks(message)
+        relevant_chunks = VectorStore.search_similar_chunks(message, filters=filters)
         
-        # Generate response
-        response = ChatManager.generate_response(message, relevant_chunks, language)
+        # Reuse a cached answer for the same question over the same chunks, otherwise generate one
+        chunk_refs, query_embedding = ChatManager.answer_cache_context(message, relevant_chunks)
+        response, cached = answer_cache.lookup(message, language, chunk_refs, query_embedding)
+        if response is None:
+            response = ChatManager.generate_response(message, relevant_chunks, language)
+            ChatManager.cache_answer(message, language, chunk_refs, query_embedding, response)
         
         # Format sources for frontend
-        sources = []
-        for chunk in relevant_chunks:
-            source_info = {
-                'id': f"source_{len(sources)}",
-                'title': chunk['filename'],
-                'snippet': chunk['text'][:200] + '...' if len(chunk['text']) > 200 else chunk['text'],
-                'score': round(chunk['score'], 3),
-                'chunk_index': chunk['chunk_index'],
-                'filename': chunk['filename']
-            }
-            
-            # Add page information if available
-            if 'metadata' in chunk and chunk['metadata']:
-                metadata = chunk['metadata']
-                if 'page_number' in metadata:
-                    source_info['page_number'] = metadata['page_number']
-                    source_info['title'] = f"{chunk['filename']} - Page {metadata['page_number']}"
-                if 'file_type' in metadata:
-                    source_info['file_type'] = metadata['file_type']
-            
-            sources.append(source_info)
+        sources = ChatManager.format_sources(relevant_chunks)
         
         # Save to chat history
         ChatManager.save_chat_message(
@@ -557,13 +1242,107 @@ def chat():
         return jsonify({
             'response': response,
             'chat_id': chat_id,
-            'sources': sources
+            'sources': sources,
+            'cached': cached
         })
         
     except Exception as e:
         logger.error(f"Chat error: {e}")
         return jsonify({'error': f'Chat processing failed: {str(e)}'}), 500
 
+def _sse_event(event: str, data: Dict) -> str:
+    """Encode a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Process chat message and stream the response as Server-Sent Events
+    
+    Emits a `sources` event as soon as retrieval finishes, then `token` events
+    as the answer is generated, then a final `done` event with the full answer.
+    If generation fails, an `error` event replaces `done` and the failed answer
+    is neither cached nor saved to history.
+    """
+    try:
+        data = request.json
+        message = data.get('message', '').strip()
+        chat_id = data.get('chat_id')
+        language = data.get('language', 'english')
+        
+        if not message:
+            return jsonify({'error': 'No message provided'}), 400
+        
+        try:
+            filters = VectorStore.parse_search_filters(data.get('filters'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not chat_id:
+            chat_id = str(uuid.uuid4())
+        
+        # Retrieval happens before the stream opens so errors still surface as JSON
+        relevant_chunks = VectorStore.search_similar_chunks(message, filters=filters)
+        sources = ChatManager.format_sources(relevant_chunks)
+        chunk_refs, query_embedding = ChatManager.answer_cache_context(message, relevant_chunks)
+        cached_response, cached = answer_cache.lookup(message, language, chunk_refs, query_embedding)
+        
+    except Exception as e:
+        logger.error(f"Chat stream error: {e}")
+        return jsonify({'error': f'Chat processing failed: {str(e)}'}), 500
+    
+    def save(answer):
+        try:
+            ChatManager.save_chat_message(
+                user_id='system',
+                chat_id=chat_id,
+                question=message,
+                answer=answer,
+                sources=sources
+            )
+        except Exception as e:
+            logger.error(f"Failed to save streamed chat message: {e}")
+    
+    def generate():
+        parts = []
+        response = None
+        failed = saved = False
+        try:
+            yield _sse_event('sources', {'chat_id': chat_id, 'sources': sources})
+            
+            if cached_response is not None:
+                # Cached answers arrive as a single token event
+                response = cached_response
+                yield _sse_event('token', {'text': response})
+            else:
+                try:
+                    for text in ChatManager.generate_response_stream(message, relevant_chunks, language):
+                        parts.append(text)
+                        yield _sse_event('token', {'text': text})
+                except Exception:
+                    # Reported apart from the tokens already sent; a failed answer is not cached or saved
+                    failed = True
+                    yield _sse_event('error', {'error': ChatManager.ERROR_RESPONSE, 'chat_id': chat_id})
+                    return
+                
+                response = "".join(parts).strip()
+                ChatManager.cache_answer(message, language, chunk_refs, query_embedding, response)
+            
+            save(response)
+            saved = True
+            yield _sse_event('done', {'response': response, 'chat_id': chat_id, 'sources': sources, 'cached': cached})
+        finally:
+            # A client that disconnects mid-answer still gets the partial answer recorded
+            if not failed and not saved:
+                partial = response if response is not None else "".join(parts).strip()
+                if partial:
+                    save(partial)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/chat/history', methods=['GET'])
 def get_chat_history():
     """Get chat history for user"""
@@ -606,14 +1385,14 @@ def get_chat_history():
 def list_documents():
     """List uploaded documents"""
     try:
-        if not QDRANT_AVAILABLE:
+        if not get_qdrant_client():
             return jsonify({'documents': []})
         
         # Get collection info
-        collection_info = qdrant_client.get_collection(Config.COLLECTION_NAME)
+        collection_info = get_qdrant_client().get_collection(Config.COLLECTION_NAME)
         
         # Search for documents (get a sample to show available docs)
-        results = qdrant_client.scroll(
+        results = get_qdrant_client().scroll(
             collection_name=Config.COLLECTION_NAME,
             limit=100,
             with_payload=True
@@ -650,19 +1429,13 @@ def clear_documents():
         # For now, allow any authenticated user to clear
         # In production, add admin check
         
-        if not QDRANT_AVAILABLE:
+        if not get_qdrant_client():
             return jsonify({'error': 'Vector database not available'}), 500
         
         # Delete and recreate collection
-        qdrant_client.delete_collection(Config.COLLECTION_NAME)
-        qdrant_client.create_collection(
-            collection_name=Config.COLLECTION_NAME,
-            vectors_config=models.VectorParams(
-                size=384,
-                distance=models.Distance.COSINE
-            ),
-            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0)
-        )
+        get_qdrant_client().delete_collection(Config.COLLECTION_NAME)
+        create_documents_collection(get_qdrant_client())
+        answer_cache.clear()
         
         return jsonify({'success': True, 'message': 'All documents cleared'})
         
@@ -674,7 +1447,7 @@ def clear_documents():
 def view_document(filename):
     """Serve document for viewing"""
     try:
-        upload_dir = os.path.join(os.getcwd(), 'uploads')
+        upload_dir = Config.UPLOAD_FOLDER
         file_path = os.path.join(upload_dir, filename)
         
         if not os.path.exists(file_path):
@@ -695,6 +1468,8 @@ def file_too_large(e):
 def internal_error(e):
     return jsonify({'error': 'Internal server error'}), 500
 
+services.record('chat_backend (total)', 'import', time.perf_counter() - _module_import_started)
+
 if __name__ == '__main__':
     logger.info("🚀 Starting KMRL Chat Backend...")
     logger.info(f"📚 Collection: {Config.COLLECTION_NAME}")
@@ -702,6 +1477,11 @@ if __name__ == '__main__':
     logger.info(f"🔍 Embedding Model: {Config.EMBEDDING_MODEL}")
     logger.info(f"🗄️ Vector DB: {Config.QDRANT_HOST}")
     logger.info(f"🔒 MongoDB: {'Available' if MONGODB_AVAILABLE else 'Not Available'}")
-    logger.info(f"✨ Gemini AI: {'Available' if GEMINI_AVAILABLE else 'Not Available'}")
+    logger.info(f"✨ Gemini AI: {'Configured' if Config.GEMINI_API_KEY else 'Not Configured'}")
+    
+    logger.info("🧪 Flask development server (single process); run serve.py for production")
     
+    # Models load in the background while the server starts accepting connections
+    if not _is_reloader_parent():
+        start_warmup()
     app.run(host='0.0.0.0', port=5001, debug=Config.DEBUG)
\ No newline at end of file
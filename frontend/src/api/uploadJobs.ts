@@ -0,0 +1,36 @@
+const API_BASE = 'http://localhost:5001';
+
+export interface UploadJobStatus {
+  job_id: string;
+  filename: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  stage: string | null;
+  progress: number;
+  stages: Record<string, { status: string; seconds?: number }>;
+  chunks_created?: number;
+  text_length?: number;
+  error?: string;
+}
+
+// Poll /api/upload/<job_id> until the background ingestion job finishes.
+export async function waitForUploadJob(
+  jobId: string,
+  onProgress?: (status: UploadJobStatus) => void,
+  intervalMs = 1000,
+): Promise<UploadJobStatus> {
+  for (;;) {
+    const response = await fetch(`${API_BASE}/api/upload/${jobId}`);
+    const status: UploadJobStatus = await response.json();
+    if (!response.ok) {
+      throw new Error(status.error || 'Failed to fetch upload status');
+    }
+    onProgress?.(status);
+    if (status.status === 'completed') {
+      return status;
+    }
+    if (status.status === 'failed') {
+      throw new Error(status.error || 'Ingestion failed');
+    }
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+}
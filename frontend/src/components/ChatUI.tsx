@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import ReactMarkdown from 'react-markdown';
 import { DocumentViewer } from './DocumentViewer';
+import { waitForUploadJob } from '../api/uploadJobs';
 
 interface Message {
   id: string;
@@ -281,9 +282,10 @@ export const ChatUI: React.FC<ChatUIProps> = ({
       });
       const data = await response.json();
       if (response.ok && data.success) {
+        const job = await waitForUploadJob(data.job_id);
         setMessages(prev => [...prev, {
           id: Date.now().toString(),
-          content: `✅ File '${file.name}' uploaded and ingested successfully! (${data.chunks_created} chunks)`,
+          content: `✅ File '${file.name}' uploaded and ingested successfully! (${job.chunks_created} chunks)`,
           sender: 'assistant',
           timestamp: new Date().toISOString(),
         }]);
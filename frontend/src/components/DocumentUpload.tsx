@@ -1,4 +1,5 @@
 import React, { useState, useRef } from 'react';
+import { waitForUploadJob } from '../api/uploadJobs';
 
 interface DocumentUploadProps {
   onUploadSuccess?: (filename: string, chunks: number) => void;
@@ -47,24 +48,22 @@ export const DocumentUpload: React.FC<DocumentUploadProps> = ({
       const formData = new FormData();
       formData.append('file', file);
 
-      // Simulate progress for better UX
-      const progressInterval = setInterval(() => {
-        setUploadProgress(prev => Math.min(prev + 10, 90));
-      }, 200);
-
       const response = await fetch('http://localhost:5001/api/upload', {
         method: 'POST',
         body: formData,
       });
 
-      clearInterval(progressInterval);
-
       if (!response.ok) {
         const errorData = await response.json();
         throw new Error(errorData.error || 'Upload failed');
       }
 
-      const data = await response.json();
+      // Ingestion runs in the background; follow the job's stage progress
+      const { job_id } = await response.json();
+      setUploadProgress(10);
+      const data = await waitForUploadJob(job_id, status => {
+        setUploadProgress(Math.max(10, Math.round(status.progress * 100)));
+      });
       setUploadProgress(100);
 
       // Show success for a moment before hiding
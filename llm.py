@@ -1,19 +1,17 @@
-import ollama
 import os
 from typing import List, Dict, Any
+from agents.agent_base import get_ollama_client, ollama_chat
+from tools.context_packer import pack_context, estimate_tokens
 
 # Ollama configuration
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1')
+OLLAMA_NUM_CTX = int(os.getenv('OLLAMA_NUM_CTX', 4096))
+NUM_PREDICT = 1000
+PROMPT_OVERHEAD_TOKENS = 64  # chat template, chunk headers and rounding in the token estimate
 
-# Initialize Ollama client
-try:
-    ollama.Client(host=OLLAMA_HOST)
-    client = ollama  # For backward compatibility
-    print(f"[OLLAMA] Connected to Ollama at {OLLAMA_HOST}")
-except Exception as e:
-    print(f"[OLLAMA ERROR] Failed to connect to Ollama: {e}")
-    client = None
+# Shared, pooled client (agents/agent_base.py); OLLAMA_HOST is honoured there
+client = get_ollama_client()
 
 def generate_response(prompt, context_chunks):
     """
@@ -26,13 +24,6 @@ def generate_response(prompt, context_chunks):
     Returns:
         dict: Contains 'answer' and 'used_chunks' (indices of chunks actually used)
     """
-    # Format context with chunk indices for tracking
-    formatted_chunks = []
-    for i, (chunk, source) in enumerate(context_chunks):
-        formatted_chunks.append(f"[CHUNK_{i}] Source: {source}\n{chunk}\n")
-    
-    context = "\n".join(formatted_chunks)
-    
     system_prompt = (
         "You are an AI assistant helping with document analysis.\n"
         "Answer the user's question using only the context provided. Do not hallucinate. Always cite the source for each fact using the provided format.\n\n"
@@ -51,14 +42,27 @@ def generate_response(prompt, context_chunks):
         "Respond directly without repeating the question or adding unnecessary explanations. Give just the answer and nothing else."
     )
 
+    # Whatever num_ctx leaves after the instructions, question and answer goes to retrieved context
+    budget = OLLAMA_NUM_CTX - NUM_PREDICT - estimate_tokens(system_prompt + prompt) - PROMPT_OVERHEAD_TOKENS
+    packed, stats = pack_context(prompt, [chunk for chunk, _ in context_chunks], max(budget, 0))
+    
+    # Format context with chunk indices for tracking (indices refer to context_chunks)
+    formatted_chunks = []
+    for i, text in packed:
+        formatted_chunks.append(f"[CHUNK_{i}] Source: {context_chunks[i][1]}\n{text}\n")
+    
+    context = "\n".join(formatted_chunks)
+
     user_message = f"Context:\n{context}\n\nUser Question:\n{prompt}"
 
     try:
         print(f"[LLM] Generating response with model {OLLAMA_MODEL}...")
-        print(f"[LLM] Context length: {len(context)} characters")
+        print(f"[LLM] Context length: {len(context)} characters, {stats['tokens_after']} tokens "
+              f"({stats['tokens_saved']} prefill tokens saved; {stats['duplicate_paragraphs']} duplicate paragraphs, "
+              f"{stats['trimmed_sentences']} sentences trimmed, {stats['chunks_out']}/{stats['chunks_in']} chunks kept)")
         print(f"[LLM] Prompt: {prompt[:100]}...")
         
-        response = ollama.chat(
+        response = ollama_chat(
             model=OLLAMA_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -67,7 +71,8 @@ def generate_response(prompt, context_chunks):
             stream=False,
             options={
                 "temperature": 0.7,
-                "num_predict": 1000,  # Limit response length
+                "num_ctx": OLLAMA_NUM_CTX,
+                "num_predict": NUM_PREDICT,  # Limit response length
                 "stop": ["\n\n\n", "END_RESPONSE"]  # Add stop tokens
             }
         )
@@ -94,11 +99,11 @@ def generate_response(prompt, context_chunks):
                 # Remove the used chunks section from the answer
                 answer = answer.split("[USED_CHUNKS:")[0].strip()
             except:
-                # If parsing fails, assume all chunks were used
-                used_chunks = list(range(len(context_chunks)))
+                # If parsing fails, assume all chunks in the prompt were used
+                used_chunks = [i for i, _ in packed]
         else:
-            # If no used chunks specified, assume all chunks were used
-            used_chunks = list(range(len(context_chunks)))
+            # If no used chunks specified, assume all chunks in the prompt were used
+            used_chunks = [i for i, _ in packed]
         
         return {
             "answer": answer,
@@ -100,3 +100,17 @@ except Exception as e:
     mongo_client = MockMongoClient()
     users_collection = mongo_client.db["users"]
     document_agent_chats_collection = mongo_client.db["document_agent_chats"]
+
+
+def reconnect():
+    """
+    Replace the client with a new one, e.g. in a forked server worker: a
+    MongoClient's sockets and monitor threads must not be shared across a fork.
+    """
+    global mongo_client, db, users_collection, document_agent_chats_collection
+    if not isinstance(mongo_client, MongoClient):
+        return  # In-memory fallback holds no connections
+    mongo_client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+    db = mongo_client[DB_NAME]
+    users_collection = db["users"]
+    document_agent_chats_collection = db["document_agent_chats"]
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Production server for the chat backend
+
+Runs chat_backend.app under gunicorn, a pre-fork WSGI server, instead of
+Flask's single-process development server:
+
+- the app and the embedding model are loaded once in the parent process;
+  forked workers share the model weights copy-on-write, and connections
+  and threads that do not survive a fork (Qdrant, Gemini, the query
+  embedding batcher, SQLite, ingestion workers) are recreated per worker
+- each worker serves several requests concurrently on threads, so a slow
+  Gemini call only ties up one thread
+- per-worker request metrics are shared through METRICS_DIR and served by
+  /api/metrics from any worker
+
+With --asgi the workers run chat_async.app under uvicorn instead: /api/chat
+is answered on an event loop with async Qdrant, Gemini and Mongo clients,
+and every other route is still served by the Flask app.
+
+Reloading: `kill -HUP <master pid>` starts fresh workers and lets the old
+ones finish their in-flight requests (up to --graceful-timeout); the model
+stays loaded in the parent. To pick up code changes, start a new master
+with `kill -USR2` and then stop the old one with `kill -QUIT`.
+
+Usage:
+    python serve.py --workers 8 --threads 8
+    python serve.py --bind 0.0.0.0:5001 --workers 4 --threads 16 --pid /tmp/chat_backend.pid
+    python serve.py --asgi --workers 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from gunicorn.app.base import BaseApplication
+
+
+def default_workers():
+    # Threads cover I/O-bound Gemini waits; processes cover CPU-bound embedding and parsing
+    return max(2, multiprocessing.cpu_count() // 2)
+
+
+class ChatBackendServer(BaseApplication):
+    def __init__(self, options, asgi=False):
+        self.options = options
+        self.asgi = asgi
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        import chat_backend
+        if self.cfg.preload_app:
+            chat_backend.preload_for_workers()
+        if self.asgi:
+            import chat_async
+            return chat_async.app
+        return chat_backend.app
+
+
+def ingest_job_store():
+    from tools.job_queue import JobStore
+    return JobStore(os.getenv('INGEST_QUEUE_DB', os.path.join(os.getcwd(), 'ingest_jobs.db')))
+
+
+def on_starting(server):
+    metrics_dir = os.environ["METRICS_DIR"]
+    os.makedirs(metrics_dir, exist_ok=True)
+    # Drop snapshots of a previous run's workers; METRICS_DIR may be an
+    # operator's directory, so nothing else in it is touched
+    for name in os.listdir(metrics_dir):
+        if name.startswith("worker-") and name.endswith((".json", ".tmp")):
+            try:
+                os.remove(os.path.join(metrics_dir, name))
+            except OSError:
+                pass
+    if not server.cfg.preload_app:
+        # Without preloading the parent never imports the app, so interrupted
+        # ingestion jobs are requeued here, before any worker claims jobs
+        ingest_job_store().requeue_interrupted()
+
+
+def post_worker_init(worker):
+    torch_threads = int(os.getenv('SERVE_TORCH_THREADS', 0))
+    if torch_threads and 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(torch_threads)
+    import chat_backend
+    chat_backend.init_worker()
+    worker.log.info(f"Worker {worker.pid} ready to serve")
+
+
+def child_exit(server, worker):
+    from tools.request_metrics import RequestMetrics
+    RequestMetrics.remove_worker(os.environ["METRICS_DIR"], worker.pid)
+    # Ingestion threads die with the worker (reload timeout, recycling, crash); hand its jobs to the others
+    requeued = ingest_job_store().requeue_orphaned(worker.pid)
+    if requeued:
+        server.log.info(f"Requeued {requeued} ingestion job(s) of exited worker {worker.pid}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the chat backend under a multi-worker production server")
+    parser.add_argument("--bind", default=os.getenv('SERVE_BIND', '0.0.0.0:5001'), help="Address to listen on")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('SERVE_WORKERS', default_workers())), help="Worker processes")
+    parser.add_argument("--threads", type=int, default=int(os.getenv('SERVE_THREADS', 8)), help="Request threads per worker")
+    parser.add_argument("--timeout", type=int, default=int(os.getenv('SERVE_TIMEOUT', 180)),
+                        help="Seconds a silent worker may take before it is restarted")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv('SERVE_GRACEFUL_TIMEOUT', 60)),
+                        help="Seconds workers get to finish in-flight requests on reload or shutdown")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv('SERVE_MAX_REQUESTS', 0)),
+                        help="Recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Load the app in each worker instead of once in the parent (no shared model memory)")
+    parser.add_argument("--asgi", action="store_true",
+                        help="Serve chat_async.app (async /api/chat) with uvicorn workers; --threads does not apply")
+    parser.add_argument("--pid", default=os.getenv('SERVE_PIDFILE'), help="Write the master pid here (for kill -HUP)")
+    args = parser.parse_args()
+
+    # Ingestion threads belong to the workers, not to the pre-fork parent
+    os.environ["INGEST_AUTOSTART"] = "false"
+    os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"chat_backend_metrics_{os.getpid()}"))
+    # Keep torch from starting cpu_count threads in every worker
+    os.environ.setdefault("SERVE_TORCH_THREADS", str(max(1, multiprocessing.cpu_count() // args.workers)))
+
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "uvicorn.workers.UvicornWorker" if args.asgi else "gthread",
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "keepalive": 5,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests // 10 if args.max_requests else 0,
+        "preload_app": not args.no_preload,
+        "pidfile": args.pid,
+        "accesslog": "-",
+        "on_starting": on_starting,
+        "post_worker_init": post_worker_init,
+        "child_exit": child_exit,
+    }
+    mode = "ASGI (uvicorn) workers" if args.asgi else f"workers x {args.threads} threads"
+    print(f"[SERVE] {args.workers} {mode} on {args.bind}"
+          f" ({'shared' if not args.no_preload else 'per-worker'} model memory)")
+    ChatBackendServer(options, asgi=args.asgi).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Answer cache for generated chat responses.
+
+Two levels, both scoped to the exact set of chunks retrieval returned:
+
+- exact: keyed by the normalized question, the answer language and the
+  retrieved chunk ids with their content hashes
+- semantic (optional): a cached answer is reused for a different wording
+  when its question embedding is within `semantic_threshold` cosine
+  similarity of the new one and retrieval returned the same chunks
+
+Because every key includes chunk content hashes, a changed chunk can never
+produce a stale hit. Entries are also dropped eagerly through
+`invalidate_chunks()` when their chunks are re-ingested or deleted, so they
+do not linger in the cache.
+"""
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from tools.query_embedding_service import normalize_query
+
+
+def normalize_question(text):
+    """Normalize a question so case, spacing and trailing punctuation do not split cache entries."""
+    return re.sub(r"[\s?!.]+$", "", normalize_query(unicodedata.normalize("NFKC", text or "")))
+
+
+def context_signature(chunk_refs):
+    """Order-independent hash of (chunk_id, content_hash) pairs."""
+    digest = hashlib.sha256()
+    for chunk_id, content_hash in sorted((str(i), str(h)) for i, h in chunk_refs):
+        digest.update(f"{chunk_id}:{content_hash}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    def __init__(self, max_entries=1024, ttl_seconds=86400, semantic=False, semantic_threshold=0.95):
+        """
+        Args:
+            max_entries: Number of answers kept (least recently used are evicted)
+            ttl_seconds: Age after which an answer is regenerated (0 keeps answers until evicted)
+            semantic: Also match differently worded questions by embedding similarity
+            semantic_threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = max(0, float(ttl_seconds))
+        self.semantic = semantic
+        self.semantic_threshold = float(semantic_threshold)
+
+        self._entries = OrderedDict()  # key -> entry dict
+        self._by_context = {}          # (language, signature) -> keys, for semantic lookups
+        self._by_chunk = {}            # chunk_id -> keys, for invalidation
+        self._lock = threading.Lock()
+
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._invalidated = 0
+        self._expired = 0
+
+    @staticmethod
+    def _key(question, language, signature):
+        raw = f"{normalize_question(question)}\x00{(language or '').strip().lower()}\x00{signature}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _unit(vector):
+        if vector is None:
+            return None
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else None
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        context_keys = self._by_context.get(entry["context"])
+        if context_keys is not None:
+            context_keys.discard(key)
+            if not context_keys:
+                del self._by_context[entry["context"]]
+        for chunk_id in entry["chunk_ids"]:
+            chunk_keys = self._by_chunk.get(chunk_id)
+            if chunk_keys is not None:
+                chunk_keys.discard(key)
+                if not chunk_keys:
+                    del self._by_chunk[chunk_id]
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl and time.time() - entry["created"] > self.ttl:
+            self._remove(key)
+            self._expired += 1
+            return None
+        return entry
+
+    def lookup(self, question, language, chunk_refs, query_embedding=None):
+        """
+        Find a cached answer for this question and retrieved context.
+
+        Returns (answer, kind) with kind "exact" or "semantic", or (None, None).
+        """
+        signature = context_signature(chunk_refs)
+        key = self._key(question, language, signature)
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._exact_hits += 1
+                return entry["answer"], "exact"
+
+            query = self._unit(query_embedding) if self.semantic else None
+            if query is not None:
+                context = ((language or "").strip().lower(), signature)
+                best_key, best_score = None, self.semantic_threshold
+                for candidate in list(self._by_context.get(context, ())):
+                    candidate_entry = self._fresh(candidate)
+                    if candidate_entry is None or candidate_entry["embedding"] is None:
+                        continue
+                    score = float(query @ candidate_entry["embedding"])
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self._semantic_hits += 1
+                    return self._entries[best_key]["answer"], "semantic"
+
+            self._misses += 1
+            return None, None
+
+    def store(self, question, language, chunk_refs, answer, query_embedding=None):
+        """Cache a generated answer for this question and retrieved context."""
+        if self.max_entries == 0 or not answer:
+            return
+        chunk_refs = list(chunk_refs)
+        signature = context_signature(chunk_refs)
+        key = self._key(question, language, signature)
+        context = ((language or "").strip().lower(), signature)
+        with self._lock:
+            self._remove(key)
+            entry = {
+                "answer": answer,
+                "created": time.time(),
+                "context": context,
+                "chunk_ids": {str(chunk_id) for chunk_id, _ in chunk_refs},
+                "embedding": self._unit(query_embedding) if self.semantic else None,
+            }
+            self._entries[key] = entry
+            self._by_context.setdefault(context, set()).add(key)
+            for chunk_id in entry["chunk_ids"]:
+                self._by_chunk.setdefault(chunk_id, set()).add(key)
+            self._stores += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_chunks(self, chunk_ids):
+        """Drop every answer generated from any of these chunks. Returns the number dropped."""
+        with self._lock:
+            keys = set()
+            for chunk_id in chunk_ids:
+                keys |= self._by_chunk.get(str(chunk_id), set())
+            for key in keys:
+                self._remove(key)
+            self._invalidated += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._invalidated += len(self._entries)
+            self._entries.clear()
+            self._by_context.clear()
+            self._by_chunk.clear()
+
+    def stats(self):
+        """Hit rates per level and invalidation counters."""
+        with self._lock:
+            lookups = self._exact_hits + self._semantic_hits + self._misses
+            return {
+                "exact_hits": self._exact_hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._exact_hits + self._semantic_hits) / lookups, 4) if lookups else 0.0,
+                "exact_hit_rate": round(self._exact_hits / lookups, 4) if lookups else 0.0,
+                "semantic_hit_rate": round(self._semantic_hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "stores": self._stores,
+                "invalidated": self._invalidated,
+                "expired": self._expired,
+                "semantic": self.semantic,
+                "semantic_threshold": self.semantic_threshold,
+            }
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Embedding throughput benchmark
+
+Starts a local stub of Ollama's /api/embed endpoint with a configurable
+per-request and per-text latency, then measures chunks/sec for
+tools.embedder.embed_batch at several batch sizes. No real model is needed,
+so the numbers isolate client-side batching and concurrency overhead.
+
+Usage:
+    python tools/benchmark_embedder.py --texts 512 --dim 4096
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ollama
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.embedder import embed_batch
+
+
+def make_stub_handler(dim, request_latency, text_latency, slots):
+    def fake_vector(text):
+        seed = hashlib.sha256(text.encode("utf-8")).digest()
+        return [((seed[i % len(seed)] / 255.0) - 0.5) for i in range(dim)]
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            inputs = body.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+
+            # Like Ollama, only `slots` requests are processed concurrently
+            with slots:
+                time.sleep(request_latency + text_latency * len(inputs))
+
+            payload = json.dumps({
+                "model": body.get("model", "stub"),
+                "embeddings": [fake_vector(text) for text in inputs]
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched Ollama embeddings against a local stub")
+    parser.add_argument("--texts", type=int, default=512, help="Number of chunks to embed per run (default: 512)")
+    parser.add_argument("--dim", type=int, default=4096, help="Embedding dimension returned by the stub (default: 4096)")
+    parser.add_argument("--request-ms", type=float, default=20.0, help="Fixed stub latency per request in ms (default: 20)")
+    parser.add_argument("--text-ms", type=float, default=2.0, help="Stub latency per text in ms (default: 2)")
+    parser.add_argument("--parallel", type=int, default=4, help="Requests the stub serves concurrently (default: 4)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Client max concurrent requests (default: 4)")
+    parser.add_argument("--batch-sizes", default="1,8,32,128", help="Comma-separated batch sizes (default: 1,8,32,128)")
+    args = parser.parse_args()
+
+    slots = threading.BoundedSemaphore(args.parallel)
+    handler = make_stub_handler(args.dim, args.request_ms / 1000.0, args.text_ms / 1000.0, slots)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    client = ollama.Client(host=host)
+
+    texts = [f"KMRL benchmark chunk {i} " + "lorem ipsum " * 50 for i in range(args.texts)]
+
+    print(f"Stub Ollama at {host}: {args.request_ms}ms/request + {args.text_ms}ms/text, "
+          f"{args.parallel} parallel slots, dim={args.dim}")
+    print(f"{'batch':>6} {'concurrency':>12} {'seconds':>9} {'chunks/sec':>11}")
+
+    runs = [(1, 1)] + [(int(b), args.concurrency) for b in args.batch_sizes.split(",")]
+    for batch_size, concurrency in runs:
+        start = time.perf_counter()
+        vectors = embed_batch(texts, batch_size=batch_size, max_concurrency=concurrency, client=client,
+                              use_cache=False)
+        elapsed = time.perf_counter() - start
+        assert len(vectors) == len(texts)
+        label = f"{batch_size}" + (" (seq)" if concurrency == 1 else "")
+        print(f"{label:>6} {concurrency:>12} {elapsed:>9.2f} {len(texts) / elapsed:>11.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Persistent in-process inverted index with BM25 scoring.
+
+The index stores term postings and document lengths keyed by Qdrant point
+id, so keyword search never has to scan chunk text. Chunk text itself stays
+in Qdrant; callers fetch payloads for the few ids a search returns.
+"""
+import heapq
+import math
+import os
+import pickle
+import re
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where",
+    "which", "who", "why", "how", "with", "do", "does", "can", "i", "me", "my", "you",
+}
+
+
+def keyword_index_path(collection_name):
+    """Location of the persisted keyword index for a Qdrant collection."""
+    index_dir = os.getenv("BM25_INDEX_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bm25_index"))
+    return os.path.join(index_dir, f"{collection_name}.pkl")
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, path=None, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.postings = {}      # term -> {doc_id: term frequency}
+        self.doc_terms = {}     # doc_id -> {term: term frequency}
+        self.doc_len = {}       # doc_id -> token count
+        self.total_len = 0
+        self.dirty = False
+        self.loaded_mtime = None
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, doc_id, text):
+        """Index (or re-index) one document."""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove(doc_id)
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            self.doc_terms[doc_id] = dict(terms)
+            length = sum(terms.values())
+            self.doc_len[doc_id] = length
+            self.total_len += length
+            self.dirty = True
+
+    def add_many(self, docs):
+        """Index an iterable of (doc_id, text) pairs."""
+        for doc_id, text in docs:
+            self.add(doc_id, text)
+
+    def remove(self, doc_ids):
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id, 0)
+        self.dirty = True
+
+    def clear(self):
+        with self._lock:
+            self.postings, self.doc_terms, self.doc_len = {}, {}, {}
+            self.total_len = 0
+            self.dirty = True
+
+    def idf(self, term):
+        """Inverse document frequency of an already tokenized term (0.0 when unseen)."""
+        with self._lock:
+            n_docs = len(self.doc_len)
+            df = len(self.postings.get(term, ()))
+            if not n_docs or not df:
+                return 0.0
+            return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query, top_k=5):
+        """Return [(doc_id, score)] for the best-matching documents."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self.doc_len)
+            if not n_docs or not terms:
+                return []
+            avgdl = self.total_len / n_docs
+            scores = {}
+            for term in terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                df = len(docs)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(top_k, scores.items(), key=lambda x: x[1])
+
+    def save(self, path=None):
+        """Write the index atomically so a crash never leaves a half-written file."""
+        path = path or self.path
+        if not path:
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            state = {
+                "k1": self.k1, "b": self.b,
+                "postings": self.postings, "doc_terms": self.doc_terms,
+                "doc_len": self.doc_len, "total_len": self.total_len,
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self.dirty = False
+            self.loaded_mtime = os.path.getmtime(path)
+
+    def is_stale(self):
+        """True when another process (e.g. an ingestion run) has saved a newer copy."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        return self.loaded_mtime is None or os.path.getmtime(self.path) > self.loaded_mtime
+
+    @classmethod
+    def load(cls, path):
+        """Load an index from disk, or return an empty one bound to `path`."""
+        index = cls(path)
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            index.k1, index.b = state["k1"], state["b"]
+            index.postings = state["postings"]
+            index.doc_terms = state["doc_terms"]
+            index.doc_len = state["doc_len"]
+            index.total_len = state["total_len"]
+            index.loaded_mtime = os.path.getmtime(path)
+        return index
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_keyword_index(collection_name):
+    """
+    The process-wide keyword index of a collection, shared by every reader in
+    the process. It is reloaded (once, under a lock) when another process has
+    saved a newer copy, unless this process holds unsaved additions.
+    """
+    with _shared_lock:
+        index = _shared.get(collection_name)
+        if index is None or (not index.dirty and index.is_stale()):
+            index = _shared[collection_name] = BM25Index.load(keyword_index_path(collection_name))
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=60, weights=None):
+    """
+    Fuse several ranked id lists with reciprocal-rank fusion.
+
+    Args:
+        rankings: List of ranked lists of ids (best first)
+        k: RRF damping constant
+        weights: Optional per-ranking weights
+    Returns:
+        List of (id, fused_score), best first
+    """
+    fused = {}
+    for r, ranking in enumerate(rankings):
+        weight = weights[r] if weights else 1.0
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (k + rank + 1)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
+
+
+if __name__ == "__main__":
+    # Rebuild the keyword index for a collection from the points already in Qdrant
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from tools.retriever import Retriever
+
+    collection = sys.argv[1] if len(sys.argv) > 1 else "New_Collection"
+    retriever = Retriever(collection_name=collection)
+    count = retriever.rebuild_keyword_index()
+    print(f"Indexed {count} chunks from '{collection}' into {retriever.keyword_index.path}")
@@ -0,0 +1,112 @@
+"""
+Vector storage settings for the Qdrant collections.
+
+The 4096-dim llama2 collection costs 16KB of RAM per chunk as float32
+vectors. These helpers build the collection settings that shrink that:
+
+- scalar quantization keeps an int8 copy of each vector in RAM (4x smaller)
+- binary quantization keeps one bit per dimension in RAM (32x smaller)
+- on_disk moves the original float32 vectors to disk; they are only read
+  to rescore the top candidates found with the quantized copy
+- hnsw_m / hnsw_ef_construct trade index size and build time for recall
+
+Searches use search_params(), which turns on rescoring and oversampling
+for quantized collections (and is ignored by collections without
+quantization).
+"""
+import os
+
+from qdrant_client.http import models
+
+QUANTIZATION_TYPES = ("none", "scalar", "binary")
+
+DISTANCES = {
+    "cosine": models.Distance.COSINE,
+    "euclid": models.Distance.EUCLID,
+    "dot": models.Distance.DOT
+}
+
+# Search-time settings, shared by the retriever and the benchmark
+SEARCH_RESCORE = os.getenv("QDRANT_RESCORE", "true").lower() == "true"
+SEARCH_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", 2.0))
+SEARCH_HNSW_EF = int(os.getenv("QDRANT_HNSW_EF", 0)) or None
+
+
+def quantization_config(quantization="none", always_ram=True):
+    """Qdrant quantization config for "none", "scalar" (int8) or "binary"."""
+    if quantization == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,  # ignore the most extreme 1% of values when picking the int8 range
+                always_ram=always_ram
+            )
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=always_ram))
+    if quantization in (None, "none"):
+        return None
+    raise ValueError(f"Invalid quantization '{quantization}'. Must be one of: {', '.join(QUANTIZATION_TYPES)}")
+
+
+def collection_params(vector_size, distance="cosine", quantization="none", on_disk=False,
+                      hnsw_m=None, hnsw_ef_construct=None):
+    """
+    Keyword arguments for client.create_collection.
+
+    Args:
+        vector_size (int): Dimensionality of the vectors
+        distance (str): Distance metric (cosine, euclid, dot) or a models.Distance
+        quantization (str): "none", "scalar" or "binary"
+        on_disk (bool): Keep original vectors on disk (the quantized copy stays in RAM)
+        hnsw_m (int): Edges per node in the HNSW graph (Qdrant default: 16)
+        hnsw_ef_construct (int): Candidate list size while building the graph (Qdrant default: 100)
+    """
+    if not isinstance(distance, models.Distance):
+        if distance not in DISTANCES:
+            raise ValueError(f"Invalid distance metric '{distance}'. Must be one of: {', '.join(DISTANCES)}")
+        distance = DISTANCES[distance]
+
+    params = {
+        "vectors_config": models.VectorParams(size=vector_size, distance=distance, on_disk=on_disk or None),
+        "quantization_config": quantization_config(quantization)
+    }
+    if hnsw_m is not None or hnsw_ef_construct is not None:
+        params["hnsw_config"] = models.HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct)
+    return params
+
+
+def describe_collection(info):
+    """One-line summary of a collection's vector storage settings."""
+    vectors = info.config.params.vectors
+    quantization = info.config.quantization_config
+    if isinstance(quantization, models.ScalarQuantization):
+        quantization_name = "scalar"
+    elif isinstance(quantization, models.BinaryQuantization):
+        quantization_name = "binary"
+    else:
+        quantization_name = "none"
+    hnsw = info.config.hnsw_config
+    return (f"size={vectors.size} distance={vectors.distance} on_disk={bool(vectors.on_disk)} "
+            f"quantization={quantization_name} hnsw_m={hnsw.m} ef_construct={hnsw.ef_construct}")
+
+
+def search_params(rescore=None, oversampling=None, hnsw_ef=None):
+    """
+    Search parameters for queries against possibly quantized collections.
+
+    Candidates are found with the quantized vectors, `oversampling` times as
+    many as requested, then rescored with the original vectors.
+    """
+    return models.SearchParams(
+        hnsw_ef=hnsw_ef if hnsw_ef is not None else SEARCH_HNSW_EF,
+        quantization=models.QuantizationSearchParams(
+            rescore=SEARCH_RESCORE if rescore is None else rescore,
+            oversampling=oversampling if oversampling is not None else SEARCH_OVERSAMPLING
+        )
+    )
+
+
+def exact_search_params():
+    """Brute-force search over the original vectors, used as ground truth."""
+    return models.SearchParams(exact=True, quantization=models.QuantizationSearchParams(ignore=True))
@@ -0,0 +1,162 @@
+"""
+Token-aware packing of retrieved chunks into a prompt budget.
+
+Retrieved chunks are often much larger than the model context (the
+ingestion chunker produces chunks of up to 15,000 characters) and repeat
+each other (page chunks carry the neighbouring pages' edge paragraphs).
+pack_context() turns them into a context that fits a token budget:
+
+1. paragraphs already present in a higher-ranked chunk are dropped
+2. if the rest still exceeds the budget, repeated sentences are dropped and
+   every remaining sentence is scored against
+   the query (BM25-style term overlap) and the best ones are kept, at
+   least one per chunk in retrieval order, then greedily by score
+3. kept sentences are put back in their original order within each chunk
+
+Token counts are estimates (no model tokenizer is required); pass
+`count_tokens` to use an exact tokenizer.
+"""
+import math
+import re
+from collections import Counter
+
+from tools.bm25_index import tokenize
+
+_WORD_RE = re.compile(r"[A-Za-z]+")
+_OTHER_RE = re.compile(r"[^\sA-Za-z]")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?।])\s+|\n+")
+
+
+def estimate_tokens(text):
+    """
+    Rough LLM token count: about 1.3 tokens per English word, one per digit,
+    punctuation mark or non-Latin character (e.g. Malayalam script).
+    """
+    if not text:
+        return 0
+    return int(math.ceil(len(_WORD_RE.findall(text)) * 1.3)) + len(_OTHER_RE.findall(text))
+
+
+def _paragraph_key(paragraph):
+    return re.sub(r"\s+", " ", paragraph).strip().lower()
+
+
+def _split_sentences(paragraph, max_tokens, count_tokens):
+    """Split a paragraph into sentences, breaking unpunctuated runs (tables, lists) into windows."""
+    sentences = []
+    for sentence in _SENTENCE_RE.split(paragraph):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if count_tokens(sentence) <= max_tokens:
+            sentences.append(sentence)
+            continue
+        words, window = sentence.split(), []
+        for word in words:
+            window.append(word)
+            if count_tokens(" ".join(window)) >= max_tokens:
+                sentences.append(" ".join(window))
+                window = []
+        if window:
+            sentences.append(" ".join(window))
+    return sentences
+
+
+def pack_context(query, texts, budget_tokens, count_tokens=None, max_sentence_tokens=80):
+    """
+    Fit retrieved chunk texts (best first) into `budget_tokens`.
+
+    Returns (packed, stats): `packed` is a list of (index, text) for the
+    chunks that survive, in retrieval order, with their text deduplicated and
+    trimmed; `stats` reports tokens before/after and what was removed.
+    """
+    count_tokens = count_tokens or estimate_tokens
+    tokens_before = sum(count_tokens(text or "") for text in texts)
+
+    # 1. Drop paragraphs repeated from higher-ranked chunks
+    seen = set()
+    chunks = []  # (index, [paragraph, ...])
+    duplicate_paragraphs = 0
+    for index, text in enumerate(texts):
+        paragraphs = []
+        for paragraph in _PARAGRAPH_RE.split(text or ""):
+            key = _paragraph_key(paragraph)
+            if not key:
+                continue
+            if key in seen:
+                duplicate_paragraphs += 1
+                continue
+            seen.add(key)
+            paragraphs.append(paragraph.strip())
+        if paragraphs:
+            chunks.append((index, paragraphs))
+
+    packed = [(index, "\n\n".join(paragraphs)) for index, paragraphs in chunks]
+    tokens_deduped = sum(count_tokens(text) for _, text in packed)
+    stats = {
+        "chunks_in": len(texts),
+        "tokens_before": tokens_before,
+        "duplicate_paragraphs": duplicate_paragraphs,
+        "duplicate_sentences": 0,
+        "trimmed_sentences": 0,
+        "budget_tokens": budget_tokens,
+    }
+
+    # 2. Over budget: keep the most query-relevant sentences
+    if tokens_deduped > budget_tokens:
+        sentences = []  # (chunk_position, paragraph_no, sentence, tokens, terms)
+        seen_sentences = set()
+        for position, (_, paragraphs) in enumerate(chunks):
+            for paragraph_no, paragraph in enumerate(paragraphs):
+                for sentence in _split_sentences(paragraph, max_sentence_tokens, count_tokens):
+                    key = _paragraph_key(sentence)
+                    if key in seen_sentences:
+                        stats["duplicate_sentences"] += 1
+                        continue
+                    seen_sentences.add(key)
+                    sentences.append((position, paragraph_no, sentence, count_tokens(sentence), Counter(tokenize(sentence))))
+
+        query_terms = set(tokenize(query))
+        document_frequency = Counter(term for *_, terms in sentences for term in terms.keys() & query_terms)
+        n = len(sentences)
+
+        def score(item):
+            position, _, _, tokens, terms = item
+            relevance = sum(
+                math.log(1 + (n - document_frequency[t] + 0.5) / (document_frequency[t] + 0.5)) * terms[t] / (terms[t] + 1.2)
+                for t in query_terms if t in terms
+            )
+            # Ties (and sentences with no query terms) favour higher-ranked chunks
+            return relevance - 0.01 * position
+
+        scored = sorted(range(n), key=lambda i: score(sentences[i]), reverse=True)
+        keep, used = set(), 0
+        best_per_chunk = {}
+        for i in scored:
+            best_per_chunk.setdefault(sentences[i][0], i)
+        for position in sorted(best_per_chunk):
+            i = best_per_chunk[position]
+            if used + sentences[i][3] <= budget_tokens:
+                keep.add(i)
+                used += sentences[i][3]
+        for i in scored:
+            if i not in keep and used + sentences[i][3] <= budget_tokens:
+                keep.add(i)
+                used += sentences[i][3]
+
+        # 3. Reassemble kept sentences in document order
+        kept = {}
+        for i in sorted(keep):
+            position, paragraph_no, sentence = sentences[i][:3]
+            kept.setdefault(position, {}).setdefault(paragraph_no, []).append(sentence)
+        packed = [
+            (chunks[position][0], "\n\n".join(" ".join(paragraphs[k]) for k in sorted(paragraphs)))
+            for position, paragraphs in sorted(kept.items())
+        ]
+        stats["trimmed_sentences"] = n - len(keep)
+
+    stats["chunks_out"] = len(packed)
+    stats["tokens_after"] = sum(count_tokens(text) for _, text in packed)
+    stats["tokens_saved"] = tokens_before - stats["tokens_after"]
+    return packed, stats
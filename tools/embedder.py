@@ -1,17 +1,155 @@
 import ollama
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tools.embedding_cache import EMBED_CACHE_ENABLED, get_embedding_cache, cached_embed, record_dimension, stored_dimension
+from tools.embedding_projection import EmbeddingProjection
+
+OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+EMBED_MODEL = os.getenv('OLLAMA_EMBED_MODEL', 'llama2')
+EMBED_DIM = int(os.getenv('OLLAMA_EMBED_DIM', 4096))
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', 32))
+EMBED_MAX_CONCURRENCY = int(os.getenv('EMBED_MAX_CONCURRENCY', 4))
+EMBED_MAX_RETRIES = int(os.getenv('EMBED_MAX_RETRIES', 3))
+# Optional .npz projection (tools/fit_embedding_projection.py) applied to every embedding
+EMBED_PROJECTION = os.getenv('EMBED_PROJECTION', '')
+
+_client = None
+_observed_dims = {}  # model -> dimension of the embeddings it actually returns
+_dims_lock = threading.Lock()
+_projection = None
+_projection_loaded = False
+_projection_lock = threading.Lock()
+
+def get_client():
+    """Shared Ollama client so HTTP connections are reused across calls."""
+    global _client
+    if _client is None:
+        _client = ollama.Client(host=OLLAMA_HOST)
+    return _client
+
+def get_projection():
+    """The configured dimensionality reduction, or None to keep raw embeddings."""
+    global _projection, _projection_loaded
+    with _projection_lock:
+        if not _projection_loaded:
+            if EMBED_PROJECTION:
+                projection = EmbeddingProjection.load(EMBED_PROJECTION)
+                if projection.model != EMBED_MODEL or projection.input_dim != EMBED_DIM:
+                    raise ValueError(
+                        f"Projection {projection.version} was fitted on {projection.input_dim}-dim "
+                        f"'{projection.model}' embeddings, but the embedder uses {EMBED_DIM}-dim '{EMBED_MODEL}'"
+                    )
+                print(f"[EMBED] Projecting {EMBED_DIM}-dim embeddings to {projection.output_dim} dims ({projection.version})")
+                _projection = projection
+            _projection_loaded = True
+        return _projection
+
+def embedding_dimension():
+    """Dimension of the vectors embed_batch returns (after projection, if any)."""
+    projection = get_projection()
+    return projection.output_dim if projection else EMBED_DIM
+
+def embedding_version():
+    """Tag identifying the embedding space, stored with each point."""
+    projection = get_projection()
+    return projection.version if projection else f"{EMBED_MODEL}-raw{EMBED_DIM}"
+
+def model_dimension(model, client=None):
+    """
+    Dimension of `model`'s raw embeddings: remembered from this process,
+    read from the dimensions recorded by the embedding cache, or else
+    measured with one probe embed call (OLLAMA_EMBED_DIM is only a guess).
+    """
+    dim = _observed_dims.get(model)
+    if dim is None:
+        with _dims_lock:
+            dim = _observed_dims.get(model) or stored_dimension(model)
+            if dim is None:
+                dim = len(_embed_with_retry(client or get_client(), ["dimension probe"], model, EMBED_MAX_RETRIES, 0.5)[0])
+                record_dimension(model, dim)
+            _observed_dims[model] = dim
+    return dim
+
+def _embed_with_retry(client, texts, model, max_retries, backoff):
+    for attempt in range(max_retries + 1):
+        try:
+            response = client.embed(model=model, input=texts)
+            embeddings = response["embeddings"]
+            if len(embeddings) != len(texts):
+                raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+            return embeddings
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff * (2 ** attempt) * (1 + random.random())
+            print(f"[EMBED] Batch of {len(texts)} failed ({e}), retrying in {delay:.2f}s ({attempt+1}/{max_retries})")
+            time.sleep(delay)
+
+def embed_batch(texts, batch_size=None, max_concurrency=None, max_retries=None, backoff=0.5, model=None,
+                client=None, use_cache=True, project=True):
+    """
+    Embeds a list of texts using Ollama's batch `embed` endpoint.
+
+    Texts already in the on-disk embedding cache are not sent to Ollama. The
+    rest are split into batches of `batch_size`, and up to `max_concurrency`
+    batches are in flight at once. Failed batches are retried with exponential
+    backoff. Returns one vector per input text, in input order.
+
+    When a projection is configured (EMBED_PROJECTION) vectors are reduced to
+    its dimension; `project=False` returns the raw model embeddings. The cache
+    always holds raw embeddings, so changing the projection does not
+    invalidate it.
+    """
+    if not texts:
+        return []
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    max_concurrency = max_concurrency or EMBED_MAX_CONCURRENCY
+    max_retries = EMBED_MAX_RETRIES if max_retries is None else max_retries
+    model = model or EMBED_MODEL
+    client = client or get_client()
+
+    # Keyed on the dimension the model really returns, resolved before the first lookup
+    cache = get_embedding_cache(model, model_dimension(model, client)) if use_cache and EMBED_CACHE_ENABLED else None
+
+    def embed_missing(missing):
+        vectors = _embed_uncached(missing, batch_size, max_concurrency, max_retries, backoff, model, client)
+        if vectors and len(vectors[0]) != _observed_dims.get(model):
+            # The model changed under the same name; later calls use the cache for its new dimension
+            _observed_dims[model] = len(vectors[0])
+            record_dimension(model, len(vectors[0]))
+        return vectors
+
+    embeddings = cached_embed(cache, list(texts), embed_missing)
+    projection = get_projection() if project else None
+    if projection is not None and model == projection.model:
+        embeddings = projection.transform(embeddings)
+    return embeddings
+
+def _embed_uncached(texts, batch_size, max_concurrency, max_retries, backoff, model, client):
+    batches = [list(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    if len(batches) == 1:
+        return _embed_with_retry(client, batches[0], model, max_retries, backoff)
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as pool:
+        results = pool.map(lambda batch: _embed_with_retry(client, batch, model, max_retries, backoff), batches)
+        embeddings = []
+        for batch_embeddings in results:
+            embeddings.extend(batch_embeddings)
+    return embeddings
 
 def embed_chunks(chunk):
     """
     Embeds the input text chunk using Ollama's embedding model.
     Returns a vector representation of the text.
     """
-    response = ollama.embeddings(model="llama2", prompt=chunk)
-    return response["embedding"]
+    return embed_batch([chunk])[0]
 
 def embed_query(text):
     """
     Embeds the input query using Ollama's embedding model.
     Returns a vector representation of the text.
     """
-    response = ollama.embeddings(model="llama2", prompt=text)
-    return response["embedding"]
+    return embed_batch([text])[0]
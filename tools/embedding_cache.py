@@ -0,0 +1,262 @@
+"""
+Persistent on-disk embedding cache.
+
+Vectors live in a memory-mapped float32 file, one fixed-size slot per
+entry, and a small SQLite index maps content hashes to slots. A parallel
+memory-mapped array tags every slot with a 64-bit hash of the key stored
+in it, so a reader can tell when another process reused the slot between
+its lookup and its read. Each (model, dimension) pair gets its own
+directory, so switching models never returns vectors from a different
+embedding space. When the cache is full the least recently used slot is
+reused. The dimension each model actually returns is recorded next to the
+caches, so a new process picks the right cache before its first embed call.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+EMBED_CACHE_DIR = os.getenv(
+    "EMBED_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".embedding_cache")
+)
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", 200000))
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+
+_SQL_BATCH = 500
+
+
+def _key_tag(key):
+    """Nonzero 64-bit tag of a cache key (0 marks a slot being rewritten)."""
+    return int(key[:16], 16) or 1
+
+
+def content_key(content):
+    """SHA-256 of text (UTF-8) or raw bytes, used as the cache key."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, model, dim, cache_dir=None, max_entries=None):
+        self.model = model
+        self.dim = int(dim)
+        self.max_entries = int(max_entries or EMBED_CACHE_MAX_ENTRIES)
+        safe_model = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+        self.dir = os.path.join(cache_dir or EMBED_CACHE_DIR, f"{safe_model}_{self.dim}")
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.tags_path = os.path.join(self.dir, "tags.u64")
+
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._tags = None
+        self._mmap_slots = 0
+        self.hits = 0
+        self.misses = 0
+
+        # Autocommit mode; writes take an explicit IMMEDIATE lock so slot
+        # allocation stays unique across processes sharing the cache
+        self._conn = sqlite3.connect(
+            os.path.join(self.dir, "index.sqlite"),
+            isolation_level=None, check_same_thread=False, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, norm REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (last_used)")
+
+    def _vectors(self, min_slots):
+        """Memory-map the vector and tag files, growing them (up to max_entries slots) when needed."""
+        row_bytes = self.dim * 4
+        file_slots = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        if file_slots < min_slots:
+            new_slots = min(self.max_entries, max(min_slots, file_slots * 2, 1024))
+            with open(self.vectors_path, "r+b" if file_slots else "w+b") as f:
+                f.truncate(new_slots * row_bytes)
+            file_slots = new_slots
+        tag_slots = os.path.getsize(self.tags_path) // 8 if os.path.exists(self.tags_path) else 0
+        if tag_slots < file_slots:
+            # Slots without a tag (e.g. from before tags existed) read as misses until rewritten
+            with open(self.tags_path, "r+b" if tag_slots else "w+b") as f:
+                f.truncate(file_slots * 8)
+        if self._mmap is None or self._mmap_slots != file_slots:
+            if self._mmap is not None:
+                self._mmap.flush()
+                self._tags.flush()
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(file_slots, self.dim))
+            self._tags = np.memmap(self.tags_path, dtype=np.uint64, mode="r+", shape=(file_slots,))
+            self._mmap_slots = file_slots
+        return self._mmap
+
+    def get_many(self, keys):
+        """Return {key: vector (list of floats)} for the keys present in the cache."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            rows = []
+            for i in range(0, len(keys), _SQL_BATCH):
+                part = keys[i:i + _SQL_BATCH]
+                rows.extend(self._conn.execute(
+                    f"SELECT key, slot, norm FROM entries WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall())
+            if rows:
+                vectors = self._vectors(max(slot for _, slot, _ in rows) + 1)
+                tags = self._tags
+                for key, slot, _ in rows:
+                    # Writers clear a slot's tag before rewriting it, so a slot reused by
+                    # another process between lookup and read fails one of the two checks
+                    tag = _key_tag(key)
+                    if int(tags[slot]) != tag:
+                        continue
+                    vector = np.array(vectors[slot])
+                    if int(tags[slot]) == tag:
+                        found[key] = vector.tolist()
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store {key: vector} pairs, evicting least recently used entries when full."""
+        if not items:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                now = time.time()
+                for key, vector in items.items():
+                    vector = np.asarray(vector, dtype=np.float32)
+                    if vector.shape != (self.dim,):
+                        raise ValueError(f"Expected a {self.dim}-d vector for {self.model}, got {vector.shape}")
+
+                    row = self._conn.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                    if row:
+                        slot = row[0]
+                    elif count < self.max_entries:
+                        slot = count
+                        count += 1
+                    else:
+                        lru_key, slot = self._conn.execute(
+                            "SELECT key, slot FROM entries ORDER BY last_used LIMIT 1"
+                        ).fetchone()
+                        self._conn.execute("DELETE FROM entries WHERE key = ?", (lru_key,))
+
+                    vectors = self._vectors(slot + 1)
+                    self._tags[slot] = 0
+                    vectors[slot] = vector
+                    self._tags[slot] = _key_tag(key)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO entries (key, slot, norm, last_used) VALUES (?, ?, ?, ?)",
+                        (key, slot, float(np.linalg.norm(vector)), now)
+                    )
+                # Vectors reach disk before the index rows that point at them
+                self._vectors(0).flush()
+                self._tags.flush()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model,
+            "dim": self.dim,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model, dim):
+    """Shared cache instance for a (model, dimension) pair, or None when caching is disabled."""
+    if not EMBED_CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        key = (model, int(dim))
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(model, dim)
+        return _caches[key]
+
+
+def _dims_path():
+    return os.path.join(EMBED_CACHE_DIR, "dims.json")
+
+
+def _read_dims():
+    try:
+        with open(_dims_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def stored_dimension(model):
+    """Embedding dimension recorded for `model` by this or an earlier process, or None."""
+    return _read_dims().get(model)
+
+
+def record_dimension(model, dim):
+    """Remember the dimension `model` returns, for processes started later."""
+    with _caches_lock:
+        dims = _read_dims()
+        if dims.get(model) == int(dim):
+            return
+        dims[model] = int(dim)
+        os.makedirs(EMBED_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=EMBED_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(dims, f)
+        os.replace(tmp_path, _dims_path())
+
+
+def cached_embed(cache, contents, embed_fn):
+    """
+    Embed `contents` (texts or bytes) through `cache`, calling `embed_fn` only for misses.
+
+    Duplicate contents are embedded once. Returns one vector per input, in order.
+    """
+    if cache is None:
+        return [list(v) for v in embed_fn(list(contents))]
+
+    keys = [content_key(c) for c in contents]
+    found = cache.get_many(keys)
+
+    missing = {}
+    for key, content in zip(keys, contents):
+        if key not in found and key not in missing:
+            missing[key] = content
+    if missing:
+        vectors = embed_fn(list(missing.values()))
+        computed = {key: (v.tolist() if hasattr(v, "tolist") else list(v)) for key, v in zip(missing, vectors)}
+        if all(len(v) == cache.dim for v in computed.values()):
+            cache.put_many(computed)
+        else:
+            # The model's output dimension differs from the cache's; embedding still succeeds
+            print(f"[EMBED CACHE] Not caching {cache.model}: expected {cache.dim}-d vectors, "
+                  f"got {len(next(iter(computed.values())))}-d")
+        found.update(computed)
+
+    return [found[key] for key in keys]
@@ -0,0 +1,98 @@
+"""
+Dimensionality reduction for text embeddings.
+
+A projection maps the raw llama2 embeddings (4096-dim) to a smaller
+dimension before they are stored or searched. Two kinds are supported:
+
+- "pca": principal components fitted on a sample of the corpus' own
+  embeddings; keeps the directions along which our documents differ most
+- "orthogonal": a random orthonormal basis (no fitting, distances are
+  preserved approximately; a baseline for PCA)
+
+Projections are saved as .npz files tagged with a version string derived
+from the model, method, dimension and the projection matrix itself, so
+points written with one projection can be told apart from another's.
+Projected vectors are L2-normalized for the cosine collections.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+PROJECTION_DIR = os.getenv(
+    "EMBED_PROJECTION_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "embedding_projections")
+)
+PROJECTION_METHODS = ("pca", "orthogonal")
+
+
+class EmbeddingProjection:
+    def __init__(self, mean, components, method, model, explained_variance=None):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)  # (input_dim, output_dim)
+        self.method = method
+        self.model = model
+        self.explained_variance = explained_variance
+        digest = hashlib.sha256(self.mean.tobytes() + self.components.tobytes()).hexdigest()[:12]
+        self.version = f"{model}-{method}{self.output_dim}-{digest}"
+
+    @property
+    def input_dim(self):
+        return self.components.shape[0]
+
+    @property
+    def output_dim(self):
+        return self.components.shape[1]
+
+    @classmethod
+    def fit_pca(cls, vectors, dim, model):
+        """Fit the top `dim` principal components of a sample of embeddings."""
+        X = np.asarray(vectors, dtype=np.float64)
+        if X.ndim != 2 or len(X) < dim:
+            raise ValueError(f"PCA to {dim} dims needs at least {dim} sample vectors, got {len(X)}")
+        mean = X.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(X - mean, full_matrices=False)
+        variance = singular_values ** 2
+        explained = float(variance[:dim].sum() / variance.sum()) if variance.sum() > 0 else 0.0
+        return cls(mean, vt[:dim].T, "pca", model, explained_variance=explained)
+
+    @classmethod
+    def random_orthogonal(cls, input_dim, dim, model, seed=0):
+        """A random orthonormal projection from `input_dim` to `dim` dimensions."""
+        if dim > input_dim:
+            raise ValueError(f"Cannot project {input_dim}-dim vectors up to {dim} dims")
+        q, _ = np.linalg.qr(np.random.default_rng(seed).normal(size=(input_dim, dim)))
+        return cls(np.zeros(input_dim), q, "orthogonal", model)
+
+    def transform(self, vectors):
+        """Project and L2-normalize a list of vectors. Returns lists of floats."""
+        if not len(vectors):
+            return []
+        X = np.asarray(vectors, dtype=np.float32)
+        if X.shape[1] != self.input_dim:
+            raise ValueError(f"Projection {self.version} expects {self.input_dim}-dim vectors, got {X.shape[1]}")
+        projected = (X - self.mean) @ self.components
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        return (projected / np.maximum(norms, 1e-12)).tolist()
+
+    def save(self, path=None):
+        """Write the projection atomically; defaults to PROJECTION_DIR/<version>.npz."""
+        path = path or os.path.join(PROJECTION_DIR, f"{self.version}.npz")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {"method": self.method, "model": self.model, "version": self.version,
+                "explained_variance": self.explained_variance}
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, mean=self.mean, components=self.components, meta=json.dumps(meta))
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            projection = cls(data["mean"], data["components"], meta["method"], meta["model"],
+                             explained_variance=meta.get("explained_variance"))
+        if projection.version != meta["version"]:
+            raise ValueError(f"{path} is corrupt: expected version {meta['version']}, got {projection.version}")
+        return projection
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Offline recall evaluation for embedding projections
+
+Samples a corpus and a set of queries from our own collection, embeds both
+with the raw model, and compares the top-k neighbours found with projected
+vectors against the top-k found with the full-dimensional vectors
+(exact cosine search in numpy on both sides, so only the projection is
+measured). Queries are held-out chunks unless --queries-file gives one
+question per line.
+
+PCA projections are fitted on the evaluation corpus, as they would be in
+production; --projection evaluates a saved projection instead.
+
+Usage:
+    python tools/evaluate_embedding_projection.py --corpus 3000 --queries 200 --dims 128,256,512,1024
+    python tools/evaluate_embedding_projection.py --projection embedding_projections/llama2-pca512-<hash>.npz
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.embedder import embed_batch, EMBED_DIM, EMBED_MODEL
+from tools.embedding_projection import EmbeddingProjection, PROJECTION_METHODS
+from tools.retriever import Retriever
+
+
+def normalize(vectors):
+    X = np.asarray(vectors, dtype=np.float32)
+    return X / np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(queries, corpus, k):
+    scores = normalize(queries) @ normalize(corpus).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure recall loss of embedding projections on our documents")
+    parser.add_argument("--collection", default="New_Collection", help="Collection to sample chunks from")
+    parser.add_argument("--corpus", type=int, default=3000, help="Chunks searched per query (default: 3000)")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out chunks used as queries (default: 200)")
+    parser.add_argument("--queries-file", help="Text file with one query per line, instead of held-out chunks")
+    parser.add_argument("--dims", default="128,256,512,1024", help="Projected dimensions to compare")
+    parser.add_argument("--methods", default=",".join(PROJECTION_METHODS), help="Projection types to compare")
+    parser.add_argument("--projection", help="Evaluate a saved projection (.npz) instead of fitting new ones")
+    parser.add_argument("--top-k", type=int, default=10, help="Neighbours compared per query (default: 10)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    held_out = 0 if args.queries_file else args.queries
+    samples, _ = Retriever(collection_name=args.collection).sample_chunks(args.corpus + held_out, seed=args.seed)
+    texts = [text for text, _ in samples if text.strip()]
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            query_texts = [line.strip() for line in f if line.strip()]
+        corpus_texts = texts
+    else:
+        query_texts, corpus_texts = texts[:held_out], texts[held_out:]
+    if len(corpus_texts) <= args.top_k or not query_texts:
+        print(f"Error: need more than {args.top_k} corpus chunks and at least one query "
+              f"(got {len(corpus_texts)} and {len(query_texts)})")
+        sys.exit(1)
+
+    print(f"Embedding {len(corpus_texts)} corpus chunks and {len(query_texts)} queries with '{EMBED_MODEL}'...")
+    corpus = np.asarray(embed_batch(corpus_texts, project=False), dtype=np.float32)
+    queries = np.asarray(embed_batch(query_texts, project=False), dtype=np.float32)
+    truth = top_k(queries, corpus, args.top_k)
+
+    if args.projection:
+        projections = [EmbeddingProjection.load(args.projection)]
+    else:
+        projections = []
+        for method in [m.strip() for m in args.methods.split(",") if m.strip()]:
+            for dim in [int(d) for d in args.dims.split(",")]:
+                if method == "pca" and dim > len(corpus):
+                    print(f"Skipping pca{dim}: needs at least {dim} corpus chunks")
+                    continue
+                projections.append(EmbeddingProjection.fit_pca(corpus, dim, EMBED_MODEL) if method == "pca"
+                                   else EmbeddingProjection.random_orthogonal(EMBED_DIM, dim, EMBED_MODEL, seed=args.seed))
+
+    print(f"\n{'projection':>14} {'dim':>6} {'bytes/vec':>10} {f'recall@{args.top_k}':>10} {'recall@1':>9} {'variance':>9}")
+    print(f"{'none':>14} {corpus.shape[1]:>6} {corpus.shape[1] * 4:>10} {1.0:>10.3f} {1.0:>9.3f} {'':>9}")
+    for projection in projections:
+        found = top_k(projection.transform(queries), projection.transform(corpus), args.top_k)
+        variance = f"{projection.explained_variance:.1%}" if projection.explained_variance is not None else ""
+        print(f"{projection.method:>14} {projection.output_dim:>6} {projection.output_dim * 4:>10} "
+              f"{recall(found, truth):>10.3f} {recall(found[:, :1], truth[:, :1]):>9.3f} {variance:>9}")
+
+
+if __name__ == "__main__":
+    main()
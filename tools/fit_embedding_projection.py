@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Fit an embedding projection on the corpus
+
+Samples chunks from a collection, embeds them with the raw model (cached
+embeddings are reused), fits a PCA or random orthogonal projection to the
+requested dimension and saves it under embedding_projections/ with its
+version tag.
+
+To use it, set EMBED_PROJECTION to the printed path for both ingestion and
+querying, and ingest into a collection of the projected dimension (existing
+collections keep their raw vectors until re-ingested).
+
+Usage:
+    python tools/fit_embedding_projection.py --collection New_Collection --sample 5000 --dim 512
+    python tools/fit_embedding_projection.py --method orthogonal --dim 512
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.embedder import embed_batch, EMBED_DIM, EMBED_MODEL
+from tools.embedding_projection import EmbeddingProjection, PROJECTION_METHODS
+from tools.retriever import Retriever
+
+
+def sample_raw_embeddings(collection_name, sample, seed):
+    samples, _ = Retriever(collection_name=collection_name).sample_chunks(sample, seed=seed)
+    texts = [text for text, _ in samples if text.strip()]
+    print(f"Embedding {len(texts)} sampled chunks with '{EMBED_MODEL}'...")
+    return embed_batch(texts, project=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit a dimensionality reduction for text embeddings")
+    parser.add_argument("--collection", default="New_Collection", help="Collection to sample chunks from")
+    parser.add_argument("--sample", type=int, default=5000, help="Chunks to fit on (default: 5000)")
+    parser.add_argument("--dim", type=int, default=512, help="Output dimension (default: 512)")
+    parser.add_argument("--method", choices=list(PROJECTION_METHODS), default="pca", help="Projection type (default: pca)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Output .npz path (default: embedding_projections/<version>.npz)")
+    args = parser.parse_args()
+
+    if args.method == "pca":
+        projection = EmbeddingProjection.fit_pca(
+            sample_raw_embeddings(args.collection, args.sample, args.seed), args.dim, EMBED_MODEL
+        )
+        print(f"PCA keeps {projection.explained_variance:.1%} of the sample's variance")
+    else:
+        projection = EmbeddingProjection.random_orthogonal(EMBED_DIM, args.dim, EMBED_MODEL, seed=args.seed)
+
+    path = projection.save(args.output)
+    print(f"✅ Saved {projection.input_dim} -> {projection.output_dim} projection {projection.version}")
+    print(f"   EMBED_PROJECTION={path}")
+
+
+if __name__ == "__main__":
+    main()
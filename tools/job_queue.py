@@ -0,0 +1,315 @@
+"""
+Persistent background job queue backed by SQLite.
+
+Jobs are written to a local SQLite database before they run, so anything
+queued or interrupted mid-run is picked up again after a restart. A small
+pool of worker threads claims jobs one at a time and hands them to a
+handler function, which reports per-stage progress back to the store.
+Each running job records the pid of the process that claimed it, so jobs
+of a process that exits mid-run can be requeued while the others keep going.
+Jobs created with the same serial key (e.g. the document they rewrite) never
+run at the same time, across threads and processes alike.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+
+class JobStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connect()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    params TEXT NOT NULL,
+                    stages TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    owner_pid INTEGER,
+                    serial_key TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "owner_pid" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner_pid INTEGER")
+            if "serial_key" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN serial_key TEXT")
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+
+    def reconnect(self):
+        """Open a fresh connection, e.g. in a forked worker (SQLite connections must not cross a fork)."""
+        self._lock = threading.Lock()
+        self._connect()
+
+    def create(self, kind, params, serial_key=None):
+        """Queue a job; jobs sharing a `serial_key` run one at a time, oldest first."""
+        job_id = str(uuid.uuid4())
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, serial_key, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(params), serial_key, time.time())
+            )
+        return job_id
+
+    def claim_next(self):
+        """Atomically move the oldest runnable queued job to running and return it."""
+        while True:
+            with self._lock, self._conn:
+                # Jobs whose serial key belongs to a running job wait for it to finish
+                row = self._conn.execute(
+                    "SELECT id, serial_key FROM jobs WHERE status = 'queued' AND (serial_key IS NULL OR serial_key "
+                    "NOT IN (SELECT serial_key FROM jobs WHERE status = 'running' AND serial_key IS NOT NULL)) "
+                    "ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                # The status checks guard against another process claiming the same
+                # job, or another job with the same key, since the SELECT
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1, owner_pid = ? "
+                    "WHERE id = ? AND status = 'queued' AND (? IS NULL OR NOT EXISTS "
+                    "(SELECT 1 FROM jobs WHERE status = 'running' AND serial_key = ?))",
+                    (time.time(), os.getpid(), row["id"], row["serial_key"], row["serial_key"])
+                )
+            if cursor.rowcount == 1:
+                return self.get(row["id"])
+
+    def requeue_interrupted(self):
+        """Return jobs left 'running' by a previous process to the queue."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', stage = NULL WHERE status = 'running'"
+            )
+            return cursor.rowcount
+
+    def requeue_orphaned(self, pid=None, max_attempts=3):
+        """
+        Return 'running' jobs whose process is gone to the queue: those of
+        `pid` (a worker known to have exited), or else those of every owner
+        that is no longer alive. A job that has already been interrupted
+        `max_attempts` times is failed instead, so a job that kills its
+        worker cannot do so forever. Returns the number of jobs requeued.
+        """
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, owner_pid, attempts FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            orphaned = [
+                row for row in rows
+                if (row["owner_pid"] == pid if pid is not None else not _pid_alive(row["owner_pid"]))
+            ]
+            requeued = 0
+            for row in orphaned:
+                if row["attempts"] >= max_attempts:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                        (f"Worker exited during the job {row['attempts']} times", time.time(), row["id"])
+                    )
+                else:
+                    requeued += self._conn.execute(
+                        "UPDATE jobs SET status = 'queued', stage = NULL, owner_pid = NULL "
+                        "WHERE id = ? AND status = 'running'",
+                        (row["id"],)
+                    ).rowcount
+            return requeued
+
+    def update_stage(self, job_id, stage, status, progress=None, elapsed=None, detail=None):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT stages, progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            stages = json.loads(row["stages"] or "{}")
+            entry = stages.setdefault(stage, {})
+            entry["status"] = status
+            if elapsed is not None:
+                entry["seconds"] = round(elapsed, 3)
+            if detail:
+                entry.update(detail)
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, stages = ?, progress = ? WHERE id = ?",
+                (stage, json.dumps(stages), row["progress"] if progress is None else progress, job_id)
+            )
+
+    def finish(self, job_id, result=None, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, progress = COALESCE(?, progress), "
+                "finished_at = ? WHERE id = ?",
+                (
+                    "failed" if error else "completed",
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    None if error else 1.0,
+                    time.time(),
+                    job_id
+                )
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["stages"] = json.loads(job["stages"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobProgress:
+    """Handed to job handlers so they can report stage start/finish and timings."""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def stage(self, name, progress=None):
+        return _StageTimer(self, name, progress)
+
+
+class _StageTimer:
+    def __init__(self, tracker, name, progress):
+        self.tracker = tracker
+        self.name = name
+        self.progress = progress
+        self.detail = {}
+
+    def __enter__(self):
+        self.start = time.time()
+        self.tracker.store.update_stage(self.tracker.job_id, self.name, "running")
+        return self
+
+    def report(self, progress=None, **detail):
+        """Publish intermediate progress of a long-running stage while it is still running."""
+        self.detail.update(detail)
+        self.tracker.store.update_stage(self.tracker.job_id, self.name, "running", progress=progress, detail=self.detail)
+
+    def __exit__(self, exc_type, exc, tb):
+        status = "failed" if exc_type else "completed"
+        self.tracker.store.update_stage(
+            self.tracker.job_id, self.name, status,
+            progress=None if exc_type else self.progress,
+            elapsed=time.time() - self.start,
+            detail=self.detail
+        )
+        return False
+
+
+class JobQueue:
+    def __init__(self, store, handlers, num_workers=2, poll_interval=1.0, orphan_check_interval=30.0):
+        """
+        Args:
+            store: JobStore holding the jobs
+            handlers: Mapping of job kind -> callable(params, progress) returning a JSON-able result
+            num_workers: Number of jobs processed concurrently
+            poll_interval: Seconds an idle worker sleeps before checking the store again
+            orphan_check_interval: Seconds between sweeps for running jobs of dead processes
+        """
+        self.store = store
+        self.handlers = handlers
+        self.num_workers = max(1, int(num_workers))
+        self.poll_interval = poll_interval
+        self.orphan_check_interval = orphan_check_interval
+        self._last_orphan_check = 0.0
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._workers = []
+
+    def start(self, requeue=True):
+        """
+        Start the worker threads. With several processes sharing one store,
+        only one of them (before the others start) should requeue interrupted
+        jobs, or it would requeue jobs the others are running.
+        """
+        if requeue:
+            requeued = self.store.requeue_interrupted()
+            if requeued:
+                print(f"[JobQueue] Requeued {requeued} interrupted job(s)")
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _requeue_orphaned(self):
+        # Another worker process may have died mid-job (crash, timeout, recycling)
+        now = time.time()
+        if now - self._last_orphan_check < self.orphan_check_interval:
+            return
+        self._last_orphan_check = now
+        requeued = self.store.requeue_orphaned()
+        if requeued:
+            print(f"[JobQueue] Requeued {requeued} job(s) of exited processes")
+            self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def submit(self, kind, params, serial_key=None):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = self.store.create(kind, params, serial_key=serial_key)
+        self._wakeup.set()
+        return job_id
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = self.store.claim_next()
+            if job is None:
+                self._requeue_orphaned()
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            handler = self.handlers.get(job["kind"])
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler for job kind: {job['kind']}")
+                result = handler(job["params"], JobProgress(self.store, job["id"]))
+                self.store.finish(job["id"], result=result)
+            except Exception as e:
+                print(f"[JobQueue] Job {job['id']} failed: {e}")
+                traceback.print_exc()
+                self.store.finish(job["id"], error=str(e))
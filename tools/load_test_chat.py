@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+Load test for the chat request path: threaded Flask vs asyncio
+
+Runs /api/chat in-process through both implementations against local
+stubs with fixed latencies, so only the request path is measured:
+
+- embedding model: sleeps --embed-ms per batch
+- Qdrant search: sleeps --search-ms (sync stub blocks, async stub awaits)
+- Gemini: sleeps --llm-ms
+- Mongo chat-history insert: sleeps --mongo-ms
+
+The threaded path (chat_backend.app, as served by one gthread worker) gets
+--threads request threads; the async path (chat_async.app, one uvicorn
+worker) runs every request concurrently on one event loop. Each
+concurrency level sends --requests distinct questions and reports
+throughput and latency percentiles.
+
+Usage:
+    python tools/load_test_chat.py
+    python tools/load_test_chat.py --concurrency 8,64,256 --requests 512 --llm-ms 1500 --threads 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Stubs replace every external service; nothing should start on import
+os.environ["INGEST_AUTOSTART"] = "false"
+os.environ.setdefault("INGEST_QUEUE_DB", os.path.join(tempfile.mkdtemp(prefix="chat_load_test_"), "ingest_jobs.db"))
+
+
+def _hits(limit):
+    return [
+        SimpleNamespace(id=i, score=0.9 - i * 0.05, payload={
+            "text": f"Stub chunk {i} about train maintenance schedules and safety procedures.",
+            "filename": f"stub_{i}.pdf", "chunk_index": i, "chunk_hash": f"hash{i}"
+        })
+        for i in range(limit)
+    ]
+
+
+class StubEncoder:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def encode(self, texts, convert_to_tensor=False):
+        time.sleep(self.latency)
+        return [[0.1] * 384 for _ in texts]
+
+    def get_sentence_embedding_dimension(self):
+        return 384
+
+
+class StubQdrant:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def search(self, collection_name, query_vector, limit, **kwargs):
+        time.sleep(self.latency)
+        return _hits(limit)
+
+
+class StubAsyncQdrant(StubQdrant):
+    async def search(self, collection_name, query_vector, limit, **kwargs):
+        await asyncio.sleep(self.latency)
+        return _hits(limit)
+
+
+class StubGemini:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt, stream=False):
+        time.sleep(self.latency)
+        return SimpleNamespace(text="Stub answer based on the retrieved chunks.")
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(text="Stub answer based on the retrieved chunks.")
+
+
+class StubCollection:
+    def __init__(self, latency):
+        self.latency = latency
+        self.inserted = 0
+
+    def insert_one(self, record):
+        time.sleep(self.latency)
+        self.inserted += 1
+
+
+class StubAsyncCollection(StubCollection):
+    async def insert_one(self, record):
+        await asyncio.sleep(self.latency)
+        self.inserted += 1
+
+
+def install_stubs(backend, chat_async, args):
+    from tools.query_embedding_service import QueryEmbeddingService
+
+    encoder = StubEncoder(args.embed_ms / 1000)
+    backend.services.register('embedding_model', lambda: encoder)
+    backend.services.register('query_embedder', lambda: QueryEmbeddingService(
+        lambda texts: encoder.encode(texts), max_batch_size=backend.Config.QUERY_EMBED_MAX_BATCH,
+        max_wait_ms=backend.Config.QUERY_EMBED_MAX_WAIT_MS, cache_size=backend.Config.QUERY_EMBED_CACHE_SIZE))
+    backend.services.register('gemini', lambda: StubGemini(args.llm_ms / 1000))
+    backend.services.register('qdrant', lambda: StubQdrant(args.search_ms / 1000))
+    backend.services.warmup(background=False)
+
+    sync_chats = StubCollection(args.mongo_ms / 1000)
+    backend.MONGODB_AVAILABLE = True
+    backend.document_agent_chats_collection = sync_chats
+    chat_async.pipeline.qdrant = StubAsyncQdrant(args.search_ms / 1000)
+    chat_async.pipeline.chats = StubAsyncCollection(args.mongo_ms / 1000)
+
+    # Every request must go through the full path
+    backend.answer_cache.max_entries = 0
+
+
+def summarize(latencies, elapsed, errors):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+    }
+
+
+def run_threaded(backend, questions, concurrency, threads):
+    """Concurrent clients against a worker with `threads` request threads."""
+    client = backend.app.test_client()
+    worker_threads = ThreadPoolExecutor(max_workers=threads)
+
+    def handle(question):
+        started = time.perf_counter()
+        response = client.post('/api/chat', json={'message': question})
+        return time.perf_counter() - started, response.status_code
+
+    async def drive():
+        loop = asyncio.get_running_loop()
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one(question):
+            async with gate:
+                # Time in the worker's queue counts, as it would for a real client
+                started = time.perf_counter()
+                _, status = await loop.run_in_executor(worker_threads, handle, question)
+                return time.perf_counter() - started, status
+
+        return await asyncio.gather(*[one(q) for q in questions])
+
+    started = time.perf_counter()
+    results = asyncio.run(drive())
+    elapsed = time.perf_counter() - started
+    worker_threads.shutdown()
+    return summarize([r[0] for r in results], elapsed, sum(1 for r in results if r[1] != 200))
+
+
+def run_async(chat_async, questions, concurrency):
+    """Concurrent clients against the ASGI app on one event loop."""
+
+    async def one(question, gate):
+        async with gate:
+            body = json.dumps({'message': question}).encode()
+            scope = {'type': 'http', 'method': 'POST', 'path': '/api/chat', 'headers': []}
+            status = {}
+
+            async def receive():
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status['code'] = message['status']
+
+            started = time.perf_counter()
+            await chat_async.app(scope, receive, send)
+            return time.perf_counter() - started, status.get('code')
+
+    async def drive():
+        gate = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        results = await asyncio.gather(*[one(q, gate) for q in questions])
+        elapsed = time.perf_counter() - started
+        await chat_async.pipeline.drain()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(drive())
+    return summarize([r[0] for r in results], elapsed, sum(1 for r in results if r[1] != 200))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare threaded and async /api/chat throughput against local stubs")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="Comma-separated numbers of concurrent clients")
+    parser.add_argument("--requests", type=int, default=256, help="Requests per concurrency level and implementation")
+    parser.add_argument("--threads", type=int, default=8, help="Request threads of the threaded worker (serve.py --threads)")
+    parser.add_argument("--embed-ms", type=float, default=5, help="Stub embedding latency per batch")
+    parser.add_argument("--search-ms", type=float, default=20, help="Stub Qdrant search latency")
+    parser.add_argument("--llm-ms", type=float, default=800, help="Stub Gemini generation latency")
+    parser.add_argument("--mongo-ms", type=float, default=30, help="Stub chat-history insert latency")
+    args = parser.parse_args()
+
+    import chat_backend as backend
+    import chat_async
+    install_stubs(backend, chat_async, args)
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    print(f"Stub latencies: embed {args.embed_ms} ms, search {args.search_ms} ms, "
+          f"LLM {args.llm_ms} ms, Mongo {args.mongo_ms} ms; threaded worker has {args.threads} threads\n")
+    print(f"{'clients':>8} {'path':<9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+    for run, concurrency in enumerate(levels):
+        # Fresh questions per run so the query embedding cache never answers
+        questions = [f"load test question {run}-{i}" for i in range(args.requests)]
+        threaded = run_threaded(backend, questions, concurrency, args.threads)
+        questions = [f"load test question {run}-{i} async" for i in range(args.requests)]
+        asynchronous = run_async(chat_async, questions, concurrency)
+        for name, result in (("threaded", threaded), ("async", asynchronous)):
+            print(f"{concurrency:>8} {name:<9} {result['throughput_rps']:>8} {result['p50_ms']:>9} "
+                  f"{result['p95_ms']:>9} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Payload index schema for the Qdrant collections.
+
+Every payload field the app filters on is declared here once, with the index
+type its filters need. The collection bootstrap code (Ingestion scripts,
+ingest_v2.py and chat_backend.py) creates indexes from these definitions, and
+build_filter uses them to choose between numeric and datetime ranges.
+"""
+from qdrant_client.http import models
+
+KEYWORD = models.PayloadSchemaType.KEYWORD
+INTEGER = models.PayloadSchemaType.INTEGER
+DATETIME = models.PayloadSchemaType.DATETIME
+TEXT = models.PayloadSchemaType.TEXT
+
+# Text and CLIP collections written by Ingestion/ingest_v2.py
+INGESTION_PAYLOAD_SCHEMA = {
+    "file_name": KEYWORD,
+    "source": KEYWORD,
+    "file_type": KEYWORD,
+    "source_type": KEYWORD,
+    "vector_type": KEYWORD,
+    "document_type": KEYWORD,
+    "content_category": KEYWORD,
+    "part_nums": KEYWORD,
+    "serial_nums": KEYWORD,
+    "dates": KEYWORD,
+    "embedding_version": KEYWORD,
+    "page_number": INTEGER,
+    "ingested_at": DATETIME,
+}
+
+# Documents collection written by chat_backend.py uploads
+DOCUMENTS_PAYLOAD_SCHEMA = {
+    "filename": KEYWORD,
+    "file_hash": KEYWORD,
+    "chunk_hash": KEYWORD,
+    "file_type": KEYWORD,
+    "uploaded_by": KEYWORD,
+    "chunk_index": INTEGER,
+    "upload_date": DATETIME,
+}
+
+_RANGE_KEYS = ("gt", "gte", "lt", "lte")
+
+
+def ensure_payload_indexes(client, collection_name, schema):
+    """
+    Create the payload indexes in `schema` on a collection.
+
+    Safe to call on every startup: indexes that already exist are left as they are.
+    Returns the fields that could not be indexed, with the error.
+    """
+    existing = client.get_collection(collection_name).payload_schema or {}
+    failed = {}
+    for field, field_type in schema.items():
+        if field in existing:
+            continue
+        try:
+            client.create_payload_index(collection_name=collection_name, field_name=field, field_schema=field_type)
+        except Exception as e:
+            failed[field] = str(e)
+    return failed
+
+
+def build_filter(filters, schema=None):
+    """
+    Build a Qdrant filter from {field: condition}.
+
+    A scalar condition matches exactly, a list/tuple/set matches any of its
+    values, and a dict with gt/gte/lt/lte keys is a range. Ranges on fields
+    declared DATETIME in `schema` take ISO-8601 strings. Returns None when
+    there is nothing to filter on.
+    """
+    if not filters:
+        return None
+    schema = schema or {}
+    conditions = []
+    for field, condition in filters.items():
+        if condition is None:
+            continue
+        if isinstance(condition, dict):
+            bounds = {key: condition[key] for key in _RANGE_KEYS if condition.get(key) is not None}
+            if not bounds:
+                continue
+            range_type = models.DatetimeRange if schema.get(field) == DATETIME else models.Range
+            conditions.append(models.FieldCondition(key=field, range=range_type(**bounds)))
+        elif isinstance(condition, (list, tuple, set)):
+            conditions.append(models.FieldCondition(key=field, match=models.MatchAny(any=list(condition))))
+        else:
+            conditions.append(models.FieldCondition(key=field, match=models.MatchValue(value=condition)))
+    return models.Filter(must=conditions) if conditions else None
+
+
+def matches_filters(payload, filters):
+    """
+    Check a payload against the same {field: condition} filters in Python,
+    for results that did not come from a filtered Qdrant query.
+    Datetime ranges compare ISO-8601 strings lexicographically.
+    """
+    for field, condition in (filters or {}).items():
+        if condition is None:
+            continue
+        value = payload.get(field)
+        values = value if isinstance(value, list) else [value]
+        if isinstance(condition, dict):
+            def in_range(v):
+                if v is None:
+                    return False
+                try:
+                    return ((condition.get("gt") is None or v > condition["gt"]) and
+                            (condition.get("gte") is None or v >= condition["gte"]) and
+                            (condition.get("lt") is None or v < condition["lt"]) and
+                            (condition.get("lte") is None or v <= condition["lte"]))
+                except TypeError:
+                    return False
+            if not any(in_range(v) for v in values):
+                return False
+        elif isinstance(condition, (list, tuple, set)):
+            if not any(v in condition for v in values):
+                return False
+        elif condition not in values:
+            return False
+    return True
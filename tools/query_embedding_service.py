@@ -0,0 +1,146 @@
+"""
+Query embedding service with micro-batching and an LRU cache.
+
+Concurrent callers of `embed()` are gathered into small batches so the
+underlying model encodes several queries in one forward pass, and repeated
+questions are answered from an in-memory cache without touching the model.
+"""
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def normalize_query(text):
+    """Normalize query text so trivially different spellings share a cache entry."""
+    return re.sub(r"\s+", " ", (text or "").strip()).lower()
+
+
+class QueryEmbeddingService:
+    def __init__(self, encode_fn, max_batch_size=32, max_wait_ms=5, cache_size=1024):
+        """
+        Args:
+            encode_fn: Callable taking a list of texts and returning one vector per text
+            max_batch_size: Maximum number of queries encoded in one call
+            max_wait_ms: How long the first query in a batch waits for company
+            cache_size: Number of normalized queries kept in the LRU cache
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, float(max_wait_ms)) / 1000.0
+        self.cache_size = max(0, int(cache_size))
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+
+        self._hits = 0
+        self._misses = 0
+        self._batches = 0
+        self._batched_queries = 0
+        self._max_batch_seen = 0
+        self._errors = 0
+
+        self._worker = threading.Thread(target=self._run, name="query-embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed(self, query, timeout=None):
+        """Return the embedding for a single query, batching with concurrent callers."""
+        return self.submit(query).result(timeout=timeout)
+
+    def submit(self, query):
+        """
+        Queue a query and return a Future for its embedding without blocking
+        (async callers can await it with asyncio.wrap_future).
+        """
+        key = normalize_query(query)
+        future = Future()
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                future.set_result(self._cache[key])
+                return future
+            self._misses += 1
+
+        self._queue.put((key, future))
+        return future
+
+    def _cache_put(self, key, vector):
+        if self.cache_size == 0:
+            return
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires."""
+        batch = [self._queue.get()]
+        # The wait is measured from the first request, so no query waits longer than max_wait
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Identical in-flight queries are encoded once
+            pending = OrderedDict()
+            for key, future in batch:
+                pending.setdefault(key, []).append(future)
+            texts = list(pending.keys())
+
+            try:
+                vectors = self.encode_fn(texts)
+                vectors = [v.tolist() if hasattr(v, "tolist") else list(v) for v in vectors]
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                for futures in pending.values():
+                    for future in futures:
+                        future.set_exception(e)
+                continue
+
+            with self._lock:
+                self._batches += 1
+                self._batched_queries += len(texts)
+                self._max_batch_seen = max(self._max_batch_seen, len(texts))
+
+            for text, vector in zip(texts, vectors):
+                self._cache_put(text, vector)
+                for future in pending[text]:
+                    future.set_result(vector)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        """Counters for tuning batch size, wait time and cache size under load."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "cache_hits": self._hits,
+                "cache_misses": self._misses,
+                "cache_hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "cache_entries": len(self._cache),
+                "cache_size": self.cache_size,
+                "batches": self._batches,
+                "batched_queries": self._batched_queries,
+                "avg_batch_size": round(self._batched_queries / self._batches, 2) if self._batches else 0.0,
+                "max_batch_size_seen": self._max_batch_seen,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "errors": self._errors,
+            }
@@ -0,0 +1,158 @@
+"""
+Per-process HTTP request metrics.
+
+Each server process counts requests, errors and latency per endpoint. With
+several worker processes (serve.py), every worker periodically writes its
+snapshot to `metrics_dir` as worker-<pid>.json, so any worker can answer a
+metrics request with the numbers of all of them.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Latency histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float('inf'))
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+
+    def observe(self, elapsed_ms, error):
+        self.count += 1
+        self.errors += int(error)
+        self.total_ms += elapsed_ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        rank, seen = q * self.count, 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return LATENCY_BUCKETS_MS[-1]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / self.count, 1) if self.count else None,
+            "p50_ms": self.quantile(0.5) if self.count else None,
+            "p95_ms": self.quantile(0.95) if self.count else None,
+            "buckets_ms": {("+Inf" if b == float('inf') else str(b)): n for b, n in zip(LATENCY_BUCKETS_MS, self.buckets)},
+        }
+
+
+class RequestMetrics:
+    def __init__(self, metrics_dir=None, flush_interval=1.0):
+        """
+        Args:
+            metrics_dir: Directory shared by all workers for their snapshots (None keeps them in memory)
+            flush_interval: Minimum seconds between two snapshot writes of one worker
+        """
+        self.metrics_dir = metrics_dir
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.started_at = time.time()
+        self._endpoints = {}
+        self._in_flight = 0
+        self._last_flush = 0.0
+
+    def _check_pid(self):
+        # Counters inherited from the pre-fork parent do not belong to this worker
+        if os.getpid() != self.pid:
+            self._reset()
+
+    def start(self):
+        with self._lock:
+            self._check_pid()
+            self._in_flight += 1
+        return time.perf_counter()
+
+    def finish(self, endpoint, status_code, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._check_pid()
+            self._in_flight = max(0, self._in_flight - 1)
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = _EndpointStats()
+            stats.observe(elapsed_ms, status_code >= 500)
+        self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            self._check_pid()
+            endpoints = {name: stats.snapshot() for name, stats in sorted(self._endpoints.items())}
+            return {
+                "pid": self.pid,
+                "started_at": self.started_at,
+                "updated_at": time.time(),
+                "in_flight": self._in_flight,
+                "requests": sum(e["count"] for e in endpoints.values()),
+                "errors": sum(e["errors"] for e in endpoints.values()),
+                "endpoints": endpoints,
+            }
+
+    def _path(self, pid):
+        return os.path.join(self.metrics_dir, f"worker-{pid}.json")
+
+    def flush(self, force=False):
+        """Write this worker's snapshot for the others to read (throttled unless force)."""
+        if not self.metrics_dir:
+            return
+        # Request threads of one worker flush concurrently; one write at a time, the rest skip
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            now = time.time()
+            if not force and now - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = now
+            snapshot = self.snapshot()
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.metrics_dir, prefix=f"worker-{snapshot['pid']}-", suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self._path(snapshot["pid"]))
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Snapshots of every worker, keyed by pid (this worker's is always current)."""
+        workers = {}
+        if self.metrics_dir and os.path.isdir(self.metrics_dir):
+            for name in os.listdir(self.metrics_dir):
+                if not (name.startswith("worker-") and name.endswith(".json")):
+                    continue
+                try:
+                    with open(os.path.join(self.metrics_dir, name)) as f:
+                        snapshot = json.load(f)
+                    workers[str(snapshot["pid"])] = snapshot
+                except (OSError, ValueError, KeyError):
+                    continue
+        own = self.snapshot()
+        workers[str(own["pid"])] = own
+        return workers
+
+    @staticmethod
+    def remove_worker(metrics_dir, pid):
+        """Drop the snapshot of a worker that has exited."""
+        try:
+            os.remove(os.path.join(metrics_dir, f"worker-{pid}.json"))
+        except OSError:
+            pass
@@ -1,19 +1,31 @@
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
+import atexit
+import os
 import numpy as np
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 from qdrant_client.http.exceptions import ResponseHandlingException
+from tools.bm25_index import reciprocal_rank_fusion, shared_keyword_index
+from tools.payload_schema import INGESTION_PAYLOAD_SCHEMA, build_filter, ensure_payload_indexes, matches_filters
+from tools.collection_config import search_params
+from tools.embedder import embedding_dimension
+
+# Minimum seconds between two keyword index saves from add_documents; each save rewrites the whole index
+KEYWORD_INDEX_SAVE_INTERVAL = float(os.getenv("BM25_SAVE_INTERVAL", 30))
 
 class Retriever:
-    def __init__(self, collection_name="New_Collection", embedding_dim=4096):
+    def __init__(self, collection_name="New_Collection", embedding_dim=None):
         # Retry logic for Qdrant connection
         for attempt in range(10):
             try:
                 self.client = QdrantClient(url="http://localhost:6333")
                 self.collection_name = collection_name
-                self.embedding_dim = embedding_dim
+                # 4096 for raw llama2 embeddings, smaller with a projection (tools/embedding_projection.py)
+                self.embedding_dim = embedding_dim or embedding_dimension()
                 self.clip_collection_name = "New_Collection_CLIP"
-                self.clip_embedding_dim = 1536  # Correct CLIP embedding dimension
+                self.clip_embedding_dim = 512  # Native CLIP ViT-B/32 dimension (Ingestion/clip_embedder.py)
                 
                 # Check and create collections if they don't exist
                 existing_collections = self.client.get_collections().collections
@@ -22,12 +34,22 @@ class Retriever:
                         collection_name=self.collection_name,
                         vectors_config=models.VectorParams(size=self.embedding_dim, distance=models.Distance.COSINE)
                     )
+                else:
+                    stored_dim = self.client.get_collection(self.collection_name).config.params.vectors.size
+                    if stored_dim != self.embedding_dim:
+                        print(f"Warning: '{self.collection_name}' stores {stored_dim}-dim vectors but queries are "
+                              f"{self.embedding_dim}-dim; check EMBED_PROJECTION or re-ingest the collection")
                 
                 if self.clip_collection_name not in [c.name for c in existing_collections]:
                     self.client.create_collection(
                         collection_name=self.clip_collection_name,
                         vectors_config=models.VectorParams(size=self.clip_embedding_dim, distance=models.Distance.COSINE)
                     )
+
+                # Filtered searches rely on these payload indexes
+                for name in (self.collection_name, self.clip_collection_name):
+                    for field, error in ensure_payload_indexes(self.client, name, INGESTION_PAYLOAD_SCHEMA).items():
+                        print(f"Warning: Could not create payload index for {field} on {name}: {error}")
                 break
             except ResponseHandlingException as e:
                 print(f"Qdrant not ready, retrying in 5s... ({attempt+1}/10)")
@@ -35,6 +57,18 @@ class Retriever:
         else:
             raise RuntimeError("Qdrant is not available after 10 attempts")
 
+        # BM25 keyword index over the text collection, maintained at ingest time and
+        # shared with every other reader of the collection in this process
+        self.keyword_index = shared_keyword_index(self.collection_name)
+        self._keyword_index_saved_at = time.monotonic()
+        atexit.register(self.save_keyword_index)
+
+        # Per-collection searches of one query run concurrently on this pool
+        self._search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="qdrant-search")
+
+        # Rescore/oversample quantized collections (no effect on unquantized ones)
+        self.search_params = search_params()
+
     def add_documents(self, chunks, embeddings, source, metadatas=None):
         points = []
         for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
@@ -57,7 +91,21 @@ class Retriever:
 
         self.client.upsert(collection_name=self.collection_name, points=points)
 
-    def search(self, query_embedding, top_k=5, filters=None, search_both_collections=True):
+        self._refresh_keyword_index()
+        self.keyword_index.add_many((point.id, point.payload["text"]) for point in points)
+        # Saved on a throttle (and by save_keyword_index/at exit) rather than per call,
+        # which would rewrite the whole index for every document added
+        if time.monotonic() - self._keyword_index_saved_at >= KEYWORD_INDEX_SAVE_INTERVAL:
+            self.save_keyword_index()
+
+    def save_keyword_index(self):
+        """Persist keyword index changes not yet saved (call after a bulk add_documents run)."""
+        if self.keyword_index.dirty:
+            self.keyword_index.save()
+        self._keyword_index_saved_at = time.monotonic()
+
+    def search(self, query_embedding, top_k=5, filters=None, search_both_collections=True,
+               clip_query_embedding=None, weights=None):
         """
         Search for similar documents. Can search both OCR and CLIP collections.
         
@@ -66,70 +114,192 @@ class Retriever:
             top_k: Number of results to return
             filters: Optional filters to apply
             search_both_collections: If True, search both OCR and CLIP collections
+            clip_query_embedding: Optional CLIP embedding of the same query
+            weights: Optional {collection_name: weight} for fusing collections
         """
         if search_both_collections:
-            return self.search_both_collections(query_embedding, top_k, filters)
+            return self.search_both_collections(query_embedding, top_k, filters, clip_query_embedding, weights)
         else:
             return self.search_single_collection(query_embedding, top_k, filters, self.collection_name)
 
-    def search_single_collection(self, query_embedding, top_k=5, filters=None, collection_name=None):
-        """Search in a single collection."""
-        if collection_name is None:
-            collection_name = self.collection_name
-            
-        query_vector = query_embedding if isinstance(query_embedding, list) else query_embedding.tolist()
+    @staticmethod
+    def _build_filter(filters):
+        """Filters map a field to a value, a list of values, or a {gte/lte/...} range."""
+        return build_filter(filters, INGESTION_PAYLOAD_SCHEMA)
 
-        search_filter = None
-        if filters:
-            conditions = [
-                models.FieldCondition(
-                    key=key,
-                    match=models.MatchValue(value=value)
-                ) for key, value in filters.items()
-            ]
-            search_filter = models.Filter(must=list(conditions))
+    @staticmethod
+    def _result_text(payload):
+        """Chunk text, or a short reference for image points that carry no text."""
+        text = payload.get("text", "")
+        if not text and payload.get("image_file"):
+            text = f"[Image {payload['image_file']} from {payload.get('source', 'unknown source')}]"
+        return text
 
+    def _search_hits(self, collection_name, query_embedding, limit, filters=None):
+        query_vector = query_embedding if isinstance(query_embedding, list) else query_embedding.tolist()
         try:
-            hits = self.client.search(
+            return self.client.search(
                 collection_name=collection_name,
                 query_vector=query_vector,
-                limit=top_k,
+                limit=limit,
                 with_payload=True,
-                query_filter=search_filter
+                query_filter=self._build_filter(filters),
+                search_params=self.search_params
             )
+        except Exception as e:
+            print(f"Error searching collection {collection_name}: {e}")
+            return []
 
+    def _search_hits_batch(self, collection_name, query_embeddings, limit, filters=None):
+        """Search one collection for several query vectors in a single request."""
+        query_filter = self._build_filter(filters)
+        requests = [
+            models.SearchRequest(
+                vector=embedding if isinstance(embedding, list) else embedding.tolist(),
+                limit=limit,
+                filter=query_filter,
+                with_payload=True,
+                params=self.search_params
+            )
+            for embedding in query_embeddings
+        ]
+        try:
+            return self.client.search_batch(collection_name=collection_name, requests=requests)
+        except Exception as e:
+            print(f"Error batch searching collection {collection_name}: {e}")
+            return [[] for _ in requests]
+
+    def search_batch(self, query_embeddings, top_k=5, filters=None, collection_name=None):
+        """search_single_collection for several queries at once; one result list per query."""
+        batch_results = []
+        for hits in self._search_hits_batch(collection_name or self.collection_name, query_embeddings, top_k, filters):
             results = []
             for hit in hits:
                 payload = hit.payload or {}
-                text = payload.get("text", "")
-                source = payload.get("source", "")
-                score = hit.score
-                vector_type = payload.get("vector_type", "ocr")
-                results.append((text, source, score, vector_type))
-            return results
-        except Exception as e:
-            print(f"Error searching collection {collection_name}: {e}")
-            return []
+                results.append((self._result_text(payload), payload.get("source", ""), hit.score, payload.get("vector_type", "ocr")))
+            batch_results.append(results)
+        return batch_results
+
+    def search_single_collection(self, query_embedding, top_k=5, filters=None, collection_name=None):
+        """Search in a single collection."""
+        if collection_name is None:
+            collection_name = self.collection_name
+
+        results = []
+        for hit in self._search_hits(collection_name, query_embedding, top_k, filters):
+            payload = hit.payload or {}
+            results.append((self._result_text(payload), payload.get("source", ""), hit.score, payload.get("vector_type", "ocr")))
+        return results
+
+    def multi_collection_search(self, queries, top_k=5, filters=None, weights=None, candidates=None, score_floors=None):
+        """
+        Search several collections concurrently and fuse the results.
+
+        Raw scores from different embedding models are not comparable, so each
+        collection's scores are min-max normalized over its own candidates and
+        then multiplied by the collection's weight before the lists are merged.
+        Hits below a collection's raw-score floor are dropped before
+        normalizing, so a collection with only weak matches cannot have its
+        best one promoted to a full score.
+
+        Args:
+            queries: {collection_name: query_embedding}
+            top_k: Number of fused results to return
+            filters: Optional payload filters applied in every collection
+            weights: Optional {collection_name: weight} (default 1.0)
+            candidates: Results taken from each collection before fusion (default 4 * top_k)
+            score_floors: Optional {collection_name: minimum raw score}
+        Returns:
+            List of dicts (text, source, score, raw_score, collection, vector_type, id, payload), best first
+        """
+        batch = {name: [embedding] for name, embedding in queries.items()}
+        return self.multi_collection_search_batch(batch, top_k, filters, weights, candidates, score_floors)[0]
+
+    def multi_collection_search_batch(self, queries, top_k=5, filters=None, weights=None, candidates=None,
+                                      score_floors=None):
+        """
+        multi_collection_search for several queries: one batched request per
+        collection, all collections concurrently.
+
+        Args:
+            queries: {collection_name: [query_embedding, ...]}, the same number of queries per collection
+        Returns:
+            One fused result list per query, in query order
+        """
+        # Normalizing over only top_k hits would give every collection's best hit 1.0
+        candidates = candidates or top_k * 4
+        futures = {
+            name: self._search_pool.submit(self._search_hits_batch, name, embeddings, candidates, filters)
+            for name, embeddings in queries.items()
+        }
+        hits_by_collection = {name: future.result() for name, future in futures.items()}
+        count = max((len(embeddings) for embeddings in queries.values()), default=0)
+        return [
+            self._fuse_hits({name: hits[i] for name, hits in hits_by_collection.items()}, top_k, weights, score_floors)
+            for i in range(count)
+        ]
 
-    def search_both_collections(self, query_embedding, top_k=5, filters=None):
+    def _fuse_hits(self, hits_by_collection, top_k, weights=None, score_floors=None):
+        """Drop hits below their collection's floor, min-max normalize the rest, weight them and merge."""
+        weights = weights or {}
+        score_floors = score_floors or {}
+        fused = []
+        for name, hits in hits_by_collection.items():
+            floor = score_floors.get(name)
+            if floor is not None:
+                hits = [hit for hit in hits if hit.score >= floor]
+            if not hits:
+                continue
+            low, high = min(hit.score for hit in hits), max(hit.score for hit in hits)
+            weight = weights.get(name, 1.0)
+            for hit in hits:
+                payload = hit.payload or {}
+                normalized = (hit.score - low) / (high - low) if high > low else 1.0
+                fused.append({
+                    "text": self._result_text(payload),
+                    "source": payload.get("source", ""),
+                    "score": weight * normalized,
+                    "raw_score": hit.score,
+                    "collection": name,
+                    "vector_type": payload.get("vector_type", "clip" if name == self.clip_collection_name else "ocr"),
+                    "id": hit.id,
+                    "payload": payload,
+                })
+        fused.sort(key=lambda result: result["score"], reverse=True)
+        return fused[:top_k]
+
+    def search_both_collections(self, query_embedding, top_k=5, filters=None, clip_query_embedding=None, weights=None):
         """
         Search both OCR and CLIP collections and combine results.
+
+        With `clip_query_embedding`, both collections are searched concurrently
+        and fused by multi_collection_search. Otherwise only the collection whose
+        dimension matches `query_embedding` is searched.
         
         Args:
             query_embedding: The query embedding vector
             top_k: Number of results to return per collection
             filters: Optional filters to apply
+            clip_query_embedding: Optional CLIP embedding of the same query
+            weights: Optional {collection_name: weight} for fusing collections
         """
         query_vector = query_embedding if isinstance(query_embedding, list) else query_embedding.tolist()
+
+        if clip_query_embedding is not None and len(query_vector) == self.embedding_dim:
+            fused = self.multi_collection_search(
+                {self.collection_name: query_vector, self.clip_collection_name: clip_query_embedding},
+                top_k=top_k, filters=filters, weights=weights
+            )
+            return [(r["text"], r["source"], r["score"], r["vector_type"]) for r in fused]
         
         ocr_results = []
         clip_results = []
         
-        # Search OCR collection (text embeddings) - only if query is 1536-dimensional
+        # Search OCR collection (text embeddings) - only if query matches the text embedding dimension
         if len(query_vector) == self.embedding_dim:
             ocr_results = self.search_single_collection(query_embedding, top_k, filters, self.collection_name)
         elif len(query_vector) == self.clip_embedding_dim:
-            # If query is 1536-dimensional, only search CLIP collection
+            # If query is CLIP-dimensional, only search CLIP collection
             clip_results = self.search_single_collection(query_embedding, top_k, filters, self.clip_collection_name)
         else:
             print(f"Warning: Query embedding dimension {len(query_vector)} doesn't match either OCR ({self.embedding_dim}) or CLIP ({self.clip_embedding_dim}) dimensions")
@@ -146,32 +316,154 @@ class Retriever:
         # Return top_k overall results
         return all_results[:top_k]
 
-    def get_all_chunks(self):
-        scroll = self.client.scroll(
-            collection_name=self.collection_name,
-            limit=10000,
-            with_payload=True
+    def _refresh_keyword_index(self):
+        # Reloaded when another process saved a newer copy, never over unsaved additions
+        self.keyword_index = shared_keyword_index(self.collection_name)
+
+    def rebuild_keyword_index(self):
+        """Rebuild the BM25 index from every point in the text collection."""
+        self.keyword_index.clear()
+        self.keyword_index.add_many(
+            (point.id, (point.payload or {}).get("text", ""))
+            for point in self.iter_points(fields=("text",), page_size=1000)
         )
+        self.keyword_index.save()
+        return len(self.keyword_index)
+
+    def _fetch_points(self, ids):
+        """Retrieve payloads for point ids, keyed by id."""
+        if not ids:
+            return {}
+        points = self.client.retrieve(collection_name=self.collection_name, ids=list(ids), with_payload=True)
+        return {point.id: point.payload or {} for point in points}
+
+    def keyword_search(self, query, top_k=5):
+        """BM25 search over the text collection. Returns (text, source, score, vector_type) tuples."""
+        self._refresh_keyword_index()
+        ranked = self.keyword_index.search(query, top_k)
+        payloads = self._fetch_points([doc_id for doc_id, _ in ranked])
 
         results = []
-        for point in scroll[0]:
-            payload = point.payload or {}
-            text = payload.get("text", "")
-            source = payload.get("source", "")
-            results.append((text, source))
+        for doc_id, score in ranked:
+            payload = payloads.get(doc_id)
+            if payload is None:
+                continue  # Point deleted since the index was saved
+            results.append((payload.get("text", ""), payload.get("source", ""), score, payload.get("vector_type", "ocr")))
         return results
 
-    def get_all_titles(self):
-        scroll = self.client.scroll(
-            collection_name=self.collection_name,
-            limit=10000,
-            with_payload=True
-        )
+    def hybrid_search(self, query, query_embedding, top_k=5, filters=None, rrf_k=60, candidates=None):
+        """
+        Fuse vector and BM25 results with reciprocal-rank fusion.
+
+        Args:
+            query: The raw query text (for BM25)
+            query_embedding: The query embedding vector
+            top_k: Number of fused results to return
+            filters: Optional payload filters for the vector search
+            rrf_k: RRF damping constant
+            candidates: Results taken from each ranking before fusion (default 4 * top_k)
+        Returns:
+            List of (text, source, fused_score, vector_type) tuples
+        """
+        candidates = candidates or top_k * 4
+
+        payloads = {}
+        vector_ranking = []
+        for hit in self._search_hits(self.collection_name, query_embedding, candidates, filters):
+            vector_ranking.append(hit.id)
+            payloads[hit.id] = hit.payload or {}
+
+        self._refresh_keyword_index()
+        keyword_ranking = [doc_id for doc_id, _ in self.keyword_index.search(query, candidates)]
+
+        fused = reciprocal_rank_fusion([vector_ranking, keyword_ranking], k=rrf_k)
+
+        # Only the keyword-only winners still need their payloads
+        missing = [doc_id for doc_id, _ in fused[:top_k * 2] if doc_id not in payloads]
+        payloads.update(self._fetch_points(missing))
 
-        titles = set()
-        for point in scroll[0]:
+        results = []
+        for doc_id, score in fused:
+            payload = payloads.get(doc_id)
+            if payload is None:
+                continue
+            if filters and not matches_filters(payload, filters):
+                continue
+            results.append((payload.get("text", ""), payload.get("source", ""), score, payload.get("vector_type", "ocr")))
+            if len(results) >= top_k:
+                break
+        return results
+
+    def iter_points(self, fields=("text", "source"), page_size=256, scroll_filter=None):
+        """
+        Lazily page through every point in the text collection.
+
+        Args:
+            fields: Payload fields to fetch (None fetches no payload)
+            page_size: Points requested per scroll call
+            scroll_filter: Optional Qdrant filter
+        """
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=page_size,
+                offset=offset,
+                with_payload=list(fields) if fields else False,
+                with_vectors=False
+            )
+            yield from points
+            if offset is None:
+                return
+
+    def iter_chunks(self, page_size=256):
+        """Yield (text, source) for every chunk, one page at a time."""
+        for point in self.iter_points(fields=("text", "source"), page_size=page_size):
+            payload = point.payload or {}
+            yield payload.get("text", ""), payload.get("source", "")
+
+    def iter_titles(self, page_size=1000):
+        """Yield each distinct document title once, fetching only title/source payloads."""
+        seen = set()
+        for point in self.iter_points(fields=("title", "source"), page_size=page_size):
             payload = point.payload or {}
             title = payload.get("title") or payload.get("source")
-            if title:
-                titles.add(title)
-        return list(titles)
+            if title and title not in seen:
+                seen.add(title)
+                yield title
+
+    def sample_chunks(self, k, seed=None):
+        """
+        Uniformly sample k chunks without loading chunk text for the whole collection.
+
+        Streams ids and sources only (reservoir sampling), then fetches text for the sample.
+        Returns (samples, sources) where samples is a list of (text, source) tuples and
+        sources is the set of distinct sources seen.
+        """
+        rng = random.Random(seed)
+        reservoir = []
+        sources = set()
+        for n, point in enumerate(self.iter_points(fields=("source",), page_size=1000)):
+            source = (point.payload or {}).get("source", "")
+            if source:
+                sources.add(source)
+            if len(reservoir) < k:
+                reservoir.append(point.id)
+            else:
+                j = rng.randint(0, n)
+                if j < k:
+                    reservoir[j] = point.id
+
+        payloads = self._fetch_points(reservoir)
+        samples = [
+            (payloads[pid].get("text", ""), payloads[pid].get("source", ""))
+            for pid in reservoir if pid in payloads
+        ]
+        return samples, sources
+
+    def get_all_chunks(self):
+        return list(self.iter_chunks())
+
+    def get_all_titles(self):
+        return list(self.iter_titles())
@@ -0,0 +1,196 @@
+"""
+Lazily initialized services with startup timing.
+
+Heavy components (embedding models, API clients, database connections)
+are registered as factories and built on first use, so importing a server
+module stays cheap and a worker can accept connections immediately.
+`warmup()` builds them in a background thread once the server is up;
+`ready()` tells whether the required ones are up, which is what a
+readiness probe should report (as opposed to liveness). A factory that
+raises is recorded as failed and built again on the first use after
+`retry_interval` seconds, so a dependency that was briefly down at boot
+does not stay unavailable until a restart.
+
+Every factory run and every `timed()` block (e.g. module imports) is
+recorded, and `report()` breaks startup cost down per component.
+"""
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_MISSING = object()
+
+
+class ServiceRegistry:
+    def __init__(self, retry_interval=30.0):
+        self.retry_interval = retry_interval
+        self._factories = {}
+        self._values = {}
+        self._errors = {}
+        self._failed_at = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._timings = []  # (component, phase, seconds)
+        self._warmup_thread = None
+        self._retry_thread = None
+        self.created = time.perf_counter()
+
+    def register(self, name, factory):
+        """Register a zero-argument factory; it runs on the first get(name)."""
+        with self._lock:
+            self._factories[name] = factory
+            self._locks[name] = threading.Lock()
+
+    def record(self, component, phase, seconds):
+        with self._lock:
+            self._timings.append((component, phase, seconds))
+
+    @contextmanager
+    def timed(self, component, phase="import"):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(component, phase, time.perf_counter() - started)
+
+    def get(self, name):
+        """
+        The service instance, building it on first use. Returns None when the
+        factory failed; the error is kept for status(), and the build is tried
+        again on the first call after retry_interval seconds.
+        """
+        value = self._values.get(name, _MISSING)
+        if value is not _MISSING and not self.retry_due(name):
+            return value
+        with self._locks[name]:
+            value = self._values.get(name, _MISSING)
+            if value is not _MISSING and not self.retry_due(name):
+                return value
+            started = time.perf_counter()
+            try:
+                value = self._factories[name]()
+                if value is None:
+                    raise RuntimeError(f"{name} factory returned None")
+                self._errors.pop(name, None)
+                self._failed_at.pop(name, None)
+            except Exception as e:
+                self._errors[name] = str(e)
+                self._failed_at[name] = time.monotonic()
+                value = None
+            self.record(name, "init", time.perf_counter() - started)
+            self._values[name] = value
+            return value
+
+    def retry_due(self, name):
+        """True when the service failed and its retry interval has passed."""
+        failed_at = self._failed_at.get(name)
+        return failed_at is not None and time.monotonic() - failed_at >= self.retry_interval
+
+    def retry_failed(self, names=None):
+        """Rebuild failed services whose retry is due, in one background thread at a time."""
+        due = [name for name in (names or self._factories) if self.retry_due(name)]
+        if not due:
+            return None
+        with self._lock:
+            if self._retry_thread is None or not self._retry_thread.is_alive():
+                self._retry_thread = threading.Thread(
+                    target=lambda: [self.get(name) for name in due], name="service-retry", daemon=True
+                )
+                self._retry_thread.start()
+            return self._retry_thread
+
+    def loaded(self, name):
+        """True once the service has been built (successfully or not), without building it."""
+        return name in self._values
+
+    def peek(self, name):
+        """The service if it has been built successfully, else None; never builds or retries."""
+        return self._values.get(name)
+
+    def available(self, name):
+        """True when the service was built successfully (builds it if needed)."""
+        return self.get(name) is not None
+
+    def warmup(self, names=None, background=True, on_complete=None):
+        """
+        Build the given services (default: all) now, in a daemon thread unless
+        background=False. Only the first background warmup starts a thread.
+        """
+        names = list(names or self._factories)
+
+        def run():
+            for name in names:
+                self.get(name)
+            if on_complete:
+                on_complete()
+
+        if not background:
+            run()
+            return None
+        with self._lock:
+            if self._warmup_thread is None:
+                self._warmup_thread = threading.Thread(target=run, name="service-warmup", daemon=True)
+                self._warmup_thread.start()
+            return self._warmup_thread
+
+    def after_fork(self, names=()):
+        """
+        Call in a freshly forked worker: forget the parent's warmup thread and
+        drop the given services (those holding sockets or threads, which do not
+        survive a fork) so they are rebuilt in this process. Everything else,
+        e.g. model weights, stays shared with the parent copy-on-write.
+        """
+        with self._lock:
+            self._warmup_thread = None
+            self._retry_thread = None
+            for name in self._factories:
+                self._locks[name] = threading.Lock()
+            for name in names:
+                self._values.pop(name, None)
+                self._errors.pop(name, None)
+                self._failed_at.pop(name, None)
+
+    def ready(self, names=None):
+        """True when every given service (default: all) has been built successfully."""
+        return all(self._values.get(name) is not None for name in (names or self._factories))
+
+    def status(self):
+        now = time.monotonic()
+        return {
+            name: {
+                "loaded": self.loaded(name),
+                "available": self._values.get(name) is not None,
+                "error": self._errors.get(name),
+                "retry_in_s": (round(max(0.0, self._failed_at[name] + self.retry_interval - now), 1)
+                               if name in self._failed_at else None),
+            }
+            for name in self._factories
+        }
+
+    def report(self):
+        """Startup cost per component and phase, slowest first."""
+        with self._lock:
+            timings = list(self._timings)
+        components = {}
+        for component, phase, seconds in timings:
+            entry = components.setdefault(component, {"total_ms": 0.0})
+            entry[f"{phase}_ms"] = round(entry.get(f"{phase}_ms", 0.0) + seconds * 1000, 1)
+            entry["total_ms"] = round(entry["total_ms"] + seconds * 1000, 1)
+        return dict(sorted(components.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+    def format_report(self):
+        lines = ["Startup cost by component:"]
+        for component, entry in self.report().items():
+            phases = ", ".join(f"{key[:-3]} {value:.0f} ms" for key, value in entry.items() if key != "total_ms")
+            lines.append(f"  {component:<20} {entry['total_ms']:>8.0f} ms  ({phases})")
+        return "\n".join(lines)
+
+
+def lazy_import(module_name, registry=None):
+    """Import a module on first call (timed in `registry` when given)."""
+    if registry is None or module_name in sys.modules:
+        return importlib.import_module(module_name)
+    with registry.timed(module_name, "import"):
+        return importlib.import_module(module_name)